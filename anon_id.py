@@ -0,0 +1,76 @@
+"""
+anon_id.py — Signed anonymous visitor ids, so moderation has something to key on.
+
+Viewers may chat and bid without signing in. Every page load that arrives
+without a valid `anon_id` cookie gets a fresh random id in an HttpOnly
+cookie, signed with HMAC-SHA256 so it cannot be forged or edited from the
+page. Bans on anonymous viewers are keyed on that id; unlike a fingerprint
+of address and User-Agent it does not collide between people behind one
+NAT or proxy, and changing the User-Agent does not shake it off.
+
+All workers must sign with the same secret. Set ANON_ID_SECRET, or leave it
+empty and the first worker to start writes a random one to
+ANON_ID_SECRET_FILE for the others (and later restarts) to read. The
+secret is only loaded on first use (the app does that at startup), so
+merely importing the app writes no file.
+"""
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+COOKIE_NAME = "anon_id"
+
+
+def load_secret(secret: str, path: str) -> bytes:
+    """The configured secret, else the one in `path`, created on first use."""
+    if secret:
+        return secret.encode()
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        pass
+    else:
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+        logger.info("Generated a new anonymous id secret in %s", path)
+    with open(path) as f:
+        value = f.read().strip()
+    if not value:
+        raise RuntimeError(f"{path} is empty; delete it or set ANON_ID_SECRET")
+    return value.encode()
+
+
+class AnonIdSigner:
+    def __init__(self, secret: str = "", path: str = ""):
+        # Either one is enough; see load_secret
+        self.secret = secret
+        self.path = path
+        self._key: Optional[bytes] = None
+
+    def load(self) -> bytes:
+        """The signing key, read (or generated) on the first call."""
+        if self._key is None:
+            self._key = load_secret(self.secret, self.path)
+        return self._key
+
+    def _signature(self, anon_id: str) -> str:
+        return hmac.new(self.load(), anon_id.encode(), hashlib.sha256).hexdigest()[:32]
+
+    def issue(self) -> str:
+        """A new cookie value: `<random id>.<signature>`."""
+        anon_id = secrets.token_hex(8)
+        return f"{anon_id}.{self._signature(anon_id)}"
+
+    def verify(self, value: Optional[str]) -> Optional[str]:
+        """The id inside a cookie value, or None if it is missing or was not signed by us."""
+        if not value:
+            return None
+        anon_id, _, signature = value.partition(".")
+        if not anon_id or not hmac.compare_digest(signature, self._signature(anon_id)):
+            return None
+        return anon_id
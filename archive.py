@@ -0,0 +1,117 @@
+"""
+archive.py — Write-behind archive of chat history.
+
+The live ConnectionManager only keeps a short ring buffer of recent chat.
+Every message is also handed to a HistoryArchive, which buffers rows in
+memory and inserts them in batches from a background task, so the broadcast
+hot path never waits on the database. Bids go to the durable ledger
+(ledger.py) instead, since they must not be dropped.
+"""
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, List, Optional, Tuple, Type
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryArchive:
+    def __init__(
+        self,
+        session_factory,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_pending: int = 50000,
+    ):
+        self._session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # Bounded so a database outage cannot turn into unbounded memory use.
+        self._pending: Deque[Tuple[Type, dict]] = deque(maxlen=max_pending)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def record_chat(self, username: str, text: str, room: str = "main") -> None:
+        self._add(ChatMessage, {"room": room, "username": username, "text": text})
+
+    def _add(self, model: Type, row: dict) -> None:
+        if len(self._pending) == self._pending.maxlen:
+            logger.warning("History archive backlog full — dropping oldest row")
+        row["created_at"] = datetime.now(timezone.utc)
+        self._pending.append((model, row))
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and write out whatever is still pending."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._pending:
+            await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._pending:
+                try:
+                    await self.flush()
+                except Exception as e:
+                    logger.error("History archive flush failed: %s", e)
+                    break
+
+    async def flush(self) -> int:
+        """Insert up to batch_size pending rows. Returns the number written."""
+        batch = []
+        while self._pending and len(batch) < self.batch_size:
+            batch.append(self._pending.popleft())
+        if not batch:
+            return 0
+        by_model: dict = {}
+        for model, row in batch:
+            by_model.setdefault(model, []).append(row)
+        try:
+            async with self._session_factory() as db:
+                for model, rows in by_model.items():
+                    await db.execute(insert(model), rows)
+                await db.commit()
+        except Exception:
+            # Put the batch back in order so the next flush retries it.
+            self._pending.extendleft(reversed(batch))
+            raise
+        return len(batch)
+
+
+async def fetch_page(
+    db: AsyncSession, model: Type, before: Optional[int], limit: int, room: Optional[str] = None,
+) -> List[dict]:
+    """Newest-first page of archived rows with id < before (keyset pagination)."""
+    query = select(model).order_by(model.id.desc()).limit(limit)
+    if room is not None:
+        query = query.where(model.room == room)
+    if before is not None:
+        query = query.where(model.id < before)
+    result = await db.execute(query)
+    return [row.to_dict() for row in result.scalars().all()]
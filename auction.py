@@ -0,0 +1,76 @@
+"""
+auction.py — Per-lot auction state with totally ordered bid sequencing.
+
+AuctionEngine is a single-writer state machine: submit() never awaits, so
+on the event loop each call checks and updates a lot atomically. The
+ConnectionManager only calls it while applying backplane events, which
+every worker receives in the same order, so every worker assigns the same
+sequence numbers and reaches the same accept/reject decisions.
+"""
+from typing import Dict, Iterable, Optional
+
+# Largest amount a signed 64-bit INTEGER column (and the bid ledger) can hold
+MAX_BID = 2 ** 63 - 1
+
+
+class Lot:
+    def __init__(self, lot_id: str, price: int):
+        self.id = lot_id
+        self.price = price
+        self.seq = 0  # sequence number of the last accepted bid on this lot
+
+
+class AuctionEngine:
+    def __init__(self, lot_ids: Iterable[str], start_price: int = 1, max_bid: int = MAX_BID):
+        self.start_price = start_price
+        self.max_bid = max_bid
+        self.lots: Dict[str, Lot] = {lot_id: Lot(lot_id, start_price) for lot_id in lot_ids}
+        self.default_lot = next(iter(self.lots))
+        self.seq = 0  # global, across all lots
+        self.accepted = 0
+        self.rejected = 0
+
+    def price(self, lot_id: str) -> Optional[int]:
+        lot = self.lots.get(lot_id)
+        return lot.price if lot else None
+
+    def prices(self) -> Dict[str, int]:
+        return {lot_id: lot.price for lot_id, lot in self.lots.items()}
+
+    def submit(self, lot_id: str, username: str, amount: Optional[int] = None) -> Optional[dict]:
+        """
+        Accept or reject one bid. amount=None means "buy now": one above the
+        current price. Returns the accepted bid message, or None if rejected
+        (unknown lot, not above the price, or above max_bid).
+        """
+        lot = self.lots.get(lot_id)
+        if lot is None:
+            self.rejected += 1
+            return None
+        if amount is None:
+            amount = lot.price + 1
+        if amount <= lot.price or amount > self.max_bid:
+            self.rejected += 1
+            return None
+        self.seq += 1
+        lot.price = amount
+        lot.seq = self.seq
+        self.accepted += 1
+        return {"type": "bid", "seq": self.seq, "lot": lot_id, "username": username, "amount": amount}
+
+    def price_message(self, lot_id: str) -> dict:
+        lot = self.lots[lot_id]
+        return {"type": "price", "lot": lot_id, "current": lot.price, "seq": lot.seq}
+
+    def export_state(self) -> dict:
+        return {
+            "seq": self.seq,
+            "lots": {lot_id: [lot.price, lot.seq] for lot_id, lot in self.lots.items()},
+        }
+
+    def import_state(self, state: dict) -> None:
+        self.seq = state["seq"]
+        for lot_id, (price, seq) in state["lots"].items():
+            lot = self.lots.setdefault(lot_id, Lot(lot_id, price))
+            lot.price = price
+            lot.seq = seq
@@ -0,0 +1,122 @@
+"""
+auth_cache.py — In-process TTL/LRU cache for session token -> user lookups.
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Session as DBSession, User
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Detached, immutable copy of the User fields request handlers need."""
+    id: int
+    email: str
+    name: str
+    picture: Optional[str]
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserSnapshot":
+        return cls(id=user.id, email=user.email, name=user.name, picture=user.picture)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "email": self.email,
+            "name": self.name,
+            "picture": self.picture,
+        }
+
+
+class SessionCache:
+    """
+    Maps session tokens to UserSnapshot (or None for unknown/expired tokens).
+
+    Entries live for at most ttl seconds and never past the session's own
+    expiry; the least recently used entry is evicted once maxsize is reached.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0, negative_ttl: float = 5.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries: "OrderedDict[str, Tuple[Optional[UserSnapshot], float]]" = OrderedDict()
+
+    def get(self, token: str) -> Tuple[bool, Optional[UserSnapshot]]:
+        """Returns (found, snapshot). found is False on a miss."""
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        snapshot, deadline = entry
+        if time.monotonic() >= deadline:
+            del self._entries[token]
+            self.expirations += 1
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return True, snapshot
+
+    def put(self, token: str, snapshot: Optional[UserSnapshot], expires_at: Optional[datetime] = None) -> None:
+        ttl = self.ttl if snapshot is not None else self.negative_ttl
+        if expires_at is not None:
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            ttl = min(ttl, (expires_at - datetime.now(timezone.utc)).total_seconds())
+        if ttl <= 0:
+            return
+        self._entries[token] = (snapshot, time.monotonic() + ttl)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, token: str) -> None:
+        self._entries.pop(token, None)
+
+    def invalidate_user(self, user_id: int) -> None:
+        stale = [t for t, (snap, _) in self._entries.items() if snap is not None and snap.id == user_id]
+        for token in stale:
+            del self._entries[token]
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+async def resolve_session(db: AsyncSession, token: str, cache: SessionCache) -> Optional[UserSnapshot]:
+    """Token -> user via the cache, falling back to a single joined query."""
+    found, snapshot = cache.get(token)
+    if found:
+        return snapshot
+    result = await db.execute(
+        select(User, DBSession.expires_at)
+        .join(DBSession, DBSession.user_id == User.id)
+        .where(DBSession.token == token)
+        .where(DBSession.expires_at > datetime.now(timezone.utc))
+    )
+    row = result.one_or_none()
+    if row is None:
+        cache.put(token, None)
+        return None
+    user, expires_at = row
+    snapshot = UserSnapshot.from_user(user)
+    cache.put(token, snapshot, expires_at)
+    return snapshot
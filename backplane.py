@@ -0,0 +1,201 @@
+"""
+backplane.py — Ordered event bus shared by all workers serving one stream.
+
+Every change to shared live state (chat, bids, price, live status, bans,
+viewer counts) and every video frame is published to the backplane once.
+The backplane delivers each event to every worker, including the one that
+published it, in the same total order, and each worker's ConnectionManager
+applies it and fans it out to its own local sockets.
+
+InProcessBackplane is the single-worker default. UnixSocketBackplane lets
+several `uvicorn --workers N` processes on one host share a stream: the
+first worker to take a file lock runs a tiny hub on a Unix socket that
+relays every event to all connected workers in arrival order.
+"""
+import abc
+import asyncio
+import json
+import logging
+import os
+import struct
+from typing import Callable, Optional, Set, Union
+
+logger = logging.getLogger(__name__)
+
+# dict events are JSON; bytes events are raw video frames.
+Event = Union[dict, bytes]
+EventHandler = Callable[[Event], None]
+
+# Delivered to the handler, not published, each time a shared backplane
+# (re)connects to its hub.
+CONNECTED = {"type": "backplane_connected"}
+
+_HEADER = struct.Struct("!IB")  # body length, kind
+_JSON = 0
+_BINARY = 1
+
+
+class Backplane(abc.ABC):
+    """Base class. Handlers are called synchronously, one event at a time, in order."""
+
+    # True when other processes may publish to the same stream, i.e. a
+    # freshly started worker has to ask its peers for the current state.
+    shared = False
+
+    @abc.abstractmethod
+    async def start(self, handler: EventHandler) -> None:
+        """Begin delivering events to `handler`."""
+
+    @abc.abstractmethod
+    async def publish(self, event: Event) -> None:
+        """Send one event to every worker, this one included."""
+
+    async def stop(self) -> None:
+        pass
+
+
+class InProcessBackplane(Backplane):
+    """Single worker: publishing is just calling the handler."""
+
+    def __init__(self):
+        self._handler: Optional[EventHandler] = None
+
+    async def start(self, handler: EventHandler) -> None:
+        self._handler = handler
+
+    async def publish(self, event: Event) -> None:
+        self._handler(event)
+
+
+class UnixSocketBackplane(Backplane):
+    shared = True
+
+    def __init__(self, path: str, max_client_buffer: int = 64 * 1024 * 1024):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.max_client_buffer = max_client_buffer
+        self._handler: Optional[EventHandler] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._connected = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Hub side, only in the worker holding the lock
+        self._lock_fd: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: Set[asyncio.StreamWriter] = set()
+
+    async def start(self, handler: EventHandler) -> None:
+        self._handler = handler
+        self._task = asyncio.create_task(self._run())
+        await self._connected.wait()
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+        if self._writer:
+            self._writer.close()
+        if self._server:
+            self._server.close()
+            for client in list(self._clients):
+                client.close()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    async def publish(self, event: Event) -> None:
+        if isinstance(event, bytes):
+            if self._writer is None:
+                return  # reconnecting: frames are not worth waiting for
+            header = _HEADER.pack(len(event), _BINARY)
+            body = event
+        else:
+            body = json.dumps(event, separators=(",", ":")).encode("utf-8")
+            header = _HEADER.pack(len(body), _JSON)
+            await self._connected.wait()
+        writer = self._writer
+        writer.writelines((header, body))
+        await writer.drain()
+
+    # -- worker side -------------------------------------------------------
+
+    async def _run(self) -> None:
+        while True:
+            if self._server is None:
+                await self._try_become_hub()
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                await asyncio.sleep(0.1)
+                continue
+            self._writer = writer
+            self._connected.set()
+            self._deliver(dict(CONNECTED))
+            try:
+                while True:
+                    header = await reader.readexactly(_HEADER.size)
+                    length, kind = _HEADER.unpack(header)
+                    body = await reader.readexactly(length)
+                    self._deliver(body if kind == _BINARY else body.decode("utf-8"))
+            except (asyncio.IncompleteReadError, ConnectionError):
+                logger.warning("Backplane hub connection lost — reconnecting")
+            finally:
+                self._connected.clear()
+                self._writer = None
+                writer.close()
+
+    def _deliver(self, event: Union[bytes, str, dict]) -> None:
+        # One bad event (or a bug in applying it) must not take down the
+        # reader: the worker would reconnect and miss everything in between.
+        try:
+            if isinstance(event, str):
+                event = json.loads(event)
+            self._handler(event)
+        except Exception:
+            logger.exception("Backplane event handler failed — event skipped")
+
+    # -- hub side ----------------------------------------------------------
+
+    async def _try_become_hub(self) -> None:
+        import fcntl  # Unix only, like the socket itself
+
+        fd = os.open(self.lock_path, os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return
+        self._lock_fd = fd
+        # Whoever held the lock before us is gone; its socket file is stale.
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._serve_client, path=self.path)
+        logger.info("Backplane hub listening on %s", self.path)
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._clients.add(writer)
+        try:
+            while True:
+                header = await reader.readexactly(_HEADER.size)
+                length, _ = _HEADER.unpack(header)
+                body = await reader.readexactly(length)
+                # Relay in arrival order without awaiting any one worker; a
+                # worker that stops reading is cut off and will reconnect.
+                for client in list(self._clients):
+                    client.writelines((header, body))
+                    if client.transport.get_write_buffer_size() > self.max_client_buffer:
+                        logger.warning("Backplane worker too far behind — dropping it")
+                        self._clients.discard(client)
+                        client.close()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+
+def create_backplane(url: str) -> Backplane:
+    """'' or 'memory://' for in-process, 'unix:/path/to.sock' for the Unix socket hub."""
+    if not url or url == "memory://":
+        return InProcessBackplane()
+    if url.startswith("unix:"):
+        return UnixSocketBackplane(url[len("unix:"):])
+    raise ValueError("Unsupported BACKPLANE_URL: {}".format(url))
@@ -0,0 +1,108 @@
+"""
+bench_auction.py — Auction engine throughput and bid ordering under contention.
+
+First measures AuctionEngine.submit() on its own, then drives a
+ConnectionManager (in-process backplane, in-memory viewer sockets) with many
+concurrent bidders and checks that every viewer saw the same strictly
+increasing bid sequence and a final price equal to the highest accepted bid.
+
+    python benchmarks/bench_auction.py [--bids 200000] [--bidders 200] [--viewers 200]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("HISTORY_ARCHIVE_ENABLED", "false")
+
+from auction import AuctionEngine  # noqa: E402
+
+
+class MemorySocket:
+    def __init__(self):
+        self.messages = []
+
+    async def send_text(self, text: str) -> None:
+        self.messages.append(text)  # decoded only when checking
+
+    async def send_bytes(self, data: bytes) -> None:
+        pass
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+def bench_engine(bids: int, lots: int) -> None:
+    engine = AuctionEngine([str(i) for i in range(1, lots + 1)])
+    lot_ids = list(engine.lots)
+    attempts = [(random.choice(lot_ids), random.randint(1, bids)) for _ in range(bids)]
+    start = time.perf_counter()
+    for lot, amount in attempts:
+        engine.submit(lot, "u", amount)
+    elapsed = time.perf_counter() - start
+    print(f"engine: {bids} bids in {elapsed * 1000:.1f} ms "
+          f"({bids / elapsed:,.0f}/s), accepted={engine.accepted} rejected={engine.rejected}")
+
+
+async def bench_manager(bidders: int, viewers: int, rounds: int) -> None:
+    from main import ConnectionManager
+
+    manager = ConnectionManager()
+    await manager.start()
+    sockets = [MemorySocket() for _ in range(viewers)]
+    for i, ws in enumerate(sockets):
+        await manager.connect_viewer(ws, f"viewer{i}")
+    lot_ids = list(manager.auction.lots)
+
+    async def bidder(n: int) -> None:
+        for _ in range(rounds):
+            lot = random.choice(lot_ids)
+            await manager.place_bid(f"bidder{n}", lot, manager.auction.price(lot) + random.randint(1, 3))
+            await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(bidder(n) for n in range(bidders)))
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(0.5)  # let the viewer writers drain
+
+    def bid_texts(ws: MemorySocket) -> list:
+        return [text for text in ws.messages if text.startswith('{"type":"bid"')]
+
+    reference_texts = bid_texts(sockets[0])
+    for ws in sockets[1:]:
+        assert bid_texts(ws) == reference_texts, "viewers disagree on bid order"
+    reference = [json.loads(text) for text in reference_texts]
+    seqs = [m["seq"] for m in reference]
+    assert seqs == sorted(set(seqs)), "bid seq is not strictly increasing"
+    for lot in lot_ids:
+        amounts = [m["amount"] for m in reference if m["lot"] == lot]
+        assert amounts == sorted(set(amounts)), "accepted bids on lot {} are not increasing".format(lot)
+        if amounts:
+            assert manager.auction.price(lot) == amounts[-1]
+    prices = sum(1 for text in sockets[0].messages if text.startswith('{"type":"price"'))
+    attempts = bidders * rounds
+    print(f"manager: {attempts} attempts from {bidders} bidders in {elapsed * 1000:.1f} ms, "
+          f"accepted={len(reference)}, price messages={prices} (coalesced), "
+          f"{viewers} viewers agree on order: ok")
+    await manager.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bids", type=int, default=200000)
+    parser.add_argument("--lots", type=int, default=3)
+    parser.add_argument("--bidders", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5, help="bids per bidder")
+    parser.add_argument("--viewers", type=int, default=200)
+    args = parser.parse_args()
+
+    bench_engine(args.bids, args.lots)
+    asyncio.run(bench_manager(args.bidders, args.viewers, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+bench_chat_batch.py — Chat messages on the wire, per line vs. batched.
+
+Feeds a steady chat flood into a ConnectionManager with in-memory viewers
+and counts WebSocket messages sent and chat lines delivered, with chat
+batching off (one message per line) and on (one chat_batch per window).
+
+    python benchmarks/bench_chat_batch.py [--rate 500] [--seconds 2] [--viewers 200] [--window-ms 100] [--max-lines 50]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("HISTORY_ARCHIVE_ENABLED", "false")
+
+from chat_batch import ChatAggregator  # noqa: E402
+from fanout import encode_message  # noqa: E402
+from main import ConnectionManager  # noqa: E402
+
+
+class CountingSocket:
+    def __init__(self):
+        self.messages = 0
+        self.lines = 0
+
+    async def send_text(self, text: str) -> None:
+        self.messages += 1
+        if text.startswith('{"type":"chat_batch"'):
+            self.lines += len(json.loads(text)["messages"])
+        elif text.startswith('{"type":"chat"'):
+            self.lines += 1
+
+    async def send_bytes(self, data: bytes) -> None:
+        self.messages += 1
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+async def flood(args, window: float) -> None:
+    manager = ConnectionManager()
+    if window > 0:
+        manager.chat_aggregator = ChatAggregator(
+            window, args.max_lines, lambda batch: manager._fan_out(encode_message(batch))
+        )
+    else:
+        manager.chat_aggregator = None
+    await manager.start()
+    sockets = [CountingSocket() for _ in range(args.viewers)]
+    for i, ws in enumerate(sockets):
+        await manager.connect_viewer(ws, f"viewer{i}")
+    await asyncio.sleep(manager.viewer_count_interval * 2)
+    for ws in sockets:
+        ws.messages = ws.lines = 0
+
+    # Lines arrive in 10 ms ticks at the requested rate
+    per_tick = max(1, round(args.rate / 100))
+    total = int(args.rate * args.seconds)
+    sent = 0
+    start = time.perf_counter()
+    while sent < total:
+        for _ in range(min(per_tick, total - sent)):
+            await manager.broadcast_chat(f"user{sent % 300}", f"line {sent}")
+            sent += 1
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(window + 0.2)
+    await manager.stop()
+
+    messages = sum(ws.messages for ws in sockets)
+    lines = sum(ws.lines for ws in sockets) / len(sockets)
+    label = f"batched {window * 1000:.0f} ms" if window > 0 else "per line"
+    print(f"{label:>16}: {messages / elapsed:>10,.0f} msgs/s on the wire, "
+          f"{lines:,.0f}/{total:,} lines per viewer")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rate", type=int, default=500, help="chat lines per second")
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--viewers", type=int, default=200)
+    parser.add_argument("--window-ms", type=float, default=100.0)
+    parser.add_argument("--max-lines", type=int, default=50, help="lines per window before sampling")
+    args = parser.parse_args()
+
+    print(f"{args.rate} chat lines/s, {args.viewers} viewers")
+    asyncio.run(flood(args, 0.0))
+    asyncio.run(flood(args, args.window_ms / 1000))
+
+
+if __name__ == "__main__":
+    main()
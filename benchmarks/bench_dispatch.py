@@ -0,0 +1,165 @@
+"""
+bench_dispatch.py — Throughput of the /ws receive path on a message trace.
+
+Replays a trace of raw inbound text messages through
+
+  * legacy:   stdlib json.loads + the old if/elif chain on msg["type"]
+  * registry: protocol.MessageRegistry.decode (size check, orjson if
+              installed, schema validation, dict dispatch)
+  * full:     registry plus the real handlers against a ConnectionManager
+              with no viewers attached
+
+and reports messages per second on one core (the event loop is
+single-threaded). The trace is a JSONL file with one raw message per line;
+without --trace a synthetic mix is generated, and --record saves it.
+
+    python benchmarks/bench_dispatch.py [--trace trace.jsonl] [--messages 200000] [--record out.jsonl]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("HISTORY_ARCHIVE_ENABLED", "false")
+
+import protocol  # noqa: E402
+
+# Rough mix seen from a busy room: mostly chat, a burst of bids, the odd
+# rename, plus junk that must be rejected cheaply.
+MIX = (
+    ("chat", 60),
+    ("bid", 25),
+    ("buy_now", 3),
+    ("set_username", 2),
+    ("unknown", 3),
+    ("oversized", 2),
+    ("malformed", 5),
+)
+
+
+def synthetic_trace(count: int) -> list:
+    kinds = [kind for kind, weight in MIX for _ in range(weight)]
+    trace = []
+    price = 1
+    for i in range(count):
+        kind = random.choice(kinds)
+        if kind == "chat":
+            msg = {"type": "chat", "text": "message number {} from the crowd".format(i)}
+        elif kind == "bid":
+            price += random.randint(0, 2)
+            msg = {"type": "bid", "username": "bidder{}".format(i % 97), "lot": str(i % 3 + 1), "amount": price}
+        elif kind == "buy_now":
+            msg = {"type": "buy_now", "lot": "1"}
+        elif kind == "set_username":
+            msg = {"type": "set_username", "username": "viewer{}".format(i)}
+        elif kind == "unknown":
+            msg = {"type": "ping", "t": i}
+        elif kind == "oversized":
+            msg = {"type": "chat", "text": "x" * 100000}
+        else:
+            trace.append('{"type": "chat", "text": ')
+            continue
+        trace.append(json.dumps(msg))
+    return trace
+
+
+def legacy(trace: list) -> int:
+    handled = 0
+    for data in trace:
+        try:
+            msg = json.loads(data)
+        except json.JSONDecodeError:
+            continue
+        msg_type = msg.get("type")
+        if msg_type == "join":
+            pass
+        elif msg_type == "set_username":
+            pass
+        elif msg_type == "chat":
+            pass
+        elif msg_type == "bid":
+            pass
+        elif msg_type == "buy_now":
+            pass
+        elif msg_type == "ban_user":
+            pass
+        elif msg_type == "unban_user":
+            pass
+        else:
+            continue
+        handled += 1
+    return handled
+
+
+def registry(trace: list, messages) -> int:
+    handled = 0
+    decode = messages.decode
+    for data in trace:
+        if decode(data) is not None:
+            handled += 1
+    return handled
+
+
+async def full(trace: list, messages, client) -> int:
+    handled = 0
+    decode = messages.decode
+    for data in trace:
+        decoded = decode(data)
+        if decoded is not None:
+            msg, handler = decoded
+            await handler(client, msg)
+            handled += 1
+    return handled
+
+
+def report(name: str, count: int, handled: int, elapsed: float) -> None:
+    print(f"{name:>9}: {count / elapsed:>12,.0f} msg/s/core  ({handled:,} dispatched, {elapsed * 1000:.0f} ms)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--trace", help="JSONL file, one raw message per line")
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--record", help="write the synthetic trace here")
+    args = parser.parse_args()
+
+    if args.trace:
+        with open(args.trace, "r", encoding="utf-8") as f:
+            trace = [line.rstrip("\n") for line in f if line.strip()]
+    else:
+        trace = synthetic_trace(args.messages)
+        if args.record:
+            with open(args.record, "w", encoding="utf-8") as f:
+                f.writelines(line + "\n" for line in trace)
+
+    from main import ClientState, ConnectionManager, messages
+
+    print(f"{len(trace):,} messages, JSON backend: {protocol.JSON_BACKEND}")
+
+    start = time.perf_counter()
+    handled = legacy(trace)
+    report("legacy", len(trace), handled, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    handled = registry(trace, messages)
+    report("registry", len(trace), handled, time.perf_counter() - start)
+
+    async def run_full():
+        manager = ConnectionManager()  # no ledger: keeps benchmark bids out of the database
+        await manager.start()
+        client = ClientState(object(), "bench", manager)
+        client.role = "viewer"
+        start = time.perf_counter()
+        handled = await full(trace, messages, client)
+        report("full", len(trace), handled, time.perf_counter() - start)
+        await manager.stop()
+
+    asyncio.run(run_full())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+bench_email_pipeline.py — Notification pipeline against a local SMTP stand-in.
+
+Runs NotificationPipeline against an in-process aiosmtpd server (no TLS, no
+auth) that can reject a fraction of messages with a transient 421 to
+exercise retries. Needs `pip install aiosmtpd`.
+
+    python benchmarks/bench_email_pipeline.py [--users 2000] [--rate 500] [--fail-rate 0.02]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    sys.exit("aiosmtpd is not installed: pip install aiosmtpd")
+
+from email_service import NotificationPipeline  # noqa: E402
+
+
+class CountingHandler:
+    def __init__(self, fail_rate: float):
+        self.fail_rate = fail_rate
+        self.received = 0
+        self.rejected = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        if random.random() < self.fail_rate:
+            self.rejected += 1
+            return "421 Try again later"
+        self.received += 1
+        return "250 OK"
+
+
+async def recipients(count: int, chunk: int):
+    for start in range(0, count, chunk):
+        yield [
+            {"email": f"user{i}@example.com", "name": f"User {i}"}
+            for i in range(start, min(start + chunk, count))
+        ]
+
+
+async def run(args) -> None:
+    handler = CountingHandler(args.fail_rate)
+    controller = Controller(handler, hostname="127.0.0.1", port=args.port)
+    controller.start()
+    try:
+        pipeline = NotificationPipeline(
+            hostname="127.0.0.1",
+            port=args.port,
+            username=None,
+            password=None,
+            start_tls=False,
+            pool_size=args.pool,
+            concurrency=args.concurrency,
+            rate_per_second=args.rate,
+            retry_backoff=0.05,
+        )
+        stats = await pipeline.run(recipients(args.users, 500))
+    finally:
+        controller.stop()
+    print("pipeline:", stats.to_dict())
+    print(f"server: received={handler.received} rejected(421)={handler.rejected}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=500.0, help="messages per second cap")
+    parser.add_argument("--pool", type=int, default=4, help="SMTP connections")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--fail-rate", type=float, default=0.02, help="fraction answered with 421")
+    parser.add_argument("--port", type=int, default=8025)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
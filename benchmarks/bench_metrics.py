@@ -0,0 +1,51 @@
+"""
+bench_metrics.py — Per-event overhead of the metrics layer.
+
+Times the operations the hot paths perform (counter inc, histogram
+observe with a perf_counter pair around it) and one full /metrics render.
+
+    python benchmarks/bench_metrics.py [--number 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import Registry  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=1000000)
+    args = parser.parse_args()
+
+    registry = Registry()
+    counter = registry.counter("bench_total", "bench").labels()
+    labelled = registry.counter("bench_labelled_total", "bench", ("kind",)).labels("message")
+    histogram = registry.histogram("bench_seconds", "bench", ("kind",)).labels("message")
+
+    def timed_observe():
+        started = time.perf_counter()
+        histogram.observe(time.perf_counter() - started)
+
+    for name, fn in (
+        ("counter.inc", counter.inc),
+        ("labelled child .inc", labelled.inc),
+        ("histogram.observe", lambda: histogram.observe(0.0003)),
+        ("perf_counter pair + observe", timed_observe),
+    ):
+        seconds = timeit.timeit(fn, number=args.number)
+        print(f"{name:>28}: {seconds / args.number * 1e6:.3f} µs")
+
+    for i in range(50):
+        registry.callback(f"bench_cb_{i}", "bench", lambda: {"a": 1, "b": 2}, labelnames=("x",))
+    start = time.perf_counter()
+    text = registry.render()
+    print(f"{'render':>28}: {(time.perf_counter() - start) * 1000:.2f} ms for {len(text.splitlines())} lines")
+
+
+if __name__ == "__main__":
+    main()
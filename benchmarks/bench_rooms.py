@@ -0,0 +1,107 @@
+"""
+bench_rooms.py — Fan-out throughput as the number of rooms grows.
+
+Opens R rooms through a RoomRegistry, each with its own in-memory viewers,
+and has every room publish chat lines and bids in lockstep. Reports
+messages delivered per second and the cost per delivered message for each
+room count; flat numbers mean fan-out scales linearly with total viewers,
+i.e. rooms do not slow each other down. Then closes every room and checks
+that the memory they held is given back.
+
+    python benchmarks/bench_rooms.py [--rooms 1,10,100,300] [--viewers 20] [--rounds 50]
+"""
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("HISTORY_ARCHIVE_ENABLED", "false")
+
+from main import ConnectionManager  # noqa: E402
+from rooms import RoomRegistry  # noqa: E402
+
+
+class CountingSocket:
+    sent = 0
+
+    async def send_text(self, text: str) -> None:
+        CountingSocket.sent += 1
+
+    async def send_bytes(self, data: bytes) -> None:
+        CountingSocket.sent += 1
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+def create_room(room_id, backplane) -> ConnectionManager:
+    manager = ConnectionManager(backplane, room=room_id)  # no ledger / archive
+    manager.chat_aggregator = None  # one message per chat line, so deliveries are exact
+    return manager
+
+
+async def drained(registry: RoomRegistry) -> None:
+    while any(channel.depth() for _, room in registry.items() for channel in room.viewers.values()):
+        await asyncio.sleep(0.001)
+
+
+async def run(room_count: int, viewers: int, rounds: int) -> None:
+    registry = RoomRegistry(create_room, idle_seconds=0)
+    gc.collect()
+    baseline = tracemalloc.get_traced_memory()[0]
+
+    rooms = []
+    for r in range(room_count):
+        room_id = f"room{r}"
+        manager = await registry.acquire(room_id)
+        for v in range(viewers):
+            await manager.connect_viewer(CountingSocket(), f"viewer{v}")
+        rooms.append((room_id, manager))
+    await asyncio.sleep(0.6)  # let the coalesced viewer counts go out
+    await drained(registry)
+    held = tracemalloc.get_traced_memory()[0] - baseline
+
+    CountingSocket.sent = 0
+    start = time.perf_counter()
+    for n in range(rounds):
+        for _, manager in rooms:
+            await manager.broadcast_chat("seller", f"line {n}")
+            await manager.place_bid("bidder", "1", n + 2)
+        await drained(registry)
+    elapsed = time.perf_counter() - start
+    delivered = CountingSocket.sent
+    # chat + bid + coalesced price per viewer, per room, per round
+    expected = room_count * viewers * rounds * 3
+
+    for room_id, manager in rooms:
+        for ws in list(manager.viewers):
+            manager.disconnect_viewer(ws)
+        registry.release(room_id)
+    await asyncio.sleep(0.05)  # idle_seconds=0: rooms close on the next loop turns
+    del rooms, manager
+    gc.collect()
+    left = tracemalloc.get_traced_memory()[0] - baseline
+
+    print(f"{room_count:>5} rooms x {viewers} viewers: {delivered / elapsed:>10,.0f} msgs/s, "
+          f"{elapsed / delivered * 1e6:5.2f} µs/msg ({delivered:,}/{expected:,} delivered), "
+          f"{held / 1024:>8,.0f} KiB held, {left / 1024:>6,.0f} KiB after close, {len(registry)} rooms open")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rooms", default="1,10,100,300")
+    parser.add_argument("--viewers", type=int, default=20, help="viewers per room")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    for count in (int(c) for c in args.rooms.split(",")):
+        asyncio.run(run(count, args.viewers, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+bench_serialize_once.py — CPU cost of encoding one frame broadcast.
+
+Compares the old path (WebSocket.send_json, i.e. one json.dumps per viewer)
+with encode_message() run once and shared by every viewer.
+
+    python benchmarks/bench_serialize_once.py [--frame-kb 50] [--repeat 5]
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fanout import encode_message  # noqa: E402
+
+VIEWER_COUNTS = (10, 100, 500, 1000, 2000)
+
+
+def per_viewer(message: dict, viewers: int) -> None:
+    for _ in range(viewers):
+        json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+def encode_once(message: dict, viewers: int) -> None:
+    item = encode_message(message)
+    queue = []
+    for _ in range(viewers):
+        queue.append(item)
+
+
+def best_of(fn, message: dict, viewers: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(message, viewers)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--frame-kb", type=int, default=50, help="size of the base64 frame payload")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    raw = os.urandom(args.frame_kb * 1024 * 3 // 4)
+    message = {"type": "frame", "data": base64.b64encode(raw).decode("ascii")}
+
+    print(f"frame payload: {len(message['data']) / 1024:.0f} KB base64")
+    print(f"{'viewers':>8} {'per-viewer ms':>14} {'encode-once ms':>15} {'saved ms/frame':>15} {'at 60 fps':>12}")
+    for viewers in VIEWER_COUNTS:
+        old = best_of(per_viewer, message, viewers, args.repeat) * 1000
+        new = best_of(encode_once, message, viewers, args.repeat) * 1000
+        saved = old - new
+        print(f"{viewers:>8} {old:>14.2f} {new:>15.3f} {saved:>15.2f} {saved * 60 / 1000:>10.2f} s/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+bench_sessions.py — Auth lookup latency and session reaping at a million rows.
+
+Fills a scratch SQLite database with N sessions (a share of them expired),
+then times the auth query behind every request (auth_cache.resolve_session
+with a cold cache) and one reaper batch with and without the expires_at
+index. Finally reaps every expired row with SessionReaper while lookups
+and sign-ins keep running, and reports how long those had to wait.
+
+    python benchmarks/bench_sessions.py [--rows 1000000] [--expired 0.3] [--lookups 5000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("HISTORY_ARCHIVE_ENABLED", "false")
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///" + os.path.join(tempfile.gettempdir(), "bench_sessions.db"))
+
+from sqlalchemy import func, insert, select, text  # noqa: E402
+
+from auth_cache import SessionCache, resolve_session  # noqa: E402
+from database import AsyncSessionLocal, engine, init_db  # noqa: E402
+from models import Session, User  # noqa: E402
+from session_reaper import SessionReaper  # noqa: E402
+
+USERS = 1000
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {p: samples[min(len(samples) - 1, int(len(samples) * p / 100))] * 1000 for p in (50, 99)}
+
+
+def fmt(samples) -> str:
+    q = percentiles(samples)
+    return f"p50 {q[50]:.3f} ms, p99 {q[99]:.3f} ms, max {max(samples) * 1000:.1f} ms"
+
+
+async def fill(rows: int, expired_share: float) -> list:
+    """Reset the tables and insert `rows` sessions. Returns some live tokens."""
+    now = datetime.now(timezone.utc)
+    async with engine.begin() as conn:
+        await conn.execute(Session.__table__.delete())
+        await conn.execute(User.__table__.delete())
+        await conn.execute(insert(User), [
+            {"id": i, "google_id": f"g{i}", "email": f"user{i}@example.com", "name": f"User {i}"}
+            for i in range(1, USERS + 1)
+        ])
+    live = []
+    chunk = 50_000
+    for start in range(0, rows, chunk):
+        batch = []
+        for _ in range(min(chunk, rows - start)):
+            token = uuid.uuid4().hex
+            if random.random() < expired_share:
+                expires = now - timedelta(seconds=random.randint(1, 90 * 86400))
+            else:
+                expires = now + timedelta(seconds=random.randint(3600, 30 * 86400))
+                if len(live) < 100_000:
+                    live.append(token)
+            batch.append({"token": token, "user_id": random.randint(1, USERS), "expires_at": expires, "created_at": now})
+        async with engine.begin() as conn:
+            await conn.execute(insert(Session), batch)
+    return live
+
+
+async def lookup(token: str) -> float:
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        user = await resolve_session(db, token, SessionCache(maxsize=1))
+    assert user is not None
+    return time.perf_counter() - started
+
+
+async def lookups(tokens: list, count: int) -> list:
+    return [await lookup(random.choice(tokens)) for _ in range(count)]
+
+
+async def query_plan(token: str) -> str:
+    async with engine.connect() as conn:
+        rows = await conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT users.*, sessions.expires_at FROM users "
+            "JOIN sessions ON sessions.user_id = users.id WHERE sessions.token = :t AND sessions.expires_at > :now"
+        ), {"t": token, "now": datetime.now(timezone.utc)})
+        return "; ".join(row[-1] for row in rows)
+
+
+async def run(args) -> None:
+    await init_db()
+    async with engine.connect() as conn:
+        mode = (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar()
+    started = time.perf_counter()
+    tokens = await fill(args.rows, args.expired)
+    print(f"{args.rows:,} sessions ({args.expired:.0%} expired) written in {time.perf_counter() - started:.1f}s, "
+          f"journal_mode={mode}")
+
+    await lookups(tokens, 200)  # warm the page cache and the pool
+    print(f"auth lookup: {fmt(await lookups(tokens, args.lookups))}")
+    print(f"  plan: {await query_plan(tokens[0])}")
+
+    reaper = SessionReaper(AsyncSessionLocal, batch_size=args.batch)
+    now = datetime.now(timezone.utc)
+    for label in ("indexed", "no expires_at index"):
+        started = time.perf_counter()
+        await reaper.reap_batch(now)
+        print(f"one reaper batch, {label}: {(time.perf_counter() - started) * 1000:.1f} ms")
+        if label == "indexed":
+            async with engine.begin() as conn:
+                await conn.exec_driver_sql("DROP INDEX ix_sessions_expires_at")
+    await init_db()  # puts the index back
+    # Fresh connections, so no cached statement keeps a stale plan
+    await engine.dispose()
+
+    during, signins = [], []
+    done = asyncio.Event()
+
+    async def traffic():
+        while not done.is_set():
+            during.append(await lookup(random.choice(tokens)))
+            started = time.perf_counter()
+            async with AsyncSessionLocal() as db:
+                db.add(Session(user_id=random.randint(1, USERS),
+                               expires_at=datetime.now(timezone.utc) + timedelta(days=30)))
+                await db.commit()
+            signins.append(time.perf_counter() - started)
+
+    clients = [asyncio.create_task(traffic()) for _ in range(4)]
+    started = time.perf_counter()
+    reaped = await reaper.reap()
+    elapsed = time.perf_counter() - started
+    done.set()
+    await asyncio.gather(*clients)
+    async with AsyncSessionLocal() as db:
+        left = (await db.execute(select(func.count()).select_from(Session))).scalar()
+    print(f"reaped {reaped:,} expired sessions in {elapsed:.1f}s ({reaped / elapsed:,.0f} rows/s, "
+          f"batches of {args.batch}); {left:,} rows left")
+    print(f"  lookups during reap: {fmt(during)}")
+    print(f"  sign-ins during reap: {fmt(signins)}")
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--expired", type=float, default=0.3, help="share of sessions already expired")
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=250, help="reaper batch size")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
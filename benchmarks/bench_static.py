@@ -0,0 +1,76 @@
+"""
+bench_static.py — Page and asset requests per second, read-per-request vs. in-memory.
+
+Calls the page handlers directly with synthetic requests, the way a burst
+of viewers opening /stream would: the old handler (open() and read the file
+on every request) against the cached one, for a first visit (full body,
+gzip) and a repeat visit (If-None-Match, 304).
+
+    python benchmarks/bench_static.py [--requests 20000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.setdefault("HISTORY_ARCHIVE_ENABLED", "false")
+# Page responses issue anon_id cookies; keep their generated secret out of the repo
+os.environ.setdefault("ANON_ID_SECRET_FILE", os.path.join(tempfile.gettempdir(), "bench_anon_id_secret"))
+
+from fastapi.responses import HTMLResponse  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+
+from main import page_response, static_file, static_files  # noqa: E402
+
+
+def make_request(path: str, headers: dict) -> Request:
+    return Request({
+        "type": "http", "method": "GET", "path": path, "query_string": b"",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+    })
+
+
+async def read_per_request(request: Request):
+    with open("static/stream.html", "r", encoding="utf-8") as f:
+        return HTMLResponse(f.read())
+
+
+async def run(label: str, handler, request: Request, n: int) -> None:
+    start = time.perf_counter()
+    sent = 0
+    for _ in range(n):
+        response = await handler(request)
+        sent += len(response.body)
+    elapsed = time.perf_counter() - start
+    print(f"{label:>34}: {n / elapsed:>10,.0f} req/s, {sent / n:>7,.0f} bytes/response, "
+          f"status {response.status_code}")
+
+
+async def main_async(n: int) -> None:
+    await static_files.preload()
+    first = make_request("/stream", {"Accept-Encoding": "gzip, deflate, br"})
+    page = await static_files.get("stream.html")
+    repeat = make_request("/stream", {"Accept-Encoding": "gzip, deflate, br", "If-None-Match": page.etag})
+    await run("/stream read per request", read_per_request, first, n)
+    await run("/stream cached, first visit", lambda r: page_response(r, "stream.html"), first, n)
+    await run("/stream cached, repeat (304)", lambda r: page_response(r, "stream.html"), repeat, n)
+
+    css = await static_files.get("css/styles.css")
+    asset = make_request("/static/css/styles.css", {"Accept-Encoding": "gzip"})
+    await run("styles.css cached, gzip", lambda r: static_file(r, "css/styles.css", css.digest), asset, n)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+bench_transcode.py — Transcoding ladder throughput, per core and across the pool.
+
+Builds a synthetic camera-like JPEG (gradient plus noise) and turns it into
+the configured ladder, first on one core in this process, then through
+FrameTranscoder's process pool with several frames in flight (as with
+several rooms streaming). Reports frames per second and per core, and the
+size of each rung.
+
+    python benchmarks/bench_transcode.py [--width 1280] [--height 720] [--ladder 900:40,480:35,240:30] [--seconds 5]
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("HISTORY_ARCHIVE_ENABLED", "false")
+
+from transcode import FrameTranscoder, Image, parse_ladder, transcode_ladder  # noqa: E402
+
+
+def sample_frame(width: int, height: int, quality: int) -> bytes:
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 40)
+    image = Image.merge("RGB", (gradient, noise, gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+    buf = io.BytesIO()
+    image.save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def single_core(frame: bytes, ladder, seconds: float) -> float:
+    done = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        transcode_ladder(frame, ladder)
+        done += 1
+    return done / (time.perf_counter() - start)
+
+
+async def pooled(frame: bytes, transcoder: FrameTranscoder, seconds: float, in_flight: int) -> float:
+    await transcoder.run(frame)  # start the workers outside the timing
+    done = 0
+    start = time.perf_counter()
+
+    async def feeder():
+        nonlocal done
+        while time.perf_counter() - start < seconds:
+            await transcoder.run(frame)
+            done += 1
+
+    await asyncio.gather(*(feeder() for _ in range(in_flight)))
+    return done / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--quality", type=int, default=80, help="JPEG quality of the source frame")
+    parser.add_argument("--ladder", default="900:40,480:35,240:30")
+    parser.add_argument("--workers", type=int, default=0, help="pool size (0 = one per core)")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if Image is None:
+        sys.exit("Pillow is not installed (pip install pillow)")
+    ladder = parse_ladder(args.ladder)
+    frame = sample_frame(args.width, args.height, args.quality)
+    renditions = transcode_ladder(frame, ladder)
+    print(f"source {args.width}x{args.height}: {len(frame) / 1024:,.1f} KiB")
+    for (width, quality), data in zip(ladder, renditions):
+        size = f"{len(data) / 1024:,.1f} KiB" if data else "source (narrower than rung)"
+        print(f"  {width:>5} px q{quality}: {size}")
+
+    fps = single_core(frame, ladder, args.seconds)
+    print(f"1 core, in process: {fps:7.1f} frames/s ({1000 / fps:.1f} ms per ladder)")
+
+    transcoder = FrameTranscoder(ladder, args.workers)
+    try:
+        fps = asyncio.run(pooled(frame, transcoder, args.seconds, transcoder.workers * 2))
+    finally:
+        transcoder.shutdown()
+    print(f"pool of {transcoder.workers}: {fps:7.1f} frames/s, {fps / transcoder.workers:.1f} per core")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+bench_viewer_join.py — Cost of a mass viewer join burst.
+
+Joins N in-memory viewers to a ConnectionManager as fast as possible, then
+disconnects them all, and counts the messages sent and the wall time until
+every viewer writer has drained. "eager" reproduces the old behaviour, an
+immediate viewer-count broadcast on every join and leave (O(N^2) sends);
+"coalesced" is the current debounced count.
+
+    python benchmarks/bench_viewer_join.py [--viewers 5000] [--interval 0.5]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("HISTORY_ARCHIVE_ENABLED", "false")
+
+from fanout import encode_message  # noqa: E402
+from main import ConnectionManager  # noqa: E402
+
+
+class CountingSocket:
+    sent = 0
+
+    async def send_text(self, text: str) -> None:
+        CountingSocket.sent += 1
+
+    async def send_bytes(self, data: bytes) -> None:
+        CountingSocket.sent += 1
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+class EagerCountManager(ConnectionManager):
+    """Broadcasts the count to every viewer on each join and leave, as before."""
+
+    def schedule_viewer_count(self) -> None:
+        # call_soon only so that a viewer kicked mid-broadcast does not recurse
+        message = encode_message({"type": "viewers", "count": self.get_viewer_count()})
+        asyncio.get_running_loop().call_soon(self._fan_out, message)
+
+
+async def drained(manager: ConnectionManager) -> None:
+    while any(channel.depth() for channel in manager.viewers.values()):
+        await asyncio.sleep(0.01)
+
+
+async def burst(manager_cls, viewers: int, interval: float) -> None:
+    manager = manager_cls()
+    manager.viewer_count_interval = interval
+    await manager.start()
+    sockets = [CountingSocket() for _ in range(viewers)]
+    CountingSocket.sent = 0
+
+    start = time.perf_counter()
+    for i, ws in enumerate(sockets):
+        await manager.connect_viewer(ws, f"viewer{i}")
+    await asyncio.sleep(0)
+    await drained(manager)
+    joined = time.perf_counter() - start
+    # Let the coalesced update go out too, so both sides send a final count
+    await asyncio.sleep(interval * 1.5)
+    await drained(manager)
+    join_sends = CountingSocket.sent
+
+    start = time.perf_counter()
+    for ws in sockets:
+        manager.disconnect_viewer(ws)
+    await asyncio.sleep(0)
+    left = time.perf_counter() - start
+    await manager.stop()
+
+    print(f"{manager_cls.__name__:>20}: join burst {joined * 1000:8.1f} ms, {join_sends:>10,} sends "
+          f"({join_sends / viewers:.1f}/viewer); leave burst {left * 1000:7.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--viewers", type=int, default=5000)
+    parser.add_argument("--interval", type=float, default=0.5, help="coalescing interval, seconds")
+    args = parser.parse_args()
+
+    print(f"{args.viewers} viewers joining at once")
+    asyncio.run(burst(EagerCountManager, args.viewers, args.interval))
+    asyncio.run(burst(ConnectionManager, args.viewers, args.interval))
+
+
+if __name__ == "__main__":
+    main()
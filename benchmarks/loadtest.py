@@ -0,0 +1,408 @@
+"""
+loadtest.py — Offline load generator for the /ws protocol.
+
+Connects one synthetic streamer and many viewers to a running server (or
+one it starts itself with --spawn) and drives them for --duration seconds:
+
+- the streamer sends binary frames at --fps, --frame-size bytes each, with
+  a send timestamp inside, so every viewer can time frame delivery;
+- viewers send chat, bid and buy_now at Poisson rates (per viewer, per
+  second), bidding a little above the last price they saw;
+- --slow-fraction of the viewers read slowly (--slow-delay per message),
+  the way a phone on a bad connection does.
+
+It reports p50/p90/p99 frame delivery latency, bid-to-price latency (from
+sending an accepted bid to each viewer receiving the new price), message
+and frame throughput, dropped connections (slow viewers the server kicked
+are counted separately), throttle notices and, when the server process is
+known, its memory growth. Results are written as JSON; pass a previous run
+as --baseline to compare, which exits non-zero on a regression beyond
+--tolerance.
+
+    python benchmarks/loadtest.py --spawn --viewers 500 --duration 20 --out baseline.json
+    python benchmarks/loadtest.py --spawn --viewers 500 --duration 20 --baseline baseline.json
+
+Uses the `websockets` client that uvicorn[standard] already installs.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import websockets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# JPEG start marker, frame number, send time (perf_counter); zero padding after
+_FRAME_HEADER = struct.Struct("!2sQd")
+_JPEG_SOI = b"\xff\xd8"
+
+# Metric -> (which direction is better, smallest absolute change that counts),
+# for --baseline comparisons. The floor keeps noise on tiny values (a few
+# ms, a few hundred KB) from failing a run.
+DIRECTIONS = {
+    "frame_latency_ms.p50": ("lower", 5.0),
+    "frame_latency_ms.p99": ("lower", 10.0),
+    "price_latency_ms.p50": ("lower", 5.0),
+    "price_latency_ms.p99": ("lower", 10.0),
+    "throughput.messages_per_s": ("higher", 0.0),
+    "throughput.frames_per_s": ("higher", 0.0),
+    "connections.dropped": ("lower", 0.0),
+    "server.rss_growth_mb": ("lower", 5.0),
+}
+
+
+def percentiles(samples: List[float]) -> dict:
+    if not samples:
+        return {"count": 0}
+    samples = sorted(samples)
+
+    def at(q: float) -> float:
+        return round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 3)
+
+    return {"count": len(samples), "p50": at(0.50), "p90": at(0.90), "p99": at(0.99), "max": at(1.0)}
+
+
+class Run:
+    """State shared by every simulated client in this process."""
+
+    def __init__(self, args):
+        self.args = args
+        self.stop = asyncio.Event()
+        self.measuring = False
+        self.prices: Dict[str, int] = {}
+        self.bids_sent: Dict[tuple, float] = {}  # (lot, amount) -> send time
+        # Normal and slow viewers are reported apart: slow readers' latency
+        # is mostly their own backlog
+        self.frame_latency: List[float] = []
+        self.price_latency: List[float] = []
+        self.slow_frame_latency: List[float] = []
+        self.slow_price_latency: List[float] = []
+        self.received = collections.Counter()
+        self.sent = collections.Counter()
+        self.bytes_received = 0
+        self.connected = 0
+        self.failed = 0
+        self.dropped = 0
+        self.slow_dropped = 0
+        self.close_codes = collections.Counter()
+        self.streamer_dropped = False
+
+    def on_text(self, text: str, now: float, slow: bool) -> None:
+        msg = json.loads(text)
+        kind = msg.get("type")
+        if self.measuring:
+            self.received[kind] += 1
+        if kind == "price":
+            self.prices[msg["lot"]] = max(self.prices.get(msg["lot"], 0), msg["current"])
+            sent_at = self.bids_sent.get((msg["lot"], msg["current"]))
+            if sent_at is not None and self.measuring:
+                (self.slow_price_latency if slow else self.price_latency).append(now - sent_at)
+        elif kind == "snapshot":
+            for lot, price in msg.get("prices", {}).items():
+                self.prices[lot] = max(self.prices.get(lot, 0), price)
+
+    def on_frame(self, data: bytes, now: float, slow: bool) -> None:
+        if not self.measuring:
+            return
+        self.received["frame"] += 1
+        if len(data) >= _FRAME_HEADER.size:
+            _, _, sent_at = _FRAME_HEADER.unpack_from(data)
+            (self.slow_frame_latency if slow else self.frame_latency).append(now - sent_at)
+
+
+async def streamer(run: Run, url: str) -> None:
+    args = run.args
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(json.dumps({"type": "join", "role": "streamer"}))
+        drain = asyncio.create_task(_discard(ws))
+        padding = bytes(max(0, args.frame_size - _FRAME_HEADER.size))
+        interval = 1.0 / args.fps
+        next_at = time.perf_counter()
+        n = 0
+        try:
+            while not run.stop.is_set():
+                n += 1
+                await ws.send(_FRAME_HEADER.pack(_JPEG_SOI, n, time.perf_counter()) + padding)
+                if run.measuring:
+                    run.sent["frame"] += 1
+                next_at += interval
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    next_at = time.perf_counter()  # fell behind: don't burst to catch up
+        except websockets.ConnectionClosed:
+            run.streamer_dropped = True
+        finally:
+            drain.cancel()
+
+
+async def _discard(ws) -> None:
+    try:
+        async for _ in ws:
+            pass
+    except websockets.ConnectionClosed:
+        pass
+
+
+async def viewer(run: Run, url: str, i: int, slow: bool) -> None:
+    args = run.args
+    try:
+        ws = await websockets.connect(url, max_size=None, open_timeout=30)
+    except Exception:
+        run.failed += 1
+        return
+    run.connected += 1
+    actor = None
+    try:
+        await ws.send(json.dumps({"type": "join", "role": "viewer", "username": f"load{i}"}))
+        actor = asyncio.create_task(act(run, ws))
+        # Runs until the server closes the socket or the run cancels us
+        async for message in ws:
+            now = time.perf_counter()
+            run.bytes_received += len(message)
+            if isinstance(message, bytes):
+                run.on_frame(message, now, slow)
+            else:
+                run.on_text(message, now, slow)
+            if slow:
+                await asyncio.sleep(args.slow_delay)
+    except websockets.ConnectionClosed:
+        pass
+    finally:
+        if actor:
+            actor.cancel()
+        await ws.close()
+    # Only reached when the server closed the connection
+    if not run.stop.is_set():
+        run.close_codes[ws.close_code or 1006] += 1
+        if slow:
+            run.slow_dropped += 1
+        else:
+            run.dropped += 1
+
+
+async def act(run: Run, ws) -> None:
+    """Chat, bid and buy_now at Poisson rates until the run stops."""
+    args = run.args
+    total = args.chat_rate + args.bid_rate + args.buy_now_rate
+    if total <= 0:
+        return
+    lots = args.lots.split(",")
+    while not run.stop.is_set():
+        await asyncio.sleep(random.expovariate(total))
+        if not run.measuring:
+            continue
+        pick = random.uniform(0, total)
+        lot = random.choice(lots)
+        if pick < args.chat_rate:
+            message = {"type": "chat", "text": "load test line {}".format(random.randrange(10 ** 6))}
+        elif pick < args.chat_rate + args.bid_rate:
+            amount = run.prices.get(lot, 1) + random.randint(1, 3)
+            run.bids_sent.setdefault((lot, amount), time.perf_counter())
+            message = {"type": "bid", "lot": lot, "amount": amount}
+        else:
+            message = {"type": "buy_now", "lot": lot}
+        try:
+            await ws.send(json.dumps(message))
+        except websockets.ConnectionClosed:
+            return
+        run.sent[message["type"]] += 1
+
+
+def rss_mb(pid: Optional[int]) -> Optional[float]:
+    if not pid:
+        return None
+    try:
+        with open("/proc/{}/status".format(pid)) as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def spawn_server(port: int) -> subprocess.Popen:
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    env = dict(
+        os.environ,
+        DATABASE_URL="sqlite+aiosqlite:///{}/loadtest.db".format(workdir),
+        HISTORY_ARCHIVE_ENABLED="false",
+        ANON_ID_SECRET_FILE="{}/anon_id_secret".format(workdir),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("server did not start on port {}".format(port))
+
+
+async def main_async(args, server_pid: Optional[int]) -> dict:
+    run = Run(args)
+    url = args.url + ("?room=" + args.room if args.room else "")
+    slow_count = int(args.viewers * args.slow_fraction)
+
+    # Ramp viewers up, then start measuring once everybody is in
+    tasks = []
+    for i in range(args.viewers):
+        tasks.append(asyncio.create_task(viewer(run, url, i, slow=i < slow_count)))
+        if args.ramp > 0:
+            await asyncio.sleep(args.ramp / args.viewers)
+    stream = asyncio.create_task(streamer(run, url))
+    await asyncio.sleep(1.0)
+
+    rss_start = rss_mb(server_pid)
+    rss_peak = rss_start
+    run.measuring = True
+    started = time.perf_counter()
+    while time.perf_counter() - started < args.duration:
+        await asyncio.sleep(min(1.0, args.duration))
+        rss = rss_mb(server_pid)
+        if rss is not None:
+            rss_peak = max(rss_peak, rss)
+    elapsed = time.perf_counter() - started
+    run.measuring = False
+    rss_end = rss_mb(server_pid)
+    run.stop.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(stream, *tasks, return_exceptions=True)
+
+    messages = sum(run.received.values())
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline", "tolerance")},
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "duration_s": round(elapsed, 2),
+        "frame_latency_ms": percentiles(run.frame_latency),
+        "price_latency_ms": percentiles(run.price_latency),
+        "slow_viewers": {
+            "frame_latency_ms": percentiles(run.slow_frame_latency),
+            "price_latency_ms": percentiles(run.slow_price_latency),
+        },
+        "throughput": {
+            "messages_per_s": round(messages / elapsed, 1),
+            "frames_per_s": round(run.received["frame"] / elapsed, 1),
+            "mb_per_s": round(run.bytes_received / elapsed / 1e6, 2),
+            "frames_sent": run.sent["frame"],
+            "received_by_type": dict(run.received),
+            "sent_by_type": dict(run.sent),
+        },
+        "connections": {
+            "viewers": args.viewers,
+            "connected": run.connected,
+            "failed": run.failed,
+            "dropped": run.dropped,
+            "slow_dropped": run.slow_dropped,
+            "streamer_dropped": run.streamer_dropped,
+            "close_codes": {str(code): n for code, n in run.close_codes.items()},
+        },
+        "throttled": run.received["throttled"],
+        "server": {
+            "rss_start_mb": rss_start and round(rss_start, 1),
+            "rss_end_mb": rss_end and round(rss_end, 1),
+            "rss_peak_mb": rss_peak and round(rss_peak, 1),
+            "rss_growth_mb": round(rss_end - rss_start, 1) if rss_start and rss_end else None,
+        },
+    }
+
+
+def lookup(results: dict, path: str):
+    value = results
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """One line per metric; those starting with 'REGRESSION' fail the run."""
+    lines = []
+    for path, (better, floor) in DIRECTIONS.items():
+        new, old = lookup(results, path), lookup(baseline, path)
+        if not isinstance(new, (int, float)) or not isinstance(old, (int, float)):
+            continue
+        change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+        worse = change > tolerance if better == "lower" else change < -tolerance
+        worse = worse and abs(new - old) > floor
+        label = "REGRESSION" if worse else "ok"
+        lines.append("{:<10} {:<28} {:>12} -> {:<12} ({:+.1%})".format(label, path, old, new, change)
+                     if change != float("inf") else "{:<10} {:<28} {:>12} -> {}".format(label, path, old, new))
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="ws://127.0.0.1:50260/ws")
+    parser.add_argument("--room", default="", help="room id (default: the server's default room)")
+    parser.add_argument("--spawn", action="store_true", help="start a server on --port with a scratch database")
+    parser.add_argument("--port", type=int, default=50990)
+    parser.add_argument("--server-pid", type=int, help="server process to sample memory from")
+    parser.add_argument("--viewers", type=int, default=500)
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds over which viewers connect")
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds")
+    parser.add_argument("--fps", type=float, default=15.0)
+    parser.add_argument("--frame-size", type=int, default=20000, help="bytes per frame")
+    parser.add_argument("--chat-rate", type=float, default=0.05, help="chat lines per viewer per second")
+    parser.add_argument("--bid-rate", type=float, default=0.02, help="bids per viewer per second")
+    parser.add_argument("--buy-now-rate", type=float, default=0.001, help="buy_now per viewer per second")
+    parser.add_argument("--lots", default="1,2,3")
+    parser.add_argument("--slow-fraction", type=float, default=0.05, help="share of viewers that read slowly")
+    parser.add_argument("--slow-delay", type=float, default=0.2, help="seconds a slow viewer takes per message")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    server = None
+    server_pid = args.server_pid
+    if args.spawn:
+        server = spawn_server(args.port)
+        server_pid = server.pid
+        args.url = "ws://127.0.0.1:{}/ws".format(args.port)
+    try:
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
+        results = asyncio.run(main_async(args, server_pid))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        lines = compare(results, baseline, args.tolerance)
+        print("\n".join(lines))
+        if any(line.startswith("REGRESSION") for line in lines):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
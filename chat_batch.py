@@ -0,0 +1,65 @@
+"""
+chat_batch.py — Windowed chat aggregation for the live fan-out.
+
+Instead of one WebSocket message per chat line per viewer, ChatAggregator
+collects the lines applied during a short window and emits a single
+`chat_batch` message, so a busy chat costs each viewer one send (and one
+DOM update) per window. When more than `max_per_window` lines arrive in a
+window, a uniform random sample of them is sent, in arrival order, along
+with how many were left out. Chat history and the archive still see every
+line; only the live wire is sampled.
+"""
+import asyncio
+import random
+from typing import Callable, List, Optional, Tuple
+
+
+class ChatAggregator:
+    def __init__(self, window: float, max_per_window: int, emit: Callable[[dict], None]):
+        self.window = window
+        self.max_per_window = max_per_window
+        self._emit = emit
+        self._batch: List[Tuple[int, dict]] = []  # (arrival index, line)
+        self._seen = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.batches = 0
+        self.lines_sent = 0
+        self.lines_sampled_out = 0
+
+    def add(self, username: str, text: str) -> None:
+        line = {"username": username, "text": text}
+        index = self._seen
+        self._seen += 1
+        if len(self._batch) < self.max_per_window:
+            self._batch.append((index, line))
+        else:
+            # Reservoir sampling: every line in the window has the same
+            # chance of making it into the batch.
+            slot = random.randrange(self._seen)
+            if slot < self.max_per_window:
+                self._batch[slot] = (index, line)
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+
+    def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._batch:
+            return
+        self._batch.sort(key=lambda item: item[0])
+        lines = [line for _, line in self._batch]
+        dropped = self._seen - len(lines)
+        self._batch = []
+        self._seen = 0
+        self.batches += 1
+        self.lines_sent += len(lines)
+        self.lines_sampled_out += dropped
+        self._emit({"type": "chat_batch", "messages": lines, "dropped": dropped})
+
+    def close(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._batch = []
+        self._seen = 0
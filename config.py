@@ -11,7 +11,39 @@ DATABASE_URL = os.getenv(
     "sqlite+aiosqlite:///./app.db"
 )
 
+# Connection pool per worker (SQLite: readers run in parallel under WAL,
+# writers queue for up to SQLITE_BUSY_TIMEOUT_MS instead of failing)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+SQLITE_WAL = os.getenv("SQLITE_WAL", "true").lower() == "true"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
 SESSION_EXPIRE_DAYS = int(os.getenv("SESSION_EXPIRE_DAYS", "30"))
+# Expired sessions are deleted every SESSION_REAP_INTERVAL_SECONDS, at most
+# SESSION_REAP_BATCH_SIZE rows per transaction so requests are never locked out
+SESSION_REAP_INTERVAL_SECONDS = float(os.getenv("SESSION_REAP_INTERVAL_SECONDS", "600"))
+SESSION_REAP_BATCH_SIZE = int(os.getenv("SESSION_REAP_BATCH_SIZE", "250"))
+
+# Google ID token verification. GOOGLE_CERTS_FILE is an optional JSON file of
+# {key id: PEM certificate} used instead of fetching Google's certs (offline testing)
+GOOGLE_CERTS_FILE = os.getenv("GOOGLE_CERTS_FILE", "")
+GOOGLE_VERIFY_WORKERS = int(os.getenv("GOOGLE_VERIFY_WORKERS", "4"))
+
+# In-process session token -> user cache
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+
+# HMAC key for the anonymous visitor cookie that bans key on; empty = a
+# random key kept in ANON_ID_SECRET_FILE and shared by all workers
+ANON_ID_SECRET = os.getenv("ANON_ID_SECRET", "")
+ANON_ID_SECRET_FILE = os.getenv("ANON_ID_SECRET_FILE", ".anon_id_secret")
+ANON_ID_MAX_AGE_DAYS = int(os.getenv("ANON_ID_MAX_AGE_DAYS", "365"))
+
+# Shared secret for /admin/* endpoints (sent as X-Admin-Token); empty =
+# the admin endpoints are disabled (404)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# Bearer token for GET /metrics (empty = no auth, e.g. behind a private network)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
 
 # SMTP email settings
 SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
@@ -21,3 +53,103 @@ SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "evou hcwn attk zrjq")
 SMTP_FROM = os.getenv("SMTP_FROM", "noreply@ukraineboost.com")
 SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
 STREAM_URL = os.getenv("STREAM_URL", "http://localhost:50260/stream")
+
+# Notification pipeline: pooled SMTP connections, capped concurrency and rate
+# (EMAIL_RATE_PER_SECOND=0 sends as fast as the pool allows)
+EMAIL_POOL_SIZE = int(os.getenv("EMAIL_POOL_SIZE", "4"))
+EMAIL_CONCURRENCY = int(os.getenv("EMAIL_CONCURRENCY", "8"))
+EMAIL_RATE_PER_SECOND = float(os.getenv("EMAIL_RATE_PER_SECOND", "20"))
+EMAIL_CHUNK_SIZE = int(os.getenv("EMAIL_CHUNK_SIZE", "500"))
+EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", "3"))
+EMAIL_RETRY_BACKOFF_SECONDS = float(os.getenv("EMAIL_RETRY_BACKOFF_SECONDS", "1.0"))
+# Recipients are read from the DB in batches of this size
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "500"))
+# Minimum time between two stream-started notification runs for one room,
+# and between any two runs at all (room ids are free to make up)
+NOTIFY_COOLDOWN_SECONDS = float(os.getenv("NOTIFY_COOLDOWN_SECONDS", "900"))
+NOTIFY_GLOBAL_COOLDOWN_SECONDS = float(os.getenv("NOTIFY_GLOBAL_COOLDOWN_SECONDS", "60"))
+
+# Event backplane shared by workers: "" for a single process, or
+# "unix:/tmp/live_auction.sock" to run uvicorn with --workers N on one host
+BACKPLANE_URL = os.getenv("BACKPLANE_URL", "")
+# How long a new worker waits for a peer to send it the current live state
+SYNC_TIMEOUT_SECONDS = float(os.getenv("SYNC_TIMEOUT_SECONDS", "1.0"))
+
+# WebSocket fan-out
+VIEWER_QUEUE_SIZE = int(os.getenv("VIEWER_QUEUE_SIZE", "64"))
+VIEWER_MAX_BACKLOG_SECONDS = float(os.getenv("VIEWER_MAX_BACKLOG_SECONDS", "10"))
+# The streamer's console is only cut off (ending the stream) after much longer
+STREAMER_MAX_BACKLOG_SECONDS = float(os.getenv("STREAMER_MAX_BACKLOG_SECONDS", "60"))
+# Inbound WebSocket text messages: overall cap, and per-field limits
+WS_MAX_MESSAGE_SIZE = int(os.getenv("WS_MAX_MESSAGE_SIZE", "4096"))
+CHAT_MAX_LENGTH = int(os.getenv("CHAT_MAX_LENGTH", "500"))
+USERNAME_MAX_LENGTH = int(os.getenv("USERNAME_MAX_LENGTH", "64"))
+
+
+def _parse_rate_limits(spec: str) -> dict:
+    limits = {}
+    for item in spec.split(","):
+        if item.strip():
+            msg_type, _, limit = item.partition(":")
+            rate, _, burst = limit.partition("/")
+            limits[msg_type.strip()] = (float(rate), float(burst))
+    return limits
+
+
+# Flood protection: "type:rate/burst" per message type, per connection and
+# per signed-in user. Types not listed are not limited; "" disables all.
+RATE_LIMITS = _parse_rate_limits(os.getenv("RATE_LIMITS", "chat:1/5,bid:3/10,buy_now:1/3,set_username:0.2/3"))
+
+# Viewer-count updates are sent at most once per interval, with the latest count
+VIEWER_COUNT_INTERVAL_SECONDS = float(os.getenv("VIEWER_COUNT_INTERVAL_SECONDS", "0.5"))
+# Per-viewer frame pacing bounds; each viewer's rate adapts in between
+FRAME_MIN_FPS = float(os.getenv("FRAME_MIN_FPS", "2"))
+FRAME_MAX_FPS = float(os.getenv("FRAME_MAX_FPS", "30"))
+# Optional transcoding ladder (needs Pillow): every frame is also re-encoded
+# as "width:jpeg quality" rungs in a process pool (0 workers = one per core);
+# each viewer gets the best rung it can drain at TRANSCODE_TARGET_FPS
+TRANSCODE_ENABLED = os.getenv("TRANSCODE_ENABLED", "false").lower() == "true"
+TRANSCODE_LADDER = os.getenv("TRANSCODE_LADDER", "900:40,480:35,240:30")
+TRANSCODE_WORKERS = int(os.getenv("TRANSCODE_WORKERS", "0"))
+TRANSCODE_TARGET_FPS = float(os.getenv("TRANSCODE_TARGET_FPS", "10"))
+
+# Static files and pages are served from memory; how often (seconds) each
+# file's mtime is checked for changes on disk
+STATIC_CHECK_INTERVAL_SECONDS = float(os.getenv("STATIC_CHECK_INTERVAL_SECONDS", "1.0"))
+
+# Event-loop watchdog: the loop is stalled once its heartbeat is this late;
+# the blocking stack is kept for the last LOOP_STALL_HISTORY stalls
+LOOP_WATCHDOG_ENABLED = os.getenv("LOOP_WATCHDOG_ENABLED", "true").lower() == "true"
+LOOP_STALL_THRESHOLD_MS = float(os.getenv("LOOP_STALL_THRESHOLD_MS", "100"))
+LOOP_STALL_HISTORY = int(os.getenv("LOOP_STALL_HISTORY", "50"))
+
+# Rooms: one stream + auction each, addressed as /ws?room=<id> (the page's
+# ?room=). A room nobody is connected to is closed after ROOM_IDLE_SECONDS.
+DEFAULT_ROOM = os.getenv("DEFAULT_ROOM", "main")
+ROOM_IDLE_SECONDS = float(os.getenv("ROOM_IDLE_SECONDS", "30"))
+ROOMS_MAX = int(os.getenv("ROOMS_MAX", "1000"))
+
+# Auction lots (the products shown on the stream page) and their start price
+AUCTION_LOTS = [lot.strip() for lot in os.getenv("AUCTION_LOTS", "1,2,3").split(",") if lot.strip()]
+AUCTION_START_PRICE = int(os.getenv("AUCTION_START_PRICE", "1"))
+# Highest accepted bid; at most 2**63-1, what the bids table can store
+AUCTION_MAX_BID = min(int(os.getenv("AUCTION_MAX_BID", str(2 ** 63 - 1))), 2 ** 63 - 1)
+
+# Chat / bid history: in-memory ring depth (what a joining client is sent)
+CHAT_HISTORY_SIZE = int(os.getenv("CHAT_HISTORY_SIZE", "20"))
+BID_HISTORY_SIZE = int(os.getenv("BID_HISTORY_SIZE", "10"))
+# Optional DB archive of the full chat history, written in batches off the hot path
+HISTORY_ARCHIVE_ENABLED = os.getenv("HISTORY_ARCHIVE_ENABLED", "true").lower() == "true"
+HISTORY_ARCHIVE_BATCH_SIZE = int(os.getenv("HISTORY_ARCHIVE_BATCH_SIZE", "500"))
+HISTORY_ARCHIVE_FLUSH_SECONDS = float(os.getenv("HISTORY_ARCHIVE_FLUSH_SECONDS", "1.0"))
+HISTORY_ARCHIVE_MAX_PENDING = int(os.getenv("HISTORY_ARCHIVE_MAX_PENDING", "50000"))
+# Live chat is sent as one chat_batch message per window (0 = every line on
+# its own); past the cap a window's lines are randomly sampled
+CHAT_BATCH_WINDOW_MS = float(os.getenv("CHAT_BATCH_WINDOW_MS", "100"))
+CHAT_BATCH_MAX_LINES = int(os.getenv("CHAT_BATCH_MAX_LINES", "50"))
+# Durable bid ledger: longest an accepted bid waits for its group commit
+# (0 = commit as soon as the event loop is free), max bids per commit, and
+# the uncommitted backlog past which new bids are refused
+BID_LEDGER_COMMIT_MS = float(os.getenv("BID_LEDGER_COMMIT_MS", "50"))
+BID_LEDGER_BATCH_SIZE = int(os.getenv("BID_LEDGER_BATCH_SIZE", "500"))
+BID_LEDGER_MAX_PENDING = int(os.getenv("BID_LEDGER_MAX_PENDING", "50000"))
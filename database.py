@@ -1,9 +1,41 @@
+import logging
+
+from sqlalchemy import event, make_url
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from config import DATABASE_URL, DB_MAX_OVERFLOW, DB_POOL_SIZE, SQLITE_BUSY_TIMEOUT_MS, SQLITE_WAL
+
+logger = logging.getLogger(__name__)
+
+_url = make_url(DATABASE_URL)
+_IS_SQLITE = _url.get_backend_name() == "sqlite"
+_SQLITE_FILE = _IS_SQLITE and _url.database not in (None, "", ":memory:")
 
-from config import DATABASE_URL
+_engine_options = {}
+if not _IS_SQLITE:
+    _engine_options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+elif _SQLITE_FILE:
+    # aiosqlite defaults to no pooling, i.e. a new connection (and thread)
+    # per request; a file database can keep its connections open.
+    _engine_options.update(poolclass=AsyncAdaptedQueuePool, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
 
-engine = create_async_engine(DATABASE_URL, echo=False)
+engine = create_async_engine(DATABASE_URL, echo=False, **_engine_options)
+
+if _IS_SQLITE:
+    @event.listens_for(engine.sync_engine, "connect")
+    def _sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # Wait for another writer (a worker, the ledger, the reaper) instead
+        # of failing at once with "database is locked"
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        if SQLITE_WAL:
+            # Durable at every checkpoint; with WAL a crash can only lose the
+            # last commits, never corrupt the database
+            cursor.execute("PRAGMA synchronous = NORMAL")
+        cursor.close()
 
 AsyncSessionLocal = sessionmaker(
     bind=engine,
@@ -21,9 +53,34 @@ async def get_db():
         yield session
 
 
+def _create_schema(sync_conn) -> None:
+    Base.metadata.create_all(sync_conn)
+    # create_all skips the indexes of tables that already exist
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
 async def init_db():
-    """Create all tables on startup."""
-    async with engine.begin() as conn:
-        # Import models so Base.metadata is populated
-        import models  # noqa: F401
-        await conn.run_sync(Base.metadata.create_all)
+    """Create all tables and indexes on startup; switch SQLite to WAL."""
+    # Import models so Base.metadata is populated
+    import models  # noqa: F401
+    if _SQLITE_FILE and SQLITE_WAL:
+        # Readers no longer block the writer (and vice versa). The mode is
+        # stored in the database file, so this only does work the first time.
+        async with engine.connect() as conn:
+            mode = (await conn.exec_driver_sql("PRAGMA journal_mode = WAL")).scalar()
+            if mode != "wal":
+                logger.warning("Could not switch SQLite to WAL (journal mode: %s)", mode)
+    try:
+        async with engine.begin() as conn:
+            if _IS_SQLITE:
+                # Hold the write lock from the existence checks to the last
+                # CREATE: workers starting together take turns (busy_timeout)
+                await conn.exec_driver_sql("BEGIN IMMEDIATE")
+            await conn.run_sync(_create_schema)
+    except OperationalError:
+        # With several workers starting at once, another one may have created
+        # a table between our existence check and CREATE; the retry skips it.
+        async with engine.begin() as conn:
+            await conn.run_sync(_create_schema)
@@ -3,18 +3,50 @@ email_service.py — Async SMTP email notifications for stream events.
 """
 import asyncio
 import logging
+import random
+import time
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from typing import List
+from typing import AsyncIterator, Dict, List, Optional
+from urllib.parse import quote
 
 import aiosmtplib
+from sqlalchemy import select
 
-from config import SMTP_FROM, SMTP_HOST, SMTP_PASSWORD, SMTP_PORT, SMTP_USE_TLS, SMTP_USER, STREAM_URL
+from config import (
+    EMAIL_CHUNK_SIZE,
+    EMAIL_CONCURRENCY,
+    EMAIL_MAX_RETRIES,
+    EMAIL_POOL_SIZE,
+    EMAIL_RATE_PER_SECOND,
+    EMAIL_RETRY_BACKOFF_SECONDS,
+    NOTIFY_BATCH_SIZE,
+    NOTIFY_COOLDOWN_SECONDS,
+    NOTIFY_GLOBAL_COOLDOWN_SECONDS,
+    SMTP_FROM,
+    SMTP_HOST,
+    SMTP_PASSWORD,
+    SMTP_PORT,
+    SMTP_USE_TLS,
+    SMTP_USER,
+    STREAM_URL,
+)
+from metrics import REGISTRY
+from models import User
+from ratelimit import TokenBucket
 
 logger = logging.getLogger(__name__)
 
+EMAILS = REGISTRY.counter("emails_total", "Stream notification emails by outcome", ("result",))
+EMAIL_SEND_SECONDS = REGISTRY.histogram("email_send_seconds", "SMTP send time per message")
 
-def _build_stream_started_email(to_email: str, user_name: str) -> MIMEMultipart:
+
+def stream_link(room: str) -> str:
+    """Viewer page URL for one room."""
+    return f"{STREAM_URL}{'&' if '?' in STREAM_URL else '?'}room={quote(room, safe='')}"
+
+
+def _build_stream_started_email(to_email: str, user_name: str, link: str = STREAM_URL) -> MIMEMultipart:
     """Build a nicely formatted HTML email for stream-start notification."""
     msg = MIMEMultipart("alternative")
     msg["From"] = f"UkraineBoost <{SMTP_FROM}>"
@@ -24,7 +56,7 @@ def _build_stream_started_email(to_email: str, user_name: str) -> MIMEMultipart:
     plain = f"""Привіт, {user_name}!
 
 Стрім на UkraineBoost тільки що розпочався!
-Приєднуйтесь прямо зараз: {STREAM_URL}
+Приєднуйтесь прямо зараз: {link}
 
 Не пропустіть аукціон — зробіть свою ставку!
 
@@ -57,7 +89,7 @@ UkraineBoost
               Приєднуйтесь прямо зараз, щоб переглянути нові товари та взяти участь в аукціоні!
             </p>
             <table cellpadding="0" cellspacing="0" width="100%"><tr><td align="center">
-              <a href="{STREAM_URL}" 
+              <a href="{link}" 
                  style="display:inline-block;background:#e63946;color:#fff;text-decoration:none;
                         padding:12px 32px;border-radius:8px;font-size:15px;font-weight:600;
                         letter-spacing:0.02em;">
@@ -109,26 +141,315 @@ async def send_email(to_email: str, message: MIMEMultipart) -> bool:
         return False
 
 
-async def notify_stream_started(users: List[dict]) -> int:
+class PipelineStats:
+    """Counters for one notification run."""
+
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def to_dict(self) -> dict:
+        elapsed = self.elapsed
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "elapsed_seconds": round(elapsed, 3),
+            "messages_per_second": round(self.sent / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+
+class SMTPPool:
+    """A few long-lived, already authenticated SMTP connections shared by all senders."""
+
+    def __init__(self, size: int, **smtp_kwargs):
+        self.size = size
+        self._smtp_kwargs = smtp_kwargs
+        self._slots = asyncio.Semaphore(size)
+        self._idle: List[aiosmtplib.SMTP] = []
+
+    async def acquire(self) -> aiosmtplib.SMTP:
+        await self._slots.acquire()
+        if self._idle:
+            return self._idle.pop()
+        client = aiosmtplib.SMTP(**self._smtp_kwargs)
+        try:
+            await client.connect()  # STARTTLS + login happen here
+        except Exception:
+            self._slots.release()
+            raise
+        return client
+
+    def release(self, client: aiosmtplib.SMTP) -> None:
+        self._idle.append(client)
+        self._slots.release()
+
+    def discard(self, client: aiosmtplib.SMTP) -> None:
+        """Drop a broken connection; the next acquire() opens a fresh one."""
+        client.close()
+        self._slots.release()
+
+    async def close(self) -> None:
+        while self._idle:
+            client = self._idle.pop()
+            try:
+                await client.quit()
+            except Exception:
+                client.close()
+
+
+def _is_transient(exc: Exception) -> bool:
+    """Connection trouble and 4xx replies are worth retrying; 5xx are not."""
+    if isinstance(exc, (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError,
+                        aiosmtplib.SMTPTimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    if isinstance(exc, aiosmtplib.SMTPRecipientsRefused):
+        return all(400 <= r.code < 500 for r in exc.recipients)
+    if isinstance(exc, aiosmtplib.SMTPResponseException):
+        return 400 <= exc.code < 500
+    return False
+
+
+async def _iter_recipients(recipients) -> AsyncIterator[dict]:
+    """Accepts a list of user dicts or an async iterable of dicts / chunks of dicts."""
+    if hasattr(recipients, "__aiter__"):
+        async for item in recipients:
+            if isinstance(item, dict):
+                yield item
+            else:
+                for user in item:
+                    yield user
+    else:
+        for user in recipients:
+            yield user
+
+
+class NotificationPipeline:
     """
-    Send stream-started notification to a list of users.
-    Each user dict should have 'email' and 'name' keys.
-    Returns the number of successfully sent emails.
+    Sends stream-started emails through a small SMTP connection pool.
+
+    Recipients are pulled lazily from a bounded queue, so only about
+    `chunk_size` of them (and `concurrency` MIME messages) per run are in
+    memory at once. The SMTP pool and the rate limit belong to the pipeline,
+    not to a run: runs that overlap (streams starting in several rooms)
+    share `pool_size` connections and `rate_per_second` between them.
+    Transient failures are retried with exponential backoff. Point
+    hostname/port at a local aiosmtpd server (no credentials,
+    start_tls=False) to test it.
+    """
+
+    def __init__(
+        self,
+        hostname: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        username: Optional[str] = SMTP_USER,
+        password: Optional[str] = SMTP_PASSWORD,
+        start_tls: bool = SMTP_USE_TLS,
+        pool_size: int = EMAIL_POOL_SIZE,
+        concurrency: int = EMAIL_CONCURRENCY,
+        rate_per_second: float = EMAIL_RATE_PER_SECOND,
+        chunk_size: int = EMAIL_CHUNK_SIZE,
+        max_retries: int = EMAIL_MAX_RETRIES,
+        retry_backoff: float = EMAIL_RETRY_BACKOFF_SECONDS,
+    ):
+        self._smtp_kwargs = dict(
+            hostname=hostname,
+            port=port,
+            username=username or None,
+            password=password or None,
+            start_tls=start_tls,
+        )
+        self.pool_size = pool_size
+        self.concurrency = concurrency
+        self.rate_per_second = rate_per_second
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._pool = SMTPPool(pool_size, **self._smtp_kwargs)
+        # A rate of 0 (or less) means no limit
+        self._bucket = TokenBucket(rate_per_second, burst=max(1.0, rate_per_second)) if rate_per_second > 0 else None
+        self._runs = 0
+
+    async def run(self, recipients, link: str = STREAM_URL) -> PipelineStats:
+        """Mail every recipient a stream-started email whose button points at `link`."""
+        stats = PipelineStats()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.chunk_size)
+
+        async def worker() -> None:
+            while True:
+                user = await queue.get()
+                if user is None:
+                    return
+                try:
+                    await self._send_one(stats, user, link)
+                except Exception as e:
+                    # A dead worker would leave the producer blocked on a full queue
+                    logger.error("Failed to send email to %s: %s", user["email"], e)
+                    stats.failed += 1
+                    EMAILS.labels("failed").inc()
+
+        self._runs += 1
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            async for user in _iter_recipients(recipients):
+                if user.get("email"):
+                    await queue.put(user)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for w in workers:
+                w.cancel()
+            self._runs -= 1
+            if not self._runs:
+                # Idle connections are not kept between runs
+                await self._pool.close()
+            stats.finished_at = time.monotonic()
+        return stats
+
+    async def _send_one(self, stats: PipelineStats, user: dict, link: str) -> None:
+        pool, bucket = self._pool, self._bucket
+        email = user["email"]
+        message = _build_stream_started_email(email, user.get("name") or "Користувач", link)
+        for attempt in range(self.max_retries + 1):
+            wait = bucket.reserve() if bucket else 0.0
+            if wait:
+                await asyncio.sleep(wait)
+            client = None
+            try:
+                client = await pool.acquire()
+                started = time.perf_counter()
+                await client.send_message(message)
+                EMAIL_SEND_SECONDS.observe(time.perf_counter() - started)
+                pool.release(client)
+                stats.sent += 1
+                EMAILS.labels("sent").inc()
+                return
+            except Exception as e:
+                if client is not None:
+                    if isinstance(e, aiosmtplib.SMTPResponseException) and client.is_connected:
+                        pool.release(client)
+                    else:
+                        pool.discard(client)
+                if not _is_transient(e) or attempt == self.max_retries:
+                    logger.error("Failed to send email to %s: %s", email, e)
+                    stats.failed += 1
+                    EMAILS.labels("failed").inc()
+                    return
+                stats.retried += 1
+                EMAILS.labels("retried").inc()
+                delay = self.retry_backoff * (2 ** attempt) * (0.5 + random.random())
+                await asyncio.sleep(delay)
+
+
+async def notify_stream_started(
+    users, link: str = STREAM_URL, pipeline: Optional[NotificationPipeline] = None,
+) -> int:
+    """
+    Send stream-started notification, linking to `link`, to a list of users.
+    Each user dict should have 'email' and 'name' keys. `users` may also be an
+    async iterable of such dicts (or of lists of them), consumed as it goes.
+    Pass a long-lived `pipeline` to share its SMTP pool and rate limit with
+    other runs. Returns the number of successfully sent emails.
     """
     if not SMTP_USER or not SMTP_PASSWORD:
-        logger.warning("SMTP not configured — skipping %d notifications", len(users))
+        logger.warning("SMTP not configured — skipping stream notifications")
         return 0
 
-    tasks = []
-    for user in users:
-        email = user.get("email")
-        name = user.get("name", "Користувач")
-        if not email:
-            continue
-        msg = _build_stream_started_email(email, name)
-        tasks.append(send_email(email, msg))
-
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    sent = sum(1 for r in results if r is True)
-    logger.info("Stream notifications: %d/%d sent successfully", sent, len(tasks))
-    return sent
+    stats = await (pipeline or NotificationPipeline()).run(users, link)
+    logger.info("Stream notifications: %s", stats.to_dict())
+    return stats.sent
+
+
+async def stream_recipients(session_factory, batch_size: int = NOTIFY_BATCH_SIZE) -> AsyncIterator[List[dict]]:
+    """
+    Yield registered users as chunks of {"email", "name"} dicts, reading only
+    those two columns a page at a time (keyset pagination on id). Each page
+    uses its own short session, so no connection or read transaction stays
+    open while the chunk before it is being mailed.
+    """
+    last_id = 0
+    while True:
+        async with session_factory() as db:
+            result = await db.execute(
+                select(User.id, User.email, User.name).where(User.id > last_id).order_by(User.id).limit(batch_size)
+            )
+            rows = result.all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        yield [{"email": email, "name": name} for _, email, name in rows]
+        if len(rows) < batch_size:
+            return
+
+
+class StreamStartNotifier:
+    """
+    Fires stream-started notifications in the background, at most once per
+    room per cooldown window, so a streamer reconnecting a few times does
+    not email everyone again each time (while a stream starting in another
+    room still goes out). Fresh room ids are free, so on top of that runs
+    start at most once per `global_cooldown` across all rooms, and every
+    run goes through one shared NotificationPipeline (one SMTP pool, one
+    rate limit).
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        cooldown: float = NOTIFY_COOLDOWN_SECONDS,
+        global_cooldown: float = NOTIFY_GLOBAL_COOLDOWN_SECONDS,
+        pipeline: Optional[NotificationPipeline] = None,
+    ):
+        self._session_factory = session_factory
+        self.cooldown = cooldown
+        self.global_cooldown = global_cooldown
+        self._pipeline = pipeline
+        self._last_started: Dict[str, float] = {}
+        self._last_any: Optional[float] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    @property
+    def pipeline(self) -> NotificationPipeline:
+        # Created on first use, inside the running event loop
+        if self._pipeline is None:
+            self._pipeline = NotificationPipeline()
+        return self._pipeline
+
+    def trigger(self, room: str) -> bool:
+        """Start a notification run for `room` unless one is running or ran recently."""
+        now = time.monotonic()
+        task = self._tasks.get(room)
+        if task and not task.done():
+            return False
+        last = self._last_started.get(room)
+        if last is not None and now - last < self.cooldown:
+            logger.info("Stream notifications for room %s sent %.0fs ago — skipping", room, now - last)
+            return False
+        if self._last_any is not None and now - self._last_any < self.global_cooldown:
+            logger.info("Stream notifications for another room sent %.0fs ago — skipping room %s",
+                        now - self._last_any, room)
+            return False
+        # Forget rooms whose window has passed, so the maps stay small
+        for stale in [r for r, t in self._last_started.items() if now - t >= self.cooldown]:
+            del self._last_started[stale]
+            if self._tasks.get(stale) is None or self._tasks[stale].done():
+                self._tasks.pop(stale, None)
+        self._last_started[room] = now
+        self._last_any = now
+        self._tasks[room] = asyncio.create_task(self._run(room))
+        return True
+
+    async def _run(self, room: str) -> None:
+        try:
+            await notify_stream_started(stream_recipients(self._session_factory), stream_link(room), self.pipeline)
+        except Exception as e:
+            logger.error("Stream notifications for room %s failed: %s", room, e)
@@ -0,0 +1,314 @@
+"""
+fanout.py — Per-connection outbound queues for WebSocket fan-out.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple, Union
+
+from fastapi import WebSocket
+
+from metrics import REGISTRY
+from protocol import dumps
+
+logger = logging.getLogger(__name__)
+
+# Message types that must reach the client no matter how far behind it is.
+NEVER_DROP = frozenset({"bid", "price", "live_status", "you_are_banned", "snapshot", "ban_delta"})
+
+SENT = REGISTRY.counter("ws_sent_total", "Messages sent to clients", ("kind",))
+SEND_SECONDS = REGISTRY.histogram("ws_send_seconds", "Time to hand one message to a client socket", ("kind",))
+DROPPED = REGISTRY.counter("ws_dropped_total", "Queued messages dropped for slow clients")
+KICKED = REGISTRY.counter("ws_kicked_total", "Clients disconnected for staying backlogged")
+SEND_ERRORS = REGISTRY.counter("ws_send_errors_total", "Sends that failed on a dead socket")
+# Children looked up once, not per send
+_SENT_MESSAGE, _SENT_FRAME = SENT.labels("message"), SENT.labels("frame")
+_SECONDS_MESSAGE, _SECONDS_FRAME = SEND_SECONDS.labels("message"), SEND_SECONDS.labels("frame")
+
+# NEVER_DROP messages may push a queue past maxsize, but not to this many
+# times maxsize: a client that far behind is disconnected at once, whether
+# or not it has a backlog timeout.
+MAX_OVERFLOW = 4
+
+# A viewer on a lower tier moves back up only after this many frames in a
+# row that would have fit the better one. A link only shows its real speed
+# once it is saturated, so each drop doubles the wait before the next try
+# (up to TIER_UPGRADE_BACKOFF times), or a viewer would flap between tiers.
+TIER_UPGRADE_FRAMES = 10
+TIER_UPGRADE_BACKOFF = 32
+
+# (message type, encoded payload) — the payload is shared by every recipient.
+# Text payloads are JSON; bytes payloads (video frames) go out as binary.
+Outbound = Tuple[Optional[str], Union[str, bytes]]
+
+
+def encode_message(message: dict) -> Outbound:
+    """Serialize a message once, in the same format WebSocket.send_json uses."""
+    return message.get("type"), dumps(message)
+
+
+class FrameSlot:
+    """
+    Single-slot holder for the newest video frame.
+
+    Publishing replaces the previous frame instead of queueing it; readers
+    remember the sequence number they last sent and skip straight to
+    whatever is newest when they are ready for another frame.
+
+    With transcoding on, the slot also holds a ladder of lower-quality
+    renditions of a recent frame (tier 1, 2, ...; tier 0 is the original).
+    They usually trail the original by a frame or two; once they are more
+    than max_lag frames behind, every tier falls back to the original.
+    """
+
+    def __init__(self, max_lag: int = 5):
+        self.seq = 0
+        self.data: Optional[bytes] = None
+        self.max_lag = max_lag
+        self.renditions: List[bytes] = []
+        self.renditions_seq = 0
+
+    def publish(self, data: bytes) -> None:
+        self.seq += 1
+        self.data = data
+
+    def publish_renditions(self, seq: int, renditions: List[bytes]) -> bool:
+        """False if they are older than what the slot has (or the stream ended since)."""
+        if seq <= self.renditions_seq or self.data is None:
+            return False
+        self.renditions_seq = seq
+        self.renditions = renditions
+        return True
+
+    def frame(self, tier: int = 0) -> Tuple[int, Optional[bytes]]:
+        """(source seq, payload) of the newest frame for a tier."""
+        if tier and self.renditions and self.seq - self.renditions_seq <= self.max_lag:
+            return self.renditions_seq, self.renditions[min(tier, len(self.renditions)) - 1]
+        return self.seq, self.data
+
+    def sizes(self) -> List[int]:
+        """Bytes per tier for the newest frame of each, best tier first."""
+        original = [len(self.data)] if self.data is not None else []
+        if self.seq - self.renditions_seq > self.max_lag:
+            return original
+        return original + [len(r) for r in self.renditions]
+
+    def clear(self) -> None:
+        self.data = None
+        self.renditions = []
+        # Renditions still being made of the old stream are turned away
+        self.renditions_seq = self.seq
+
+
+class ViewerChannel:
+    """
+    Bounded outbound queue with its own writer task for a single WebSocket.
+
+    Broadcasts encode a message once with encode_message() and call enqueue()
+    with the shared payload; enqueue() never awaits, and the writer task
+    drains the queue at whatever pace the socket allows. When the queue is
+    full, the oldest droppable message makes room; bids, prices and other
+    NEVER_DROP messages are kept. A client that stays backlogged for longer
+    than max_backlog seconds, or whose never-drop messages alone fill
+    MAX_OVERFLOW times maxsize, is disconnected.
+
+    Video frames do not go through the queue. The writer reads the shared
+    FrameSlot whenever the connection is due another frame, pacing itself
+    between min_fps and max_fps according to how long recent frame sends
+    took to drain.
+
+    If the slot carries transcoded renditions, the writer also picks the
+    best tier whose frames it can drain within half a frame period at
+    target_fps, going by the measured bytes/second of its own sends. A
+    viewer drops to a lower tier at once and climbs back one tier at a time.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        on_close: Callable[[WebSocket], None],
+        maxsize: int,
+        max_backlog: Optional[float] = None,
+        frames: Optional[FrameSlot] = None,
+        min_fps: float = 1.0,
+        max_fps: float = 30.0,
+        target_fps: float = 10.0,
+    ):
+        self.websocket = websocket
+        self.maxsize = maxsize
+        self.max_backlog = max_backlog
+        self.dropped = 0
+        self.closed = False
+        self.frames_sent = 0
+        self.tier = 0
+        # Seconds between frames; starts at the fastest allowed rate.
+        self.frame_interval = 1.0 / max_fps
+        self._on_close = on_close
+        self._queue: Deque[Outbound] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._backlogged_since: Optional[float] = None
+        self._frames = frames
+        self._min_interval = 1.0 / max_fps
+        self._max_interval = 1.0 / min_fps
+        # Nothing sent yet, so a frame already in the slot goes out as soon
+        # as the join replay has drained: new viewers see a picture at once.
+        self._frame_seq = 0
+        self._next_frame_at = 0.0
+        self._send_time = 0.0
+        # Smoothed bytes and seconds per frame send; their ratio is the drain rate
+        self._frame_bytes = 0.0
+        self._frame_seconds = 0.0
+        self._tier_budget = 0.5 / target_fps
+        self._upgrade_votes = 0
+        self._upgrade_after = TIER_UPGRADE_FRAMES
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._writer())
+
+    def close(self) -> None:
+        """Stop the writer task. Safe to call more than once."""
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.clear()
+        if self._task and self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def enqueue(self, item: Outbound) -> None:
+        if self.closed:
+            return
+        if len(self._queue) >= self.maxsize:
+            now = time.monotonic()
+            if self._backlogged_since is None:
+                self._backlogged_since = now
+            elif self.max_backlog is not None and now - self._backlogged_since > self.max_backlog:
+                logger.info("Disconnecting client backlogged for %.1fs", now - self._backlogged_since)
+                self._kick()
+                return
+            if not self._make_room(item[0]):
+                self.dropped += 1
+                DROPPED.inc()
+                return
+            if len(self._queue) >= self.maxsize * MAX_OVERFLOW:
+                logger.info("Disconnecting client with %d undeliverable messages queued", len(self._queue))
+                self._kick()
+                return
+        self._queue.append(item)
+        self._wakeup.set()
+
+    def wake(self) -> None:
+        """Tell the writer a new frame is available in the shared slot."""
+        self._wakeup.set()
+
+    def _make_room(self, msg_type: Optional[str]) -> bool:
+        """Drop one queued message to fit a new one. False if the new one should be dropped instead."""
+        for i, (queued_type, _) in enumerate(self._queue):
+            if queued_type not in NEVER_DROP:
+                del self._queue[i]
+                self.dropped += 1
+                DROPPED.inc()
+                return True
+        # Only never-drop messages are queued: let the queue overflow, the
+        # backlog timeout and MAX_OVERFLOW bound how far that can go.
+        return msg_type in NEVER_DROP
+
+    def _kick(self) -> None:
+        KICKED.inc()
+        self.close()
+        self._on_close(self.websocket)
+        asyncio.create_task(self._close_socket())
+
+    async def _close_socket(self) -> None:
+        try:
+            await self.websocket.close(code=1013)
+        except Exception:
+            pass
+
+    def _frame_pending(self) -> bool:
+        if self._frames is None:
+            return False
+        seq, data = self._frames.frame(self.tier)
+        return data is not None and seq > self._frame_seq
+
+    async def _send_frame(self, loop: asyncio.AbstractEventLoop) -> None:
+        slot = self._frames
+        self._frame_seq, data = slot.frame(self.tier)
+        started = loop.time()
+        send_started = time.perf_counter()  # uvloop's loop.time() only has ms resolution
+        await self.websocket.send_bytes(data)
+        finished = loop.time()
+        elapsed = time.perf_counter() - send_started
+        self.frames_sent += 1
+        _SENT_FRAME.inc()
+        _SECONDS_FRAME.observe(elapsed)
+        # Smoothed drain time decides this viewer's frame rate: leave the
+        # socket some headroom, but stay within [min_fps, max_fps].
+        self._send_time = 0.8 * self._send_time + 0.2 * (finished - started)
+        self.frame_interval = min(max(self._send_time * 2, self._min_interval), self._max_interval)
+        self._next_frame_at = started + self.frame_interval
+        if slot.renditions:
+            # Averaging bytes and seconds separately, not bytes/second, keeps
+            # a few instant sends into a half-empty buffer from hiding the
+            # slow ones that had to wait for the socket to drain.
+            self._frame_bytes = 0.8 * self._frame_bytes + 0.2 * len(data)
+            self._frame_seconds = 0.8 * self._frame_seconds + 0.2 * elapsed
+            self._choose_tier(slot.sizes())
+
+    def _choose_tier(self, sizes: List[int]) -> None:
+        fits = self._frame_bytes / max(self._frame_seconds, 1e-6) * self._tier_budget
+        wanted = next((tier for tier, size in enumerate(sizes) if size <= fits), len(sizes) - 1)
+        if wanted > self.tier:
+            self.tier = wanted
+            self._upgrade_votes = 0
+            self._upgrade_after = min(self._upgrade_after * 2, TIER_UPGRADE_FRAMES * TIER_UPGRADE_BACKOFF)
+        elif wanted < self.tier:
+            self._upgrade_votes += 1
+            if self._upgrade_votes >= self._upgrade_after:
+                self.tier -= 1
+                self._upgrade_votes = 0
+        else:
+            self._upgrade_votes = 0
+
+    async def _writer(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while not self.closed:
+                if self._queue:
+                    _, payload = self._queue.popleft()
+                    if len(self._queue) <= self.maxsize // 2:
+                        self._backlogged_since = None
+                    started = time.perf_counter()
+                    if isinstance(payload, bytes):
+                        await self.websocket.send_bytes(payload)
+                    else:
+                        await self.websocket.send_text(payload)
+                    _SENT_MESSAGE.inc()
+                    _SECONDS_MESSAGE.observe(time.perf_counter() - started)
+                    continue
+
+                timer = None
+                if self._frame_pending():
+                    delay = self._next_frame_at - loop.time()
+                    if delay <= 0:
+                        await self._send_frame(loop)
+                        continue
+                    timer = loop.call_later(delay, self._wakeup.set)
+
+                self._wakeup.clear()
+                try:
+                    await self._wakeup.wait()
+                finally:
+                    if timer:
+                        timer.cancel()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            if not self.closed:
+                SEND_ERRORS.inc()
+                self.close()
+                self._on_close(self.websocket)
@@ -0,0 +1,195 @@
+"""
+ledger.py — Durable, append-only ledger of accepted bids.
+
+Accepted bids are the one piece of live state that must survive a restart:
+losing a chat line is harmless, losing the winning bid is not. BidLedger
+appends each accepted bid to an in-memory queue without awaiting anything,
+and a background task group-commits the queue to the `bids` table. On
+startup the ConnectionManager rebuilds per-lot prices, the bid sequence and
+the recent bid history from the table. One ledger serves every room; each
+row carries its room and rooms are recovered one at a time.
+
+commit_interval trades latency for durability: it is the longest an accepted
+bid can sit in memory before its transaction commits (0 commits as soon as
+the event loop is free). batch_size caps the rows per transaction. Unlike
+the history archive, the ledger never drops rows for a database outage: a
+commit that fails with a transient error (locked or unreachable database)
+is retried until the database comes back, and once max_pending bids are
+waiting the ledger reports itself `full` so new bids are refused rather
+than accepted unrecorded. Any other error is blamed on the data: the batch
+is split in halves until the offending rows are isolated, and those are
+logged and quarantined so the rest still commit.
+"""
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from models import Bid
+
+logger = logging.getLogger(__name__)
+
+_RETRY_MAX_SECONDS = 5.0
+
+
+def is_transient(exc: BaseException) -> bool:
+    """True for errors that say nothing about the rows: locked, busy or unreachable database."""
+    if isinstance(exc, OperationalError):
+        return True
+    if isinstance(exc, DBAPIError) and exc.connection_invalidated:
+        return True
+    return isinstance(exc, (ConnectionError, TimeoutError))
+
+
+class BidLedger:
+    def __init__(
+        self,
+        session_factory,
+        commit_interval: float = 0.05,
+        batch_size: int = 500,
+        max_pending: int = 50000,
+    ):
+        self._session_factory = session_factory
+        self.commit_interval = commit_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._pending: List[dict] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.commits = 0
+        # Rows the database refused outright, kept for inspection
+        self.quarantine: Deque[dict] = deque(maxlen=1000)
+        self.quarantined = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    @property
+    def full(self) -> bool:
+        """True while the database lags so far behind that new bids must be refused."""
+        return len(self._pending) >= self.max_pending
+
+    def append(self, bid: dict, room: str = "main") -> None:
+        """Queue an accepted bid message (type, seq, lot, username, amount). Never blocks."""
+        self._pending.append({
+            "room": room,
+            "seq": bid["seq"],
+            "lot": bid["lot"],
+            "username": bid["username"],
+            "amount": bid["amount"],
+            "created_at": datetime.now(timezone.utc),
+        })
+        if self.commit_interval <= 0 or len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and commit whatever is still pending."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._pending:
+            await self.flush()
+
+    async def _run(self) -> None:
+        retry_delay = 0.0
+        while True:
+            if retry_delay:
+                await asyncio.sleep(retry_delay)
+            elif not self._pending or len(self._pending) < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.commit_interval or None)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+            try:
+                while self._pending:
+                    await self.flush()
+                retry_delay = 0.0
+            except Exception as e:
+                retry_delay = min(_RETRY_MAX_SECONDS, max(0.1, retry_delay * 2))
+                logger.error("Bid ledger commit failed (%d pending, retrying in %.1fs): %s",
+                             len(self._pending), retry_delay, e)
+
+    async def flush(self) -> int:
+        """
+        Commit up to batch_size pending bids. Returns the number written.
+        Transient errors propagate (the caller retries); a batch the
+        database rejects for its content is bisected and the bad rows are
+        quarantined.
+        """
+        batch = self._pending[:self.batch_size]
+        if not batch:
+            return 0
+        return await self._commit(batch)
+
+    async def _commit(self, rows: List[dict]) -> int:
+        # `rows` is always the head of _pending: halves are committed in
+        # order, and new bids only ever go to the tail.
+        try:
+            async with self._session_factory() as db:
+                await db.execute(insert(Bid), rows)
+                await db.commit()
+        except Exception as e:
+            if is_transient(e):
+                raise
+            if len(rows) == 1:
+                self._quarantine(rows[0], e)
+                return 0
+            middle = len(rows) // 2
+            return await self._commit(rows[:middle]) + await self._commit(rows[middle:])
+        # Only drop the rows once they are on disk; bids appended while we
+        # were awaiting the commit stay queued behind them.
+        del self._pending[:len(rows)]
+        self.commits += 1
+        return len(rows)
+
+    def _quarantine(self, row: dict, error: Exception) -> None:
+        del self._pending[:1]
+        self.quarantine.append(row)
+        self.quarantined += 1
+        logger.error("Bid ledger: quarantined bid the database refused (room %s, seq %d, lot %s, %r, amount %r): %s",
+                     row["room"], row["seq"], row["lot"], row["username"], row["amount"], error)
+
+    async def recover(self, history_size: int, room: str = "main") -> Tuple[dict, List[dict]]:
+        """
+        Read back one room's bids. Returns (auction state for AuctionEngine.import_state,
+        the most recent `history_size` bid messages, oldest first).
+        """
+        # A room reopened right after it closed may still have bids queued
+        # here; taken before the queries, so a row committed meanwhile is
+        # seen at least once (and de-duplicated by seq below).
+        queued = [row for row in self._pending if row["room"] == room]
+        async with self._session_factory() as db:
+            in_room = Bid.room == room
+            last_seq = (await db.execute(select(func.max(Bid.seq)).where(in_room))).scalar() or 0
+            # Accepted amounts only ever go up on a lot, so its price is its max.
+            per_lot = await db.execute(
+                select(Bid.lot, func.max(Bid.amount), func.max(Bid.seq)).where(in_room).group_by(Bid.lot)
+            )
+            lots = {lot: [price, seq] for lot, price, seq in per_lot.all()}
+            recent = await db.execute(select(Bid).where(in_room).order_by(Bid.seq.desc()).limit(history_size))
+            bids = [
+                {"type": "bid", "seq": b.seq, "lot": b.lot, "username": b.username, "amount": b.amount}
+                for b in reversed(recent.scalars().all())
+            ]
+        for row in queued:
+            if row["seq"] <= last_seq:
+                continue
+            last_seq = row["seq"]
+            lots[row["lot"]] = [max(row["amount"], lots.get(row["lot"], [0, 0])[0]), row["seq"]]
+            bids.append({"type": "bid", "seq": row["seq"], "lot": row["lot"],
+                         "username": row["username"], "amount": row["amount"]})
+        return {"seq": last_seq, "lots": lots}, bids[-history_size:] if history_size else []
@@ -1,29 +1,148 @@
 import asyncio
-import json
+import hashlib
+import hmac
 import logging
+import time
 import uuid
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional
+from typing import Deque, Dict, List, Optional
 
-from fastapi import Cookie, Depends, FastAPI, Request, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
-from google.auth.transport import requests as google_requests
-from google.oauth2 import id_token
+from fastapi import Cookie, Depends, FastAPI, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse, Response
+from google.auth import exceptions as google_exceptions
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from config import GOOGLE_CLIENT_ID, SESSION_EXPIRE_DAYS
-from database import get_db, init_db
-from email_service import notify_stream_started
-from models import Session as DBSession, User
+from anon_id import COOKIE_NAME as ANON_ID_COOKIE, AnonIdSigner
+from archive import HistoryArchive, fetch_page
+from auction import AuctionEngine
+from auth_cache import SessionCache, UserSnapshot, resolve_session
+from backplane import Backplane, Event, InProcessBackplane, create_backplane
+from chat_batch import ChatAggregator
+from config import (
+    ADMIN_TOKEN,
+    ANON_ID_MAX_AGE_DAYS,
+    ANON_ID_SECRET,
+    ANON_ID_SECRET_FILE,
+    AUCTION_LOTS,
+    AUCTION_MAX_BID,
+    AUCTION_START_PRICE,
+    AUTH_CACHE_SIZE,
+    AUTH_CACHE_TTL_SECONDS,
+    BACKPLANE_URL,
+    BID_HISTORY_SIZE,
+    BID_LEDGER_BATCH_SIZE,
+    BID_LEDGER_COMMIT_MS,
+    BID_LEDGER_MAX_PENDING,
+    CHAT_BATCH_MAX_LINES,
+    CHAT_BATCH_WINDOW_MS,
+    CHAT_HISTORY_SIZE,
+    CHAT_MAX_LENGTH,
+    DEFAULT_ROOM,
+    FRAME_MAX_FPS,
+    FRAME_MIN_FPS,
+    GOOGLE_CERTS_FILE,
+    GOOGLE_CLIENT_ID,
+    GOOGLE_VERIFY_WORKERS,
+    HISTORY_ARCHIVE_BATCH_SIZE,
+    HISTORY_ARCHIVE_ENABLED,
+    HISTORY_ARCHIVE_FLUSH_SECONDS,
+    HISTORY_ARCHIVE_MAX_PENDING,
+    LOOP_STALL_HISTORY,
+    LOOP_STALL_THRESHOLD_MS,
+    LOOP_WATCHDOG_ENABLED,
+    METRICS_TOKEN,
+    RATE_LIMITS,
+    ROOM_IDLE_SECONDS,
+    ROOMS_MAX,
+    SESSION_EXPIRE_DAYS,
+    SESSION_REAP_BATCH_SIZE,
+    SESSION_REAP_INTERVAL_SECONDS,
+    STATIC_CHECK_INTERVAL_SECONDS,
+    STREAMER_MAX_BACKLOG_SECONDS,
+    SYNC_TIMEOUT_SECONDS,
+    TRANSCODE_ENABLED,
+    TRANSCODE_LADDER,
+    TRANSCODE_TARGET_FPS,
+    TRANSCODE_WORKERS,
+    USERNAME_MAX_LENGTH,
+    VIEWER_COUNT_INTERVAL_SECONDS,
+    VIEWER_MAX_BACKLOG_SECONDS,
+    VIEWER_QUEUE_SIZE,
+    WS_MAX_MESSAGE_SIZE,
+)
+from database import AsyncSessionLocal, engine, get_db, init_db
+from email_service import StreamStartNotifier
+from fanout import FrameSlot, Outbound, ViewerChannel, encode_message
+from ledger import BidLedger
+from metrics import REGISTRY, instrument_engine
+from moderation import BanList
+from models import Bid, ChatMessage, Session as DBSession, User
+from protocol import Field, MessageRegistry, MessageSpec
+from ratelimit import RateLimiter
+from rooms import RoomRegistry, valid_room_id
+from session_reaper import SessionReaper
+from static_cache import IMMUTABLE, REVALIDATE, StaticAsset, StaticCache
+from token_verifier import GoogleTokenVerifier, StaticKeySource
+from transcode import FrameTranscoder, parse_ladder
+from watchdog import LoopWatchdog, SamplingProfiler
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Live Auction Stream")
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+static_files = StaticCache("static", check_interval=STATIC_CHECK_INTERVAL_SECONDS)
+
+session_cache = SessionCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+token_verifier = GoogleTokenVerifier(
+    GOOGLE_CLIENT_ID,
+    key_source=StaticKeySource.from_file(GOOGLE_CERTS_FILE) if GOOGLE_CERTS_FILE else None,
+    max_workers=GOOGLE_VERIFY_WORKERS,
+)
+
+stream_notifier = StreamStartNotifier(AsyncSessionLocal)
+
+anon_ids = AnonIdSigner(ANON_ID_SECRET, ANON_ID_SECRET_FILE)
+
+session_reaper = SessionReaper(
+    AsyncSessionLocal,
+    interval=SESSION_REAP_INTERVAL_SECONDS,
+    batch_size=SESSION_REAP_BATCH_SIZE,
+)
+
+history_archive = HistoryArchive(
+    AsyncSessionLocal,
+    batch_size=HISTORY_ARCHIVE_BATCH_SIZE,
+    flush_interval=HISTORY_ARCHIVE_FLUSH_SECONDS,
+    max_pending=HISTORY_ARCHIVE_MAX_PENDING,
+) if HISTORY_ARCHIVE_ENABLED else None
+
+loop_watchdog = LoopWatchdog(
+    threshold=LOOP_STALL_THRESHOLD_MS / 1000,
+    history=LOOP_STALL_HISTORY,
+) if LOOP_WATCHDOG_ENABLED else None
+loop_profiler = SamplingProfiler()
+
+transcoder = FrameTranscoder(parse_ladder(TRANSCODE_LADDER), TRANSCODE_WORKERS) if TRANSCODE_ENABLED else None
+if transcoder and not transcoder.available:
+    logger.warning("TRANSCODE_ENABLED is set but Pillow is not installed — sending original frames only")
+    transcoder = None
+instrument_engine(engine)
+
+FRAMES_RECEIVED = REGISTRY.counter("frames_received_total", "Video frames received from the local streamer")
+
+bid_ledger = BidLedger(
+    AsyncSessionLocal,
+    commit_interval=BID_LEDGER_COMMIT_MS / 1000,
+    batch_size=BID_LEDGER_BATCH_SIZE,
+    max_pending=BID_LEDGER_MAX_PENDING,
+)
+
+# Bans are written through to the database so they survive idle room teardown
+ban_list = BanList(AsyncSessionLocal)
 
 
 # ---------------------------------------------------------------------------
@@ -33,6 +152,34 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 async def startup_event():
     await init_db()
     logger.info("Database initialized.")
+    # Fail at startup, not on the first page load, if the secret is unusable
+    anon_ids.load()
+    await static_files.preload()
+    if history_archive:
+        await history_archive.start()
+    await bid_ledger.start()
+    await ban_list.start()
+    await session_reaper.start()
+    # Logouts and profile changes on any worker drop this worker's cached sessions
+    await rooms.subscribe("session_invalidate", on_session_invalidate)
+    if loop_watchdog:
+        loop_watchdog.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if loop_watchdog:
+        loop_watchdog.stop()
+    loop_profiler.stop()
+    await session_reaper.stop()
+    await rooms.close()
+    await bid_ledger.stop()
+    await ban_list.stop()
+    if history_archive:
+        await history_archive.stop()
+    if transcoder:
+        transcoder.shutdown()
+    token_verifier.shutdown()
 
 
 # ---------------------------------------------------------------------------
@@ -53,19 +200,28 @@ def _session_cookie_kwargs(token: str, expires: datetime) -> dict:
 async def get_current_user(
     session_id: Optional[str] = Cookie(None),
     db: AsyncSession = Depends(get_db),
-) -> Optional[User]:
+) -> Optional[UserSnapshot]:
     if not session_id:
         return None
-    result = await db.execute(
-        select(DBSession)
-        .where(DBSession.token == session_id)
-        .where(DBSession.expires_at > datetime.now(timezone.utc))
-    )
-    db_session = result.scalar_one_or_none()
-    if not db_session:
-        return None
-    result = await db.execute(select(User).where(User.id == db_session.user_id))
-    return result.scalar_one_or_none()
+    return await resolve_session(db, session_id, session_cache)
+
+
+def on_session_invalidate(event: dict) -> None:
+    """Backplane handler: forget cached sessions another worker (or this one) revoked."""
+    token = event.get("token")
+    if token:
+        session_cache.invalidate(token)
+    user_id = event.get("user_id")
+    if user_id is not None:
+        session_cache.invalidate_user(user_id)
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    # Fail closed: without a configured token the admin endpoints do not exist
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Forbidden")
 
 
 # ---------------------------------------------------------------------------
@@ -80,14 +236,14 @@ async def google_auth(request: Request, db: AsyncSession = Depends(get_db)):
         return JSONResponse({"error": "No credential"}, status_code=400)
 
     try:
-        id_info = id_token.verify_oauth2_token(
-            credential,
-            google_requests.Request(),
-            GOOGLE_CLIENT_ID,
-        )
+        # Cert fetch and RSA verify run in a worker thread, not on the loop
+        id_info = await token_verifier.verify(credential)
     except ValueError as e:
         logger.warning("Invalid Google token: %s", e)
         return JSONResponse({"error": "Invalid token"}, status_code=401)
+    except google_exceptions.GoogleAuthError as e:
+        logger.error("Google token verification unavailable: %s", e)
+        return JSONResponse({"error": "Verification unavailable"}, status_code=503)
 
     google_id = id_info["sub"]
     email = id_info.get("email", "")
@@ -113,6 +269,10 @@ async def google_auth(request: Request, db: AsyncSession = Depends(get_db)):
     db.add(db_session)
     await db.commit()
     await db.refresh(user)
+    # Name/picture may have changed: drop cached snapshots for this user,
+    # here at once and on the other workers via the backplane
+    session_cache.invalidate_user(user.id)
+    await rooms.publish({"type": "session_invalidate", "user_id": user.id})
 
     response = JSONResponse(user.to_dict())
     response.set_cookie(**_session_cookie_kwargs(token, expires))
@@ -120,7 +280,7 @@ async def google_auth(request: Request, db: AsyncSession = Depends(get_db)):
 
 
 @app.get("/auth/me")
-async def auth_me(current_user: Optional[User] = Depends(get_current_user)):
+async def auth_me(current_user: Optional[UserSnapshot] = Depends(get_current_user)):
     if not current_user:
         return JSONResponse({"user": None})
     return JSONResponse({"user": current_user.to_dict()})
@@ -137,6 +297,9 @@ async def logout(
         if db_session:
             await db.delete(db_session)
             await db.commit()
+        # After the delete, so no worker can re-cache the session from the DB
+        session_cache.invalidate(session_id)
+        await rooms.publish({"type": "session_invalidate", "token": session_id})
     response = JSONResponse({"ok": True})
     response.delete_cookie(key="session_id", path="/")
     return response
@@ -151,323 +314,1008 @@ async def root():
     return RedirectResponse(url="/stream")
 
 
+def cached_response(request: Request, asset: StaticAsset, cache_control: str) -> Response:
+    coding, body, etag = asset.representation(request.headers.get("accept-encoding"))
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if asset.not_modified(request.headers.get("if-none-match")):
+        static_files.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    static_files.served += 1
+    if coding != "identity":
+        headers["Content-Encoding"] = coding
+    return Response(body, media_type=asset.content_type, headers=headers)
+
+
+async def page_response(request: Request, name: str) -> Response:
+    asset = await static_files.get(name)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    response = cached_response(request, asset, REVALIDATE)
+    # The anonymous id that bans key on, issued once per browser
+    if not anon_ids.verify(request.cookies.get(ANON_ID_COOKIE)):
+        response.set_cookie(
+            key=ANON_ID_COOKIE,
+            value=anon_ids.issue(),
+            httponly=True,
+            samesite="lax",
+            max_age=ANON_ID_MAX_AGE_DAYS * 86400,
+            path="/",
+        )
+    return response
+
+
 @app.get("/stream")
-async def stream_page():
-    with open("static/stream.html", "r", encoding="utf-8") as f:
-        return HTMLResponse(f.read())
+async def stream_page(request: Request):
+    return await page_response(request, "stream.html")
 
 
 @app.get("/start_stream")
-async def start_stream_page():
-    with open("static/start_stream.html", "r", encoding="utf-8") as f:
-        return HTMLResponse(f.read())
+async def start_stream_page(request: Request):
+    return await page_response(request, "start_stream.html")
+
+
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"])
+async def static_file(request: Request, path: str, v: Optional[str] = None):
+    asset = await static_files.get(path)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    # Only a URL carrying the current content hash may be cached forever
+    return cached_response(request, asset, IMMUTABLE if v == asset.digest else REVALIDATE)
+
+
+# ---------------------------------------------------------------------------
+# History (served from the DB archive, not from memory)
+# ---------------------------------------------------------------------------
+
+@app.get("/history/chat")
+async def chat_history(
+    before: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=200),
+    room: str = DEFAULT_ROOM,
+    db: AsyncSession = Depends(get_db),
+):
+    items = await fetch_page(db, ChatMessage, before, limit, room)
+    return JSONResponse({"items": items, "next_before": items[-1]["id"] if items else None})
+
+
+@app.get("/history/bids")
+async def bid_history(
+    before: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=200),
+    room: str = DEFAULT_ROOM,
+    db: AsyncSession = Depends(get_db),
+):
+    items = await fetch_page(db, Bid, before, limit, room)
+    return JSONResponse({"items": items, "next_before": items[-1]["id"] if items else None})
+
+
+# ---------------------------------------------------------------------------
+# Admin
+# ---------------------------------------------------------------------------
+
+@app.get("/admin/auth-cache", dependencies=[Depends(require_admin)])
+async def auth_cache_stats():
+    return JSONResponse(session_cache.stats())
+
+
+@app.get("/admin/rate-limits", dependencies=[Depends(require_admin)])
+async def rate_limit_stats():
+    return JSONResponse(rate_limiter.stats())
+
+
+@app.get("/admin/rooms", dependencies=[Depends(require_admin)])
+async def room_stats():
+    return JSONResponse({
+        "open": len(rooms),
+        "opened_total": rooms.created,
+        "closed_total": rooms.closed,
+        "rooms": {
+            room_id: {"live": room.is_live, "viewers": len(room.viewers), "streamer": room.streamer is not None}
+            for room_id, room in rooms.items()
+        },
+    })
+
+
+@app.get("/admin/loop-watchdog", dependencies=[Depends(require_admin)])
+async def loop_watchdog_report():
+    if not loop_watchdog:
+        raise HTTPException(status_code=404, detail="Loop watchdog is disabled")
+    return JSONResponse(loop_watchdog.report())
+
+
+@app.post("/admin/profiler", dependencies=[Depends(require_admin)])
+async def toggle_profiler(
+    enabled: bool = Query(...),
+    interval_ms: float = Query(5.0, ge=1.0, le=1000.0),
+    seconds: float = Query(30.0, gt=0),
+):
+    """Start (sampling the event loop for at most `seconds`) or stop the profiler."""
+    if enabled:
+        loop_profiler.start(interval=interval_ms / 1000, seconds=seconds)
+    else:
+        loop_profiler.stop()
+    return JSONResponse(loop_profiler.report(top=0))
+
+
+@app.get("/admin/profiler", dependencies=[Depends(require_admin)])
+async def profiler_report(top: int = Query(20, ge=0, le=500), format: str = Query("json")):
+    if format == "folded":
+        return PlainTextResponse(loop_profiler.folded())
+    return JSONResponse(loop_profiler.report(top=top))
+
+
+@app.get("/metrics")
+async def metrics(authorization: Optional[str] = Header(None)):
+    if METRICS_TOKEN and not hmac.compare_digest((authorization or "").encode(), f"Bearer {METRICS_TOKEN}".encode()):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 
 # ---------------------------------------------------------------------------
 # WebSocket connection manager
 # ---------------------------------------------------------------------------
 
+# Names the streamer can ban by: the most recent chat / bid authors, and at
+# most this many identities behind any one name
+AUTHOR_INDEX_SIZE = 5000
+AUTHOR_IDENTITIES_PER_NAME = 8
+
+
+def client_identity(websocket: WebSocket, user_id: Optional[int]) -> str:
+    """
+    Stable identity for moderation: the account for signed-in users, else
+    the signed anonymous id the page load set (anon_id.py). Unlike the
+    display name, neither can be changed from inside the page. A client
+    without the cookie falls back to a fingerprint of its address and
+    User-Agent.
+    """
+    if user_id is not None:
+        return f"user:{user_id}"
+    anon_id = anon_ids.verify(websocket.cookies.get(ANON_ID_COOKIE))
+    if anon_id:
+        return f"anon:{anon_id}"
+    host = websocket.client.host if websocket.client else ""
+    agent = websocket.headers.get("user-agent", "")
+    return "fp:" + hashlib.sha256(f"{host}|{agent}".encode()).hexdigest()[:16]
+
+
 class ConnectionManager:
-    def __init__(self):
+    """
+    One room's live stream: local fan-out for the sockets connected to this
+    worker, kept in step with other workers through a Backplane.
+
+    Shared state (price, live status, ban list, recent chat/bids, viewer
+    counts) is only changed in handle_event(), which every worker runs on
+    the same ordered event stream; the public methods below just publish
+    events. With the default InProcessBackplane that is a direct call.
+    """
+
+    def __init__(
+        self,
+        backplane: Optional[Backplane] = None,
+        archive: Optional[HistoryArchive] = None,
+        ledger: Optional[BidLedger] = None,
+        room: str = DEFAULT_ROOM,
+        limiter: Optional[RateLimiter] = None,
+        transcoder: Optional[FrameTranscoder] = None,
+        ban_list: Optional[BanList] = None,
+    ):
+        self.backplane = backplane or InProcessBackplane()
+        self.room = room
+        self.worker_id = uuid.uuid4().hex[:12]
         self.streamer: Optional[WebSocket] = None
-        self.viewers: List[WebSocket] = []
-        self.current_price = 1
-        self.chat_messages: List[dict] = []
-        self.bids: List[dict] = []
-        self.usernames: dict = {}  # websocket id -> username
-        self.banned_users: set = set()  # set of banned usernames
-        self.viewer_ws_by_username: dict = {}  # username -> list of websockets
+        self.streamer_channel: Optional[ViewerChannel] = None
+        self.viewers: Dict[WebSocket, ViewerChannel] = {}
+        # Newest frame only, read by viewer writers. It doubles as the
+        # keyframe cache for viewers that join mid-stream.
+        self.frames = FrameSlot()
+        # Lower-quality renditions of each frame for slow viewers, if enabled
+        self.transcode = transcoder.stage(self.frames, self._wake_viewers) if transcoder else None
+        self.is_live = False
+        # Per-lot prices and bid sequencing
+        self.auction = AuctionEngine(AUCTION_LOTS, AUCTION_START_PRICE, AUCTION_MAX_BID)
+        self._dirty_lots: set = set()
+        self._price_flush_scheduled = False
+        # Fixed-depth recent history for join snapshots; the full history
+        # goes to the archive / bid ledger and is never kept in memory.
+        self.chat_messages: Deque[dict] = deque(maxlen=CHAT_HISTORY_SIZE)
+        self.bids: Deque[dict] = deque(maxlen=BID_HISTORY_SIZE)
+        self.archive = archive
+        self.ledger = ledger
+        self.chat_aggregator: Optional[ChatAggregator] = None
+        if CHAT_BATCH_WINDOW_MS > 0:
+            self.chat_aggregator = ChatAggregator(
+                CHAT_BATCH_WINDOW_MS / 1000,
+                CHAT_BATCH_MAX_LINES,
+                lambda batch: self._fan_out(encode_message(batch)),
+            )
+        # Moderation. Bans are keyed on stable identities (user:<id> or a
+        # signed anonymous id, see client_identity), never on
+        # the display name a client can change; the value is the name shown
+        # to the streamer. Every change bumps ban_seq and goes to the
+        # streamer as a ban_delta; the whole map only in its join snapshot.
+        self.bans: Dict[str, str] = {}
+        self.ban_seq = 0
+        self.ban_list = ban_list
+        # Display name -> identities recently seen chatting or bidding under
+        # it, so the streamer's "ban <name>" can be resolved on any worker
+        self.authors: "OrderedDict[str, set]" = OrderedDict()
+        self.viewer_identity: Dict[WebSocket, str] = {}
+        self.viewer_ws_by_identity: Dict[str, set] = {}  # identity -> set of websockets
+        self.viewer_counts: Dict[str, int] = {}  # worker id -> local viewers
+        # Joins and leaves only mark the count dirty; it is published at
+        # most once per interval, so a join burst is not O(N^2) sends.
+        self.viewer_count_interval = VIEWER_COUNT_INTERVAL_SECONDS
+        self._count_timer: Optional[asyncio.TimerHandle] = None
+        self._published_count: Optional[int] = None
+        self._count_fanout_scheduled = False
+        self._fanned_out_count: Optional[int] = None
+        # Flood protection for inbound chat / bids, checked before dispatch
+        self.limiter = limiter or RateLimiter(RATE_LIMITS)
+        self._throttle_notice_at: Dict[WebSocket, float] = {}
+        self._viewer_snapshot: Optional[Outbound] = None
+        # A fresh worker on a shared backplane buffers events until a peer
+        # has sent it the current state.
+        self._synced = not self.backplane.shared
+        self._sync_buffer: List[Event] = []
+        self._sync_timer: Optional[asyncio.TimerHandle] = None
+
+    async def start(self) -> None:
+        if self.ledger:
+            # Prices and recent bids survive restarts. On a shared backplane
+            # a running peer's state (sync_state) still takes precedence.
+            # The ledger itself is shared by all rooms and started by the app.
+            auction_state, bids = await self.ledger.recover(BID_HISTORY_SIZE, self.room)
+            self.auction.import_state(auction_state)
+            self.bids.extend(bids)
+            if auction_state["lots"]:
+                logger.info("Room %s: recovered %d lot prices from the bid ledger (last seq %d)",
+                            self.room, len(auction_state["lots"]), auction_state["seq"])
+        if self.ban_list:
+            # Bans outlive the room (moderation.py); prices come from the ledger above
+            self.bans.update(await self.ban_list.load(self.room))
+        await self.backplane.start(self.handle_event)
+
+    async def stop(self) -> None:
+        for timer in (self._count_timer, self._sync_timer):
+            if timer:
+                timer.cancel()
+        if self.chat_aggregator:
+            self.chat_aggregator.close()
+        if self.transcode:
+            self.transcode.close()
+        self.frames.clear()
+        await self.backplane.stop()
+
+    # -- local connections -------------------------------------------------
 
     async def connect_streamer(self, websocket: WebSocket) -> None:
         if self.streamer:
+            old = self.streamer
+            self.disconnect_streamer(old)
             try:
-                await self.streamer.close()
+                await old.close()
             except Exception:
                 pass
         self.streamer = websocket
-        logger.info("Streamer connected")
-
-    def disconnect_streamer(self, websocket: WebSocket) -> None:
-        if self.streamer == websocket:
-            self.streamer = None
-            logger.info("Streamer disconnected")
-
-    async def connect_viewer(self, websocket: WebSocket, username: str = "Anonymous") -> None:
-        self.viewers.append(websocket)
-        self.usernames[id(websocket)] = username
-        # Track ws by username for ban notifications
-        self.viewer_ws_by_username.setdefault(username, []).append(websocket)
-        await self.broadcast_viewer_count()
+        # The streamer is kicked (ending the stream) only after a much longer
+        # backlog than viewers, so a brief stall does not cut the broadcast.
+        self.streamer_channel = ViewerChannel(
+            websocket, self._streamer_lost, VIEWER_QUEUE_SIZE, STREAMER_MAX_BACKLOG_SECONDS,
+        )
+        self.streamer_channel.start()
+        logger.info("Streamer connected to room %s", self.room)
+
+    def disconnect_streamer(self, websocket: WebSocket) -> bool:
+        """Returns True if this socket was the current streamer."""
+        if self.streamer != websocket:
+            return False
+        self.streamer = None
+        if self.streamer_channel:
+            self.streamer_channel.close()
+            self.streamer_channel = None
+        logger.info("Streamer disconnected from room %s", self.room)
+        return True
+
+    def _streamer_lost(self, websocket: WebSocket) -> None:
+        # The writer gave up on the socket. The receive loop's cleanup will
+        # no longer find it current, so the stream has to end here.
+        if self.disconnect_streamer(websocket):
+            asyncio.create_task(self.broadcast_live_status(False))
+
+    async def connect_viewer(self, websocket: WebSocket, identity: str = "") -> None:
+        if websocket in self.viewers:
+            # Already joined; a second channel would leak the first one's writer
+            return
+        channel = ViewerChannel(
+            websocket,
+            self.disconnect_viewer,
+            VIEWER_QUEUE_SIZE,
+            VIEWER_MAX_BACKLOG_SECONDS,
+            frames=self.frames,
+            min_fps=FRAME_MIN_FPS,
+            max_fps=FRAME_MAX_FPS,
+            target_fps=TRANSCODE_TARGET_FPS,
+        )
+        self.viewers[websocket] = channel
+        channel.start()
+        # Track ws by identity for ban notifications
+        self.viewer_identity[websocket] = identity
+        self.viewer_ws_by_identity.setdefault(identity, set()).add(websocket)
+        self.schedule_viewer_count()
 
     def disconnect_viewer(self, websocket: WebSocket) -> None:
-        if websocket in self.viewers:
-            self.viewers.remove(websocket)
-        uname = self.usernames.pop(id(websocket), None)
-        if uname and uname in self.viewer_ws_by_username:
-            wss = self.viewer_ws_by_username[uname]
-            if websocket in wss:
-                wss.remove(websocket)
+        channel = self.viewers.pop(websocket, None)
+        if channel is None:
+            return
+        channel.close()
+        identity = self.viewer_identity.pop(websocket, None)
+        wss = self.viewer_ws_by_identity.get(identity)
+        if wss is not None:
+            wss.discard(websocket)
             if not wss:
-                del self.viewer_ws_by_username[uname]
+                del self.viewer_ws_by_identity[identity]
+        self.schedule_viewer_count()
 
     def get_viewer_count(self) -> int:
-        count = len(self.viewers)
-        if self.streamer:
+        # Our own viewers are counted live, not from our last (debounced) publish
+        count = len(self.viewers) + sum(
+            n for worker, n in self.viewer_counts.items() if worker != self.worker_id
+        )
+        if self.is_live:
             count += 1
         return count
 
+    def send_personal(self, websocket: WebSocket, message: dict) -> None:
+        """Queue a message for one connection, keeping order with broadcasts."""
+        self.send_encoded(websocket, encode_message(message))
+
+    def send_encoded(self, websocket: WebSocket, item: Outbound) -> None:
+        if websocket is self.streamer and self.streamer_channel:
+            self.streamer_channel.enqueue(item)
+            return
+        channel = self.viewers.get(websocket)
+        if channel:
+            channel.enqueue(item)
+
+    def viewer_snapshot(self) -> Outbound:
+        """
+        Everything a joining viewer needs, as a single message. Encoded once
+        and reused until the state changes, so a reconnect storm costs one
+        encode rather than one per viewer.
+        """
+        if self._viewer_snapshot is None:
+            self._viewer_snapshot = encode_message({
+                "type": "snapshot",
+                "prices": self.auction.prices(),
+                "is_live": self.is_live,
+                "chat": list(self.chat_messages),
+                "bids": list(self.bids),
+            })
+        return self._viewer_snapshot
+
+    def streamer_snapshot(self) -> dict:
+        return {
+            "type": "snapshot",
+            "prices": self.auction.prices(),
+            "viewers": self.get_viewer_count(),
+            "bans": dict(self.bans),
+            "ban_seq": self.ban_seq,
+            "chat": list(self.chat_messages),
+            "bids": list(self.bids),
+        }
+
+    def _send_to_streamer(self, item: Outbound) -> None:
+        if self.streamer_channel:
+            self.streamer_channel.enqueue(item)
+
+    def _fan_out(self, item: Outbound, to_streamer: bool = True) -> None:
+        # Enqueue only: each viewer's writer task does the actual send, so a
+        # slow socket can no longer hold up everyone behind it. The payload
+        # is encoded once and shared by every viewer.
+        for channel in list(self.viewers.values()):
+            channel.enqueue(item)
+        if to_streamer:
+            self._send_to_streamer(item)
+
+    # -- flood protection --------------------------------------------------
+
+    def allow_message(self, websocket: WebSocket, user: Optional[str], msg_type: str) -> bool:
+        """
+        Rate-limit one inbound message. Over the limit it is dropped and the
+        sender gets a throttle notice, at most one per second.
+        """
+        retry_after = self.limiter.check(websocket, user, msg_type)
+        if not retry_after:
+            return True
+        now = time.monotonic()
+        if now >= self._throttle_notice_at.get(websocket, 0.0):
+            self._throttle_notice_at[websocket] = now + 1.0
+            self.send_personal(websocket, {
+                "type": "throttled",
+                "message": msg_type,
+                "retry_after": round(retry_after, 1),
+            })
+        return False
+
+    def forget_connection(self, websocket: WebSocket) -> None:
+        self.limiter.forget(websocket)
+        self._throttle_notice_at.pop(websocket, None)
+
+    # -- publishing (all workers apply these via handle_event) -------------
+
+    async def _publish(self, event: dict) -> None:
+        event["origin"] = self.worker_id
+        await self.backplane.publish(event)
+
     async def broadcast_viewer_count(self) -> None:
+        self._published_count = len(self.viewers)
+        await self._publish({"type": "viewer_count", "count": self._published_count})
+
+    def schedule_viewer_count(self) -> None:
+        """Publish this worker's viewer count within viewer_count_interval, once."""
+        if self._count_timer is None:
+            self._count_timer = asyncio.get_running_loop().call_later(
+                self.viewer_count_interval, self._flush_viewer_count
+            )
+
+    def _flush_viewer_count(self) -> None:
+        self._count_timer = None
+        if len(self.viewers) != self._published_count:
+            asyncio.create_task(self.broadcast_viewer_count())
+
+    def _schedule_count_fanout(self) -> None:
+        # Counts from several workers (and live_status) in one loop
+        # iteration go out as a single message, and only if changed.
+        if not self._count_fanout_scheduled:
+            self._count_fanout_scheduled = True
+            asyncio.get_running_loop().call_soon(self._fan_out_count)
+
+    def _fan_out_count(self) -> None:
+        self._count_fanout_scheduled = False
         count = self.get_viewer_count()
-        msg = {"type": "viewers", "count": count}
-        await self.broadcast_to_viewers(msg)
-        if self.streamer:
-            try:
-                await self.streamer.send_json(msg)
-            except Exception:
-                pass
+        if count != self._fanned_out_count:
+            self._fanned_out_count = count
+            self._fan_out(encode_message({"type": "viewers", "count": count}))
 
-    async def broadcast_to_viewers(self, message: dict) -> None:
-        dead = []
-        for ws in self.viewers:
-            try:
-                await ws.send_json(message)
-            except Exception:
-                dead.append(ws)
-        for ws in dead:
-            self.disconnect_viewer(ws)
+    async def broadcast_frame(self, data: bytes) -> None:
+        FRAMES_RECEIVED.inc()
+        # Published once per worker, never once per viewer
+        await self.backplane.publish(data)
 
-    async def broadcast_frame(self, data: str) -> None:
-        await self.broadcast_to_viewers({"type": "frame", "data": data})
+    # `identity` (see client_identity) travels with chat and bids so every
+    # worker learns who is behind a name the streamer may want to ban.
 
-    async def broadcast_chat(self, username: str, text: str) -> None:
-        msg = {"type": "chat", "username": username, "text": text}
-        self.chat_messages.append(msg)
-        await self.broadcast_to_viewers(msg)
-        if self.streamer:
-            try:
-                await self.streamer.send_json(msg)
-            except Exception:
-                pass
+    async def broadcast_chat(self, username: str, text: str, identity: str = "") -> None:
+        await self._publish({"type": "chat", "username": username, "text": text, "uid": identity})
 
-    async def broadcast_bid(self, username: str, amount: int) -> None:
-        msg = {"type": "bid", "username": username, "amount": amount}
-        self.bids.append(msg)
-        await self.broadcast_to_viewers(msg)
-        if self.streamer:
-            try:
-                await self.streamer.send_json(msg)
-            except Exception:
-                pass
+    async def place_bid(self, username: str, lot: str, amount: int, identity: str = "") -> None:
+        # Accepted or rejected by the auction engine when applied, in
+        # backplane order, so every worker reaches the same decision.
+        await self._publish({
+            "type": "bid_attempt", "lot": lot, "username": username, "amount": amount, "uid": identity,
+        })
 
-    async def broadcast_price(self, price: int) -> None:
-        msg = {"type": "price", "current": price}
-        await self.broadcast_to_viewers(msg)
-        if self.streamer:
-            try:
-                await self.streamer.send_json(msg)
-            except Exception:
-                pass
+    async def buy_now(self, username: str, lot: str, identity: str = "") -> None:
+        await self._publish({"type": "buy_now", "lot": lot, "username": username, "uid": identity})
 
     async def broadcast_live_status(self, is_live: bool) -> None:
-        msg = {"type": "live_status", "is_live": is_live}
-        await self.broadcast_to_viewers(msg)
-        if self.streamer:
-            try:
-                await self.streamer.send_json(msg)
-            except Exception:
-                pass
+        await self._publish({"type": "live_status", "is_live": is_live})
 
-    def is_banned(self, username: str) -> bool:
-        return username in self.banned_users
+    def is_banned(self, identity: str) -> bool:
+        return identity in self.bans
+
+    # The name is resolved to identities when the event is applied, in
+    # backplane order, so every worker bans exactly the same ones.
 
     async def ban_user(self, username: str) -> None:
-        self.banned_users.add(username)
-        logger.info("Banned user: %s", username)
-        # Notify the banned viewer(s)
-        ban_msg = {"type": "you_are_banned", "banned": True}
-        for ws in self.viewer_ws_by_username.get(username, []):
-            try:
-                await ws.send_json(ban_msg)
-            except Exception:
-                pass
-        # Notify streamer about updated ban list
-        if self.streamer:
-            try:
-                await self.streamer.send_json({"type": "ban_list", "banned": list(self.banned_users)})
-            except Exception:
-                pass
+        await self._publish({"type": "ban", "username": username})
 
     async def unban_user(self, username: str) -> None:
-        self.banned_users.discard(username)
-        logger.info("Unbanned user: %s", username)
-        # Notify the unbanned viewer(s)
-        unban_msg = {"type": "you_are_banned", "banned": False}
-        for ws in self.viewer_ws_by_username.get(username, []):
-            try:
-                await ws.send_json(unban_msg)
-            except Exception:
-                pass
-        # Notify streamer about updated ban list
-        if self.streamer:
-            try:
-                await self.streamer.send_json({"type": "ban_list", "banned": list(self.banned_users)})
-            except Exception:
-                pass
+        await self._publish({"type": "unban", "username": username})
+
+    # -- applying events ---------------------------------------------------
+
+    def handle_event(self, event: Event) -> None:
+        if isinstance(event, dict):
+            event_type = event.get("type")
+            if event_type == "backplane_connected":
+                self._on_backplane_connected()
+                return
+            if event_type in ("sync_request", "sync_state"):
+                self._handle_sync(event)
+                return
+        if not self._synced:
+            self._sync_buffer.append(event)
+            return
+        self._apply(event)
+
+    def _wake_viewers(self) -> None:
+        for channel in self.viewers.values():
+            channel.wake()
+
+    def _apply(self, event: Event) -> None:
+        if isinstance(event, bytes):
+            if self.is_live:
+                # Latest frame wins: replace the slot and let each viewer's
+                # writer pick it up at its own pace. Frames a viewer was too
+                # slow for are simply overwritten, never queued.
+                self.frames.publish(event)
+                self._wake_viewers()
+                if self.transcode and self.viewers:
+                    self.transcode.feed(self.frames.seq, event)
+            return
+
+        event_type = event["type"]
+        local = event.get("origin") == self.worker_id
+
+        if event_type == "chat":
+            self._remember_author(event["username"], event.get("uid"))
+            msg = {"type": "chat", "username": event["username"], "text": event["text"]}
+            self.chat_messages.append(msg)
+            if local and self.archive:
+                self.archive.record_chat(msg["username"], msg["text"], self.room)
+            self._viewer_snapshot = None
+            if self.chat_aggregator:
+                self.chat_aggregator.add(msg["username"], msg["text"])
+            else:
+                self._fan_out(encode_message(msg))
+
+        elif event_type in ("bid_attempt", "buy_now"):
+            self._remember_author(event["username"], event.get("uid"))
+            accepted = self.auction.submit(event["lot"], event["username"], event.get("amount"))
+            if accepted:
+                self._record_bid(accepted, local)
+
+        elif event_type == "live_status":
+            self.is_live = event["is_live"]
+            self._viewer_snapshot = None
+            if not self.is_live:
+                self.frames.clear()
+            elif not local and self.streamer:
+                # A streamer on another worker took over the stream
+                old = self.streamer
+                self.disconnect_streamer(old)
+                asyncio.create_task(old.close())
+            self._fan_out(encode_message({"type": "live_status", "is_live": self.is_live}))
+            # The streamer counts as a viewer
+            self._schedule_count_fanout()
+
+        elif event_type == "viewer_count":
+            self.viewer_counts[event["origin"]] = event["count"]
+            self._schedule_count_fanout()
+
+        elif event_type in ("ban", "unban"):
+            username = event["username"]
+            banned = event_type == "ban"
+            if banned:
+                # Everyone recently seen under this name
+                identities = {i: username for i in self.authors.get(username, ()) if i not in self.bans}
+                self.bans.update(identities)
+            else:
+                # Whatever the streamer sees listed under this name
+                identities = {i: name for i, name in self.bans.items() if name == username}
+                for identity in identities:
+                    del self.bans[identity]
+            if not identities:
+                return
+            if local and self.ban_list:
+                self.ban_list.record(self.room, event_type, identities)
+            self.ban_seq += 1
+            logger.info("Room %s: %s %s (%d identities)", self.room,
+                        "banned" if banned else "unbanned", username, len(identities))
+            # Notify the affected viewer(s) on this worker
+            notice = encode_message({"type": "you_are_banned", "banned": banned})
+            for identity in identities:
+                for ws in self.viewer_ws_by_identity.get(identity, ()):
+                    self.send_encoded(ws, notice)
+            # The streamer console only gets the change
+            self._send_to_streamer(encode_message({
+                "type": "ban_delta", "seq": self.ban_seq, "op": event_type, "ids": identities,
+            }))
+
+    def _remember_author(self, username: str, identity: Optional[str]) -> None:
+        if not identity:
+            return
+        identities = self.authors.get(username)
+        if identities is None:
+            identities = self.authors[username] = set()
+            if len(self.authors) > AUTHOR_INDEX_SIZE:
+                self.authors.popitem(last=False)
+        else:
+            self.authors.move_to_end(username)
+        if len(identities) < AUTHOR_IDENTITIES_PER_NAME:
+            identities.add(identity)
+
+    def _record_bid(self, bid: dict, local: bool) -> None:
+        self.bids.append(bid)
+        if local and self.ledger:
+            self.ledger.append(bid, self.room)
+        self._viewer_snapshot = None
+        self._fan_out(encode_message(bid))
+        # Every accepted bid goes out, but price updates are coalesced: one
+        # per lot per loop iteration, carrying the latest price.
+        self._dirty_lots.add(bid["lot"])
+        if not self._price_flush_scheduled:
+            self._price_flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush_prices)
+
+    def _flush_prices(self) -> None:
+        self._price_flush_scheduled = False
+        dirty, self._dirty_lots = self._dirty_lots, set()
+        for lot in dirty:
+            self._fan_out(encode_message(self.auction.price_message(lot)))
+
+    # -- state sync for workers joining a shared backplane -----------------
+
+    def export_state(self) -> dict:
+        return {
+            "is_live": self.is_live,
+            "auction": self.auction.export_state(),
+            "chat": list(self.chat_messages),
+            "bids": list(self.bids),
+            "bans": dict(self.bans),
+            "ban_seq": self.ban_seq,
+            "authors": {name: list(identities) for name, identities in self.authors.items()},
+            "viewer_counts": dict(self.viewer_counts),
+        }
+
+    def import_state(self, state: dict) -> None:
+        self.is_live = state["is_live"]
+        self.auction.import_state(state["auction"])
+        # Replaces what start() recovered from the ledger: the peer's rings
+        # already contain those bids
+        self.chat_messages.clear()
+        self.chat_messages.extend(state["chat"])
+        self.bids.clear()
+        self.bids.extend(state["bids"])
+        self.bans.update(state["bans"])
+        self.ban_seq = state["ban_seq"]
+        for name, identities in state["authors"].items():
+            self.authors[name] = set(identities)
+        self.viewer_counts.update(state["viewer_counts"])
+        self._viewer_snapshot = None
+        self._schedule_count_fanout()
+
+    def _on_backplane_connected(self) -> None:
+        if self._synced or self._sync_timer is not None:
+            return
+        asyncio.create_task(self._publish({"type": "sync_request"}))
+        # Nobody answering means we are the first worker up.
+        self._sync_timer = asyncio.get_running_loop().call_later(SYNC_TIMEOUT_SECONDS, self._finish_sync)
+
+    def _handle_sync(self, event: dict) -> None:
+        if event["type"] == "sync_request":
+            if self._synced and event["origin"] != self.worker_id:
+                # Reflects exactly the events ordered before the request
+                asyncio.create_task(self._publish({
+                    "type": "sync_state",
+                    "target": event["origin"],
+                    "state": self.export_state(),
+                }))
+        elif not self._synced and event["target"] == self.worker_id:
+            self.import_state(event["state"])
+            self._finish_sync()
+
+    def _finish_sync(self) -> None:
+        if self._synced:
+            return
+        if self._sync_timer:
+            self._sync_timer.cancel()
+        self._synced = True
+        buffered, self._sync_buffer = self._sync_buffer, []
+        for event in buffered:
+            self._apply(event)
+        logger.info("Worker %s in sync (%d buffered events)", self.worker_id, len(buffered))
+
+
+# Shared by all rooms, so a flood is limited per user, not per user per room
+rate_limiter = RateLimiter(RATE_LIMITS)
+
+
+def create_room(room_id: str, backplane: Backplane) -> ConnectionManager:
+    return ConnectionManager(
+        backplane, archive=history_archive, ledger=bid_ledger, room=room_id, limiter=rate_limiter,
+        transcoder=transcoder, ban_list=ban_list,
+    )
 
 
-manager = ConnectionManager()
+rooms = RoomRegistry(
+    create_room,
+    create_backplane(BACKPLANE_URL),
+    idle_seconds=ROOM_IDLE_SECONDS,
+    max_rooms=ROOMS_MAX,
+)
+
+
+def _register_metrics() -> None:
+    """Scrape-time views of state that is already counted elsewhere, summed over rooms."""
+    def total(fn):
+        return lambda: sum(fn(room) for _, room in rooms.items())
+
+    def queue_depths():
+        depths = [channel.depth() for _, room in rooms.items() for channel in room.viewers.values()]
+        return {"max": max(depths, default=0), "sum": sum(depths)}
+
+    def bids_decided():
+        open_rooms = [room for _, room in rooms.items()]
+        return {
+            "accepted": sum(room.auction.accepted for room in open_rooms),
+            "rejected": sum(room.auction.rejected for room in open_rooms),
+        }
+
+    def viewer_tiers():
+        labels = ["source"] + [str(width) for width, _ in transcoder.ladder]
+        counts = dict.fromkeys(labels, 0)
+        for _, room in rooms.items():
+            for channel in room.viewers.values():
+                counts[labels[min(channel.tier, len(labels) - 1)]] += 1
+        return counts
+
+    def aggregator_total(attr):
+        return total(lambda room: getattr(room.chat_aggregator, attr) if room.chat_aggregator else 0)
+
+    REGISTRY.callback("rooms_open", "Rooms open on this worker", lambda: len(rooms))
+    REGISTRY.callback("rooms_opened_total", "Rooms opened on this worker", lambda: rooms.created, kind="counter")
+    REGISTRY.callback("viewers_local", "Viewers connected to this worker", total(lambda room: len(room.viewers)))
+    REGISTRY.callback(
+        "viewers_total", "Viewers of this worker's rooms across workers", total(lambda room: room.get_viewer_count()),
+    )
+    REGISTRY.callback("ws_queue_depth", "Outbound queue depth over local viewers", queue_depths, labelnames=("stat",))
+    REGISTRY.callback(
+        "auction_bids_total", "Bids decided by the auction engines", bids_decided,
+        kind="counter", labelnames=("result",),
+    )
+    REGISTRY.callback(
+        "ws_rate_limited_total", "Inbound messages dropped by flood protection",
+        lambda: dict(rate_limiter.limited), kind="counter", labelnames=("message",),
+    )
+    REGISTRY.callback("chat_batches_total", "chat_batch messages fanned out", aggregator_total("batches"), kind="counter")
+    REGISTRY.callback(
+        "chat_lines_sampled_out_total", "Chat lines left out of batches by sampling",
+        aggregator_total("lines_sampled_out"), kind="counter",
+    )
+    if transcoder:
+        REGISTRY.callback(
+            "viewers_by_tier", "Local viewers per frame quality tier (max width)", viewer_tiers, labelnames=("tier",),
+        )
+    REGISTRY.callback("bid_ledger_pending", "Accepted bids not yet committed", lambda: bid_ledger.pending)
+    REGISTRY.callback("bid_ledger_commits_total", "Bid ledger group commits", lambda: bid_ledger.commits, kind="counter")
+    REGISTRY.callback(
+        "bid_ledger_quarantined_total", "Bids the database refused, logged and set aside",
+        lambda: bid_ledger.quarantined, kind="counter",
+    )
+    REGISTRY.callback(
+        "history_archive_pending", "Chat rows waiting to be archived",
+        lambda: history_archive.pending if history_archive else None,
+    )
+    REGISTRY.callback(
+        "static_responses_total", "Static files and pages answered from memory",
+        lambda: {"served": static_files.served, "not_modified": static_files.not_modified},
+        kind="counter", labelnames=("result",),
+    )
+    REGISTRY.callback("static_cache_bytes", "Static files held in memory", lambda: static_files.size)
+    REGISTRY.callback(
+        "auth_cache_requests_total", "Session cache lookups",
+        lambda: {"hit": session_cache.hits, "miss": session_cache.misses}, kind="counter", labelnames=("result",),
+    )
+
+
+_register_metrics()
 
 
 # ---------------------------------------------------------------------------
 # WebSocket
 # ---------------------------------------------------------------------------
 
+class ClientState:
+    """Per-connection state shared by the message handlers."""
+
+    __slots__ = ("websocket", "manager", "role", "username", "identity", "authenticated")
+
+    def __init__(self, websocket: WebSocket, username: Optional[str], manager: ConnectionManager, identity: str = ""):
+        self.websocket = websocket
+        # The room this connection belongs to
+        self.manager = manager
+        self.role: Optional[str] = None
+        self.username = username
+        # What bans apply to (client_identity); fixed for the connection
+        self.identity = identity
+        # Signed in via session cookie, so identity is the account
+        self.authenticated = False
+
+    @property
+    def rate_limit_key(self) -> Optional[str]:
+        # Keyed on the account (user:<id>), not the display name, which
+        # set_username can change. Anonymous clients are not limited per
+        # key: anyone could exhaust someone else's allowance by posing as them.
+        return self.identity if self.authenticated else None
+
+    def sender(self, msg: dict) -> str:
+        # Username from DB (or join / set_username) takes priority
+        return self.username or msg.get("username") or "Anonymous"
+
+
+messages = MessageRegistry(WS_MAX_MESSAGE_SIZE)
+
+_username_field = Field(str, max_length=USERNAME_MAX_LENGTH)
+
+
+@messages.register("join", MessageSpec(512, role=Field(str, max_length=16), username=_username_field))
+async def on_join(client: ClientState, msg: dict) -> None:
+    websocket = client.websocket
+    manager = client.manager
+    if client.role is not None:
+        # The role is fixed by the first join; later ones are ignored
+        return
+    client.role = msg.get("role", "viewer")
+    # Username from DB takes priority, fall back to client-provided
+    if not client.username:
+        client.username = msg.get("username", "Anonymous")
+
+    if client.role == "streamer":
+        await manager.connect_streamer(websocket)
+        await manager.broadcast_live_status(True)
+        # Price, viewer count, ban list and recent history in one message
+        manager.send_personal(websocket, manager.streamer_snapshot())
+        # Email all registered users in the background (skipped if a
+        # recent reconnect already did). Only for a signed-in streamer:
+        # anyone can claim the streamer role of a fresh room.
+        if client.authenticated:
+            stream_notifier.trigger(manager.room)
+    else:
+        await manager.connect_viewer(websocket, client.identity)
+        # Price, live status and recent history in one message; the
+        # cached frame follows as soon as it has been sent
+        manager.send_encoded(websocket, manager.viewer_snapshot())
+        # Current count right away; everyone else gets the
+        # coalesced update on the next tick
+        manager.send_personal(websocket, {"type": "viewers", "count": manager.get_viewer_count()})
+        # Check if this user is banned
+        if manager.is_banned(client.identity):
+            manager.send_personal(websocket, {"type": "you_are_banned", "banned": True})
+
+
+@messages.register("set_username", MessageSpec(256, username=_username_field))
+async def on_set_username(client: ClientState, msg: dict) -> None:
+    new_name = msg.get("username", "").strip()
+    # Only the displayed name changes; bans follow client.identity
+    if new_name:
+        client.username = new_name
+
+
+@messages.register(
+    "chat",
+    # Non-ASCII text may arrive \u-escaped, six characters per character
+    MessageSpec(CHAT_MAX_LENGTH * 6 + 256, text=Field(str, required=True, max_length=CHAT_MAX_LENGTH),
+                username=_username_field),
+)
+async def on_chat(client: ClientState, msg: dict) -> None:
+    manager = client.manager
+    if manager.is_banned(client.identity):
+        return
+    text = msg["text"].strip()
+    if text:
+        await manager.broadcast_chat(client.sender(msg), text, client.identity)
+
+
+_lot_field = Field((str, int), max_length=64)
+
+
+@messages.register(
+    "bid",
+    MessageSpec(256, amount=Field((int, str), required=True, max_length=18), lot=_lot_field, username=_username_field),
+)
+async def on_bid(client: ClientState, msg: dict) -> None:
+    manager = client.manager
+    if manager.is_banned(client.identity):
+        return
+    lot = str(msg.get("lot") or manager.auction.default_lot)
+    try:
+        amount = int(msg["amount"])
+    except ValueError:
+        return
+    if not 0 < amount <= AUCTION_MAX_BID:
+        logger.debug("Rejected bid message: amount out of range")
+        return
+    if manager.ledger and manager.ledger.full:
+        # Refused rather than accepted without a durable record
+        return
+    # Cheap early reject; the engine makes the real decision
+    price = manager.auction.price(lot)
+    if price is not None and amount > price:
+        await manager.place_bid(client.sender(msg), lot, amount, client.identity)
+
+
+@messages.register("buy_now", MessageSpec(256, lot=_lot_field, username=_username_field))
+async def on_buy_now(client: ClientState, msg: dict) -> None:
+    manager = client.manager
+    if manager.is_banned(client.identity):
+        return
+    lot = str(msg.get("lot") or manager.auction.default_lot)
+    if manager.ledger and manager.ledger.full:
+        return
+    if manager.auction.price(lot) is not None:
+        await manager.buy_now(client.sender(msg), lot, client.identity)
+
+
+@messages.register("ban_user", MessageSpec(256, username=_username_field))
+async def on_ban_user(client: ClientState, msg: dict) -> None:
+    manager = client.manager
+    target = msg.get("username", "").strip()
+    if target and client.role == "streamer":
+        await manager.ban_user(target)
+
+
+@messages.register("unban_user", MessageSpec(256, username=_username_field))
+async def on_unban_user(client: ClientState, msg: dict) -> None:
+    manager = client.manager
+    target = msg.get("username", "").strip()
+    if target and client.role == "streamer":
+        await manager.unban_user(target)
+
+
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket, db: AsyncSession = Depends(get_db)):
+async def websocket_endpoint(websocket: WebSocket, room: str = DEFAULT_ROOM):
+    if not valid_room_id(room):
+        await websocket.close(code=1008)
+        return
     await websocket.accept()
-    role: Optional[str] = None
-    username: Optional[str] = None
 
     # Try to resolve user from session cookie
+    username, user_id = None, None
     session_id = websocket.cookies.get("session_id")
     if session_id:
-        result = await db.execute(
-            select(DBSession)
-            .where(DBSession.token == session_id)
-            .where(DBSession.expires_at > datetime.now(timezone.utc))
-        )
-        db_session = result.scalar_one_or_none()
-        if db_session:
-            result = await db.execute(select(User).where(User.id == db_session.user_id))
-            user = result.scalar_one_or_none()
-            if user:
-                username = user.name
+        # A short-lived session, handed back before the receive loop: a
+        # socket must not hold a pooled connection for its whole life.
+        async with AsyncSessionLocal() as db:
+            user = await resolve_session(db, session_id, session_cache)
+        if user:
+            username, user_id = user.name, user.id
+
+    manager = await rooms.acquire(room)
+    if manager is None:
+        await websocket.close(code=1013)  # too many rooms open: try again later
+        return
+    client = ClientState(websocket, username, manager, client_identity(websocket, user_id))
+    client.authenticated = user_id is not None
 
     try:
         while True:
-            data = await websocket.receive_text()
-            try:
-                msg = json.loads(data)
-            except json.JSONDecodeError:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            # Binary messages are video frames from the streamer, by far the
+            # most frequent; they skip JSON and the dispatch table entirely.
+            frame = message.get("bytes")
+            if frame is not None:
+                if client.role == "streamer" and frame:
+                    await manager.broadcast_frame(frame)
                 continue
 
-            msg_type = msg.get("type")
-
-            if msg_type == "join":
-                role = msg.get("role", "viewer")
-                # Username from DB takes priority, fall back to client-provided
-                if not username:
-                    username = msg.get("username", "Anonymous")
-
-                if role == "streamer":
-                    await manager.connect_streamer(websocket)
-                    await manager.broadcast_live_status(True)
-                    await websocket.send_json({"type": "price", "current": manager.current_price})
-                    await websocket.send_json({"type": "viewers", "count": manager.get_viewer_count()})
-                    # Send current ban list
-                    await websocket.send_json({"type": "ban_list", "banned": list(manager.banned_users)})
-                    for m in manager.chat_messages[-20:]:
-                        await websocket.send_json(m)
-                    for b in manager.bids[-10:]:
-                        await websocket.send_json(b)
-                    # Send email notifications to all registered users (fire-and-forget)
-                    async def _send_emails():
-                        from database import AsyncSessionLocal
-                        async with AsyncSessionLocal() as email_db:
-                            result = await email_db.execute(select(User))
-                            all_users = result.scalars().all()
-                            user_list = [{"email": u.email, "name": u.name} for u in all_users]
-                        if user_list:
-                            await notify_stream_started(user_list)
-                    asyncio.create_task(_send_emails())
-                else:
-                    await manager.connect_viewer(websocket, username)
-                    await websocket.send_json({"type": "price", "current": manager.current_price})
-                    await websocket.send_json({"type": "live_status", "is_live": manager.streamer is not None})
-                    # Check if this user is banned
-                    if manager.is_banned(username):
-                        await websocket.send_json({"type": "you_are_banned", "banned": True})
-                    for m in manager.chat_messages[-20:]:
-                        await websocket.send_json(m)
-                    for b in manager.bids[-10:]:
-                        await websocket.send_json(b)
-
-            elif msg_type == "set_username":
-                new_name = msg.get("username", "").strip()
-                if new_name:
-                    old_name = username
-                    username = new_name
-                    if role == "viewer":
-                        manager.usernames[id(websocket)] = new_name
-                        # Update ws tracking
-                        if old_name and old_name in manager.viewer_ws_by_username:
-                            wss = manager.viewer_ws_by_username[old_name]
-                            if websocket in wss:
-                                wss.remove(websocket)
-                            if not wss:
-                                del manager.viewer_ws_by_username[old_name]
-                        manager.viewer_ws_by_username.setdefault(new_name, []).append(websocket)
-                        # Check if new name is banned
-                        if manager.is_banned(new_name):
-                            await websocket.send_json({"type": "you_are_banned", "banned": True})
-
-            elif msg_type == "frame" and role == "streamer":
-                frame_data = msg.get("data", "")
-                if frame_data:
-                    await manager.broadcast_frame(frame_data)
-
-            elif msg_type == "chat":
-                u = username or msg.get("username", "Anonymous")
-                if manager.is_banned(u):
-                    continue
-                text = msg.get("text", "").strip()
-                if text:
-                    await manager.broadcast_chat(u, text)
-
-            elif msg_type == "bid":
-                u = username or msg.get("username", "Anonymous")
-                if manager.is_banned(u):
-                    continue
-                amount = msg.get("amount")
-                try:
-                    amount = int(amount)
-                except (TypeError, ValueError):
-                    continue
-                if amount > manager.current_price:
-                    manager.current_price = amount
-                    await manager.broadcast_bid(u, amount)
-                    await manager.broadcast_price(manager.current_price)
-
-            elif msg_type == "buy_now":
-                u = username or msg.get("username", "Anonymous")
-                if manager.is_banned(u):
-                    continue
-                manager.current_price += 1
-                await manager.broadcast_bid(u, manager.current_price)
-                await manager.broadcast_price(manager.current_price)
-
-            elif msg_type == "ban_user" and role == "streamer":
-                target = msg.get("username", "").strip()
-                if target:
-                    await manager.ban_user(target)
-
-            elif msg_type == "unban_user" and role == "streamer":
-                target = msg.get("username", "").strip()
-                if target:
-                    await manager.unban_user(target)
+            data = message.get("text")
+            if data is None:
+                continue
+            decoded = messages.decode(data)
+            if decoded is not None:
+                msg, handler = decoded
+                if manager.allow_message(websocket, client.rate_limit_key, msg["type"]):
+                    await handler(client, msg)
 
     except WebSocketDisconnect:
         pass
     finally:
-        if role == "streamer":
-            manager.disconnect_streamer(websocket)
-            await manager.broadcast_live_status(False)
-        else:
-            manager.disconnect_viewer(websocket)
         try:
-            await manager.broadcast_viewer_count()
-        except Exception:
-            pass
+            if client.role == "streamer":
+                # Only if still the current streamer, not one replaced by a newer one
+                if manager.disconnect_streamer(websocket):
+                    await manager.broadcast_live_status(False)
+            else:
+                manager.disconnect_viewer(websocket)
+            manager.forget_connection(websocket)
+        finally:
+            rooms.release(room)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,232 @@
+"""
+metrics.py — In-process metrics in the Prometheus text format.
+
+Deliberately tiny, with no dependencies: counters and histograms are plain
+attribute updates (well under a microsecond each), so they can stay on the
+hot paths in production. Anything that already has a counter or a size
+somewhere else (queue depths, auction counters, cache stats) is read at
+scrape time through a callback instead of being mirrored on every event.
+
+    from metrics import REGISTRY
+    SENT = REGISTRY.counter("ws_messages_sent_total", "Messages sent to clients")
+    SENT.inc()
+
+GET /metrics renders REGISTRY.
+"""
+import logging
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds, from 50 µs (a send into the kernel buffer) to 10 s (a stuck socket)
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(n, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for n, v in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Family:
+    """One metric name: either unlabelled, or one child per label-value tuple."""
+
+    def __init__(self, name: str, help_text: str, kind: str, labelnames: Sequence[str], factory):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = factory()
+
+    def labels(self, *values: str):
+        """Child for these label values. Look it up once and keep it on hot paths."""
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._factory()
+        return child
+
+    # Unlabelled shortcuts
+    def inc(self, amount: float = 1) -> None:
+        self._children[()].inc(amount)
+
+    def set(self, value: float) -> None:
+        self._children[()].set(value)
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        for values, child in list(self._children.items()):
+            labels = _format_labels(self.labelnames, values)
+            if self.kind == "histogram":
+                cumulative = 0
+                for bound, count in zip(child.buckets + (float("inf"),), child.counts):
+                    cumulative += count
+                    le = _format_labels(self.labelnames + ("le",), values + (_format_value(bound),))
+                    yield self.name + "_bucket", le, cumulative
+                yield self.name + "_sum", labels, child.sum
+                yield self.name + "_count", labels, child.count
+            else:
+                yield self.name, labels, child.value
+
+
+class _CallbackFamily:
+    """Values read at scrape time: fn() returns a number, or {label value tuple: number}."""
+
+    def __init__(self, name: str, help_text: str, kind: str, labelnames: Sequence[str], fn: Callable):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._fn = fn
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        result = self._fn()
+        if isinstance(result, dict):
+            for values, value in result.items():
+                if not isinstance(values, tuple):
+                    values = (values,)
+                yield self.name, _format_labels(self.labelnames, values), value
+        elif result is not None:
+            yield self.name, "", result
+
+
+class Registry:
+    def __init__(self):
+        self._families: Dict[str, object] = {}
+
+    def _add(self, family):
+        if family.name in self._families:
+            raise ValueError("Duplicate metric: {}".format(family.name))
+        self._families[family.name] = family
+        return family
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> _Family:
+        return self._add(_Family(name, help_text, "counter", labelnames, Counter))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> _Family:
+        return self._add(_Family(name, help_text, "gauge", labelnames, Gauge))
+
+    def histogram(
+        self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> _Family:
+        return self._add(_Family(name, help_text, "histogram", labelnames, lambda: Histogram(buckets)))
+
+    def callback(self, name: str, help_text: str, fn: Callable, kind: str = "gauge", labelnames: Sequence[str] = ()):
+        """Register a metric computed by fn() at scrape time. Re-registering replaces it."""
+        self._families.pop(name, None)
+        return self._add(_CallbackFamily(name, help_text, kind, labelnames, fn))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for family in list(self._families.values()):
+            try:
+                samples = list(family.samples())
+            except Exception as e:
+                logger.warning("Metric %s failed: %s", family.name, e)
+                continue
+            lines.append("# HELP {} {}".format(family.name, family.help))
+            lines.append("# TYPE {} {}".format(family.name, family.kind))
+            for name, labels, value in samples:
+                lines.append("{}{} {}".format(name, labels, _format_value(value)))
+        lines.append("")
+        return "\n".join(lines)
+
+
+REGISTRY = Registry()
+
+
+# ---------------------------------------------------------------------------
+# Event-loop lag (fed by watchdog.LoopWatchdog)
+# ---------------------------------------------------------------------------
+
+LOOP_LAG = REGISTRY.histogram(
+    "event_loop_lag_seconds", "How late the event loop ran the watchdog heartbeat",
+)
+LOOP_LAG_LAST = REGISTRY.gauge("event_loop_lag_last_seconds", "Most recent event-loop lag sample")
+
+
+# ---------------------------------------------------------------------------
+# Database
+# ---------------------------------------------------------------------------
+
+DB_QUERY = REGISTRY.histogram("db_query_seconds", "SQL statement execution time")
+DB_ERRORS = REGISTRY.counter("db_query_errors_total", "SQL statements that raised")
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement on a (sync or async) SQLAlchemy engine."""
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        DB_QUERY.observe(time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        DB_ERRORS.inc()
+        stack = context.connection.info.get("query_started") if context.connection is not None else None
+        if stack:
+            stack.pop()
@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime, timezone
 
-from sqlalchemy import DateTime, ForeignKey, String
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, Text, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from database import Base
@@ -35,6 +35,9 @@ class User(Base):
 
 class Session(Base):
     __tablename__ = "sessions"
+    # Auth lookups go by the token (primary key); the reaper finds expired
+    # rows oldest first through this index
+    __table_args__ = (Index("ix_sessions_expires_at", "expires_at"),)
 
     token: Mapped[str] = mapped_column(String(64), primary_key=True, default=lambda: uuid.uuid4().hex)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -42,3 +45,67 @@ class Session(Base):
     expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
 
     user: Mapped["User"] = relationship(back_populates="sessions")
+
+
+class ChatMessage(Base):
+    """Archived chat line. Written in batches by archive.HistoryArchive."""
+    __tablename__ = "chat_messages"
+    # History pages are read per room, newest id first
+    __table_args__ = (Index("ix_chat_messages_room_id", "room", "id"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    room: Mapped[str] = mapped_column(String(64), nullable=False, default="main")
+    username: Mapped[str] = mapped_column(String(255), nullable=False)
+    text: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "type": "chat",
+            "room": self.room,
+            "username": self.username,
+            "text": self.text,
+            "created_at": self.created_at.isoformat(),
+        }
+
+
+class Bid(Base):
+    """Accepted bid. Append-only ledger written in batches by ledger.BidLedger."""
+    __tablename__ = "bids"
+    # Bid seq is per room; history pages are read per room too
+    __table_args__ = (Index("ix_bids_room_seq", "room", "seq"), Index("ix_bids_room_id", "room", "id"))
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    room: Mapped[str] = mapped_column(String(64), nullable=False, default="main")
+    seq: Mapped[int] = mapped_column(Integer, nullable=False)
+    lot: Mapped[str] = mapped_column(String(64), nullable=False)
+    username: Mapped[str] = mapped_column(String(255), nullable=False)
+    amount: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "type": "bid",
+            "room": self.room,
+            "seq": self.seq,
+            "lot": self.lot,
+            "username": self.username,
+            "amount": self.amount,
+            "created_at": self.created_at.isoformat(),
+        }
+
+
+class Ban(Base):
+    """A room's ban on one identity. Kept in step by moderation.BanList."""
+    __tablename__ = "bans"
+    # A room's bans are read together when it (re)opens
+    __table_args__ = (UniqueConstraint("room", "identity", name="uq_bans_room_identity"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    room: Mapped[str] = mapped_column(String(64), nullable=False)
+    identity: Mapped[str] = mapped_column(String(128), nullable=False)
+    # The name the streamer banned, as listed on the console
+    username: Mapped[str] = mapped_column(String(255), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
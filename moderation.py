@@ -0,0 +1,110 @@
+"""
+moderation.py — Room ban lists that outlive the room.
+
+A room nobody is connected to is closed after ROOM_IDLE_SECONDS and its
+ConnectionManager, with everything it holds in memory, is dropped. Bans
+must not go with it: a banned viewer would only have to wait for the room
+to empty. BanList writes every ban and unban to the `bans` table in the
+order they were applied, from a background task, and a room that opens
+again reads its list back (queued changes included) before it starts.
+
+Only the worker the ban event came from records it, like bids in the
+ledger. A failed commit keeps the changes queued and is retried.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select
+
+from models import Ban
+
+logger = logging.getLogger(__name__)
+
+_RETRY_MAX_SECONDS = 5.0
+
+
+class BanList:
+    def __init__(self, session_factory):
+        self._session_factory = session_factory
+        # (room, "ban" | "unban", identity -> name shown to the streamer)
+        self._pending: List[Tuple[str, str, Dict[str, str]]] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def record(self, room: str, op: str, identities: Dict[str, str]) -> None:
+        """Queue one applied ban or unban. Never blocks."""
+        self._pending.append((room, op, dict(identities)))
+        self._wakeup.set()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and write out whatever is still pending."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pending:
+            await self.flush()
+
+    async def _run(self) -> None:
+        retry_delay = 0.0
+        while True:
+            if retry_delay:
+                await asyncio.sleep(retry_delay)
+            else:
+                await self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                retry_delay = 0.0
+            except Exception as e:
+                retry_delay = min(_RETRY_MAX_SECONDS, max(0.1, retry_delay * 2))
+                logger.error("Ban list commit failed (%d pending, retrying in %.1fs): %s",
+                             len(self._pending), retry_delay, e)
+
+    async def flush(self) -> int:
+        """Commit every queued change in one transaction. Returns how many there were."""
+        batch = self._pending[:]
+        if not batch:
+            return 0
+        now = datetime.now(timezone.utc)
+        async with self._session_factory() as db:
+            for room, op, identities in batch:
+                await db.execute(delete(Ban).where(Ban.room == room, Ban.identity.in_(list(identities))))
+                if op == "ban":
+                    await db.execute(insert(Ban), [
+                        {"room": room, "identity": identity, "username": name, "created_at": now}
+                        for identity, name in identities.items()
+                    ])
+            await db.commit()
+        # Changes recorded while we were committing stay queued behind these
+        del self._pending[:len(batch)]
+        return len(batch)
+
+    async def load(self, room: str) -> Dict[str, str]:
+        """One room's bans: identity -> name shown to the streamer."""
+        # Taken before the query, so a change committed meanwhile is
+        # replayed on top of itself rather than missed.
+        queued = [(op, identities) for r, op, identities in self._pending if r == room]
+        async with self._session_factory() as db:
+            rows = await db.execute(select(Ban.identity, Ban.username).where(Ban.room == room))
+            bans = {identity: name for identity, name in rows.all()}
+        for op, identities in queued:
+            if op == "ban":
+                bans.update(identities)
+            else:
+                for identity in identities:
+                    bans.pop(identity, None)
+        return bans
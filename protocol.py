@@ -0,0 +1,127 @@
+"""
+protocol.py — WebSocket message codec, schemas and handler registry.
+
+JSON goes through orjson when it is installed (`pip install orjson`) and
+through the stdlib json module otherwise; both produce the same compact
+UTF-8 text.
+
+Each inbound message type is registered once with a MessageSpec (length
+limit and field types) and its handler. The /ws receive loop rejects
+oversized text before parsing it, validates the parsed message against the
+spec and calls the handler with a dict lookup instead of an if/elif chain.
+"""
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+if orjson is not None:
+    JSON_BACKEND = "orjson"
+    JSONDecodeError = (orjson.JSONDecodeError, UnicodeError)
+
+    def loads(data) -> Any:
+        return orjson.loads(data)
+
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+else:
+    JSON_BACKEND = "json"
+    JSONDecodeError = (json.JSONDecodeError, UnicodeError)
+
+    def loads(data) -> Any:
+        return json.loads(data)
+
+    def dumps(obj: Any) -> str:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+class Field:
+    """One message field: accepted Python types, whether it must be present, max length if a string."""
+
+    __slots__ = ("types", "required", "max_length")
+
+    def __init__(self, types, required: bool = False, max_length: Optional[int] = None):
+        self.types = types if isinstance(types, tuple) else (types,)
+        self.required = required
+        self.max_length = max_length
+
+
+class MessageSpec:
+    def __init__(self, max_size: int, **fields: Field):
+        self.max_size = max_size  # characters of JSON text
+        self.fields = fields
+
+    def validate(self, msg: dict, size: int) -> Optional[str]:
+        """Returns a reason if the message is invalid, None if it is fine."""
+        if size > self.max_size:
+            return "too large"
+        for name, field in self.fields.items():
+            value = msg.get(name)
+            if value is None:
+                if field.required:
+                    return "missing " + name
+                continue
+            # bool is an int subclass; never accept it where a number is expected
+            if not isinstance(value, field.types) or (isinstance(value, bool) and bool not in field.types):
+                return "bad " + name
+            if isinstance(value, str):
+                if field.max_length is not None and len(value) > field.max_length:
+                    return name + " too long"
+                # The stdlib parser lets "\ud800" through as a lone surrogate,
+                # which cannot be sent back out as UTF-8
+                try:
+                    value.encode("utf-8")
+                except UnicodeEncodeError:
+                    return "bad " + name
+        return None
+
+
+Handler = Callable[[Any, dict], Awaitable[None]]
+
+
+class MessageRegistry:
+    """Message type -> (spec, handler)."""
+
+    def __init__(self, max_size: int):
+        # Anything longer is dropped before it is even parsed
+        self.max_size = max_size
+        self._handlers: Dict[str, Tuple[MessageSpec, Handler]] = {}
+        self.rejected = 0
+
+    def register(self, msg_type: str, spec: MessageSpec) -> Callable[[Handler], Handler]:
+        def decorator(handler: Handler) -> Handler:
+            self._handlers[msg_type] = (spec, handler)
+            return handler
+        return decorator
+
+    def decode(self, data: str) -> Optional[Tuple[dict, Handler]]:
+        """Parse and validate one text message. None if it should be ignored."""
+        size = len(data)
+        if size > self.max_size:
+            self.rejected += 1
+            return None
+        try:
+            msg = loads(data)
+        except JSONDecodeError:
+            self.rejected += 1
+            return None
+        if not isinstance(msg, dict):
+            self.rejected += 1
+            return None
+        msg_type = msg.get("type")
+        entry = self._handlers.get(msg_type) if isinstance(msg_type, str) else None
+        if entry is None:
+            return None
+        spec, handler = entry
+        reason = spec.validate(msg, size)
+        if reason is not None:
+            self.rejected += 1
+            logger.debug("Rejected %s message: %s", msg_type, reason)
+            return None
+        return msg, handler
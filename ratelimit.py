@@ -0,0 +1,118 @@
+"""
+ratelimit.py — Token bucket rate limiters.
+"""
+import time
+from typing import Dict, Hashable, Optional, Tuple
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to `burst` tokens, refilled at `rate`
+    tokens per second. Not thread-safe; meant for use on the event loop.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def try_acquire(self, cost: float = 1.0, now: Optional[float] = None) -> bool:
+        """Take `cost` tokens if available. Never waits."""
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+
+    def reserve(self, cost: float = 1.0) -> float:
+        """
+        Take `cost` tokens unconditionally, going into debt if needed, and
+        return how many seconds the caller should wait before proceeding.
+        """
+        self._refill(time.monotonic())
+        self.tokens -= cost
+        return max(0.0, -self.tokens / self.rate)
+
+
+class RateLimiter:
+    """
+    Per-message-type token buckets, one per connection and one per user.
+
+    `limits` maps a message type to (rate per second, burst); other types are
+    not limited. The per-user bucket, keyed on a stable account identity
+    (`user:<id>`), stops one user from multiplying their allowance by opening
+    more connections. User buckets are dropped once they have refilled, so
+    the table only holds recently active users.
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]], prune_interval: float = 60.0):
+        self.limits = limits
+        self.prune_interval = prune_interval
+        self._by_connection: Dict[Hashable, Dict[str, TokenBucket]] = {}
+        self._by_user: Dict[Tuple[str, str], TokenBucket] = {}
+        self._next_prune = time.monotonic() + prune_interval
+        self.allowed: Dict[str, int] = {msg_type: 0 for msg_type in limits}
+        self.limited: Dict[str, int] = {msg_type: 0 for msg_type in limits}
+
+    def check(self, connection: Hashable, user: Optional[str], msg_type: str) -> float:
+        """
+        Take one token for this message. Returns 0.0 if it is allowed,
+        otherwise roughly how many seconds until it would be.
+        """
+        limit = self.limits.get(msg_type)
+        if limit is None:
+            return 0.0
+        now = time.monotonic()
+        buckets = self._by_connection.setdefault(connection, {})
+        conn_bucket = buckets.get(msg_type)
+        if conn_bucket is None:
+            conn_bucket = buckets[msg_type] = TokenBucket(*limit)
+        user_bucket = None
+        if user:
+            user_bucket = self._by_user.get((user, msg_type))
+            if user_bucket is None:
+                user_bucket = self._by_user[(user, msg_type)] = TokenBucket(*limit)
+            user_bucket._refill(now)
+
+        conn_bucket._refill(now)
+        if conn_bucket.tokens < 1 or (user_bucket is not None and user_bucket.tokens < 1):
+            self.limited[msg_type] += 1
+            short = [b for b in (conn_bucket, user_bucket) if b is not None and b.tokens < 1]
+            return max((1 - b.tokens) / b.rate for b in short)
+        conn_bucket.tokens -= 1
+        if user_bucket is not None:
+            user_bucket.tokens -= 1
+        self.allowed[msg_type] += 1
+        if now >= self._next_prune:
+            self._prune(now)
+        return 0.0
+
+    def forget(self, connection: Hashable) -> None:
+        """Drop a closed connection's buckets."""
+        self._by_connection.pop(connection, None)
+
+    def _prune(self, now: float) -> None:
+        self._next_prune = now + self.prune_interval
+        full = []
+        for key, bucket in self._by_user.items():
+            bucket._refill(now)
+            if bucket.tokens >= bucket.capacity:
+                full.append(key)
+        for key in full:
+            del self._by_user[key]
+
+    def stats(self) -> dict:
+        return {
+            "limits": {t: {"rate": r, "burst": b} for t, (r, b) in self.limits.items()},
+            "allowed": dict(self.allowed),
+            "limited": dict(self.limited),
+            "connections": len(self._by_connection),
+            "users": len({user for user, _ in self._by_user}),
+        }
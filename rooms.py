@@ -0,0 +1,257 @@
+"""
+rooms.py — One live stream (and auction) per room, many rooms per process.
+
+RoomRegistry maps a room id (the stream id in `/ws?room=...`) to its own
+ConnectionManager, created on first use. Each connection holds a reference
+on its room while it is open; a room nobody is connected to is stopped and
+dropped after `idle_seconds`, so its frames, queues and history are freed.
+Whatever must outlive that lives in the database and is read back when the
+room opens again: prices and bids (ledger.py) and bans (moderation.py).
+Rooms share nothing on the hot path: each has its own viewers, frame slot,
+auction and backplane, so a busy room never waits on another one.
+
+With the in-process backplane every room simply gets its own. A shared
+backplane (several workers) is multiplexed: RoomBackplane tags each room's
+events with the room id and BackplaneMux hands incoming events to the room
+they belong to, if this worker has it open. A worker that opens a room
+later asks its peers for the room's state like a freshly started worker.
+
+Events that concern the whole process rather than one room (e.g. a logout
+that every worker's session cache must forget) go through
+RoomRegistry.publish() / subscribe(): untagged, and dispatched by type.
+"""
+import asyncio
+import logging
+import re
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from backplane import CONNECTED, Backplane, Event, EventHandler, InProcessBackplane
+
+logger = logging.getLogger(__name__)
+
+ROOM_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+_FRAME_TAG_END = b"\n"
+
+
+def valid_room_id(room_id: Optional[str]) -> bool:
+    return bool(room_id) and ROOM_ID_PATTERN.fullmatch(room_id) is not None
+
+
+class BackplaneMux:
+    """One shared backplane carrying the events of every room."""
+
+    def __init__(self, backplane: Backplane):
+        self.backplane = backplane
+        self._handlers: Dict[str, EventHandler] = {}
+        # Event type -> handler, for process-wide events without a room
+        self._subscribers: Dict[str, EventHandler] = {}
+        self._connected = False
+        self._started = False
+        self._start_lock = asyncio.Lock()
+
+    async def _ensure_started(self) -> None:
+        async with self._start_lock:
+            if not self._started:
+                await self.backplane.start(self._dispatch)
+                self._started = True
+
+    async def attach(self, room_id: str, handler: EventHandler) -> None:
+        self._handlers[room_id] = handler
+        await self._ensure_started()
+        if self._connected and self._handlers.get(room_id) is handler:
+            # The hub connection is already up; this room still has to sync
+            handler(dict(CONNECTED))
+
+    def detach(self, room_id: str, handler: EventHandler) -> None:
+        # A reopened room may already have attached its new manager
+        if self._handlers.get(room_id) is handler:
+            del self._handlers[room_id]
+
+    async def subscribe(self, event_type: str, handler: EventHandler) -> None:
+        self._subscribers[event_type] = handler
+        await self._ensure_started()
+
+    async def publish_global(self, event: dict) -> None:
+        await self._ensure_started()
+        await self.backplane.publish(event)
+
+    async def publish(self, room_id: str, event: Event) -> None:
+        if isinstance(event, bytes):
+            event = room_id.encode("ascii") + _FRAME_TAG_END + event
+        else:
+            event["room"] = room_id
+        await self.backplane.publish(event)
+
+    def _dispatch(self, event: Event) -> None:
+        if isinstance(event, bytes):
+            end = event.find(_FRAME_TAG_END, 0, 65)
+            if end < 0:
+                return
+            handler = self._handlers.get(event[:end].decode("ascii"))
+            if handler:
+                handler(event[end + 1:])
+            return
+        if event.get("type") == CONNECTED["type"]:
+            self._connected = True
+            for handler in list(self._handlers.values()):
+                handler(dict(CONNECTED))
+            return
+        room_id = event.get("room")
+        handler = self._handlers.get(room_id) if room_id is not None else self._subscribers.get(event.get("type"))
+        if handler:
+            handler(event)
+
+    async def stop(self) -> None:
+        if self._started:
+            await self.backplane.stop()
+            self._started = False
+            self._connected = False
+
+
+class RoomBackplane(Backplane):
+    """A single room's view of a BackplaneMux."""
+
+    shared = True
+
+    def __init__(self, mux: BackplaneMux, room_id: str):
+        self.mux = mux
+        self.room_id = room_id
+        self._handler: Optional[EventHandler] = None
+
+    async def start(self, handler: EventHandler) -> None:
+        self._handler = handler
+        await self.mux.attach(self.room_id, handler)
+
+    async def publish(self, event: Event) -> None:
+        await self.mux.publish(self.room_id, event)
+
+    async def stop(self) -> None:
+        if self._handler:
+            self.mux.detach(self.room_id, self._handler)
+
+
+class RoomRegistry:
+    """
+    factory(room_id, backplane) builds a room's manager, which must have
+    async start() and stop(). acquire() / release() bracket each connection.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str, Backplane], object],
+        backplane: Optional[Backplane] = None,
+        idle_seconds: float = 30.0,
+        max_rooms: int = 1000,
+    ):
+        self._factory = factory
+        self._mux = BackplaneMux(backplane) if backplane is not None and backplane.shared else None
+        self.idle_seconds = idle_seconds
+        self.max_rooms = max_rooms
+        self._rooms: Dict[str, object] = {}
+        self._starting: Dict[str, asyncio.Future] = {}
+        self._refs: Dict[str, int] = {}
+        self._idle_timers: Dict[str, asyncio.TimerHandle] = {}
+        # Process-wide event handlers when there is no shared backplane
+        self._subscribers: Dict[str, EventHandler] = {}
+        self.created = 0
+        self.closed = 0
+
+    def __len__(self) -> int:
+        return len(self._rooms)
+
+    def items(self) -> Iterator[Tuple[str, object]]:
+        return iter(list(self._rooms.items()))
+
+    def get(self, room_id: str):
+        return self._rooms.get(room_id)
+
+    async def subscribe(self, event_type: str, handler: EventHandler) -> None:
+        """Call handler for every process-wide event of this type, from any worker (this one included)."""
+        if self._mux:
+            await self._mux.subscribe(event_type, handler)
+        else:
+            self._subscribers[event_type] = handler
+
+    async def publish(self, event: dict) -> None:
+        """Send a process-wide event (no room) to every worker's subscriber."""
+        if self._mux:
+            await self._mux.publish_global(event)
+            return
+        handler = self._subscribers.get(event["type"])
+        if handler:
+            handler(event)
+
+    async def acquire(self, room_id: str):
+        """The room's manager, started if it was not running. None when max_rooms are open."""
+        timer = self._idle_timers.pop(room_id, None)
+        if timer:
+            timer.cancel()
+        manager = self._rooms.get(room_id)
+        if manager is None:
+            manager = await self._open(room_id)
+            if manager is None:
+                return None
+        self._refs[room_id] = self._refs.get(room_id, 0) + 1
+        return manager
+
+    def release(self, room_id: str) -> None:
+        refs = self._refs.get(room_id, 0) - 1
+        if refs > 0:
+            self._refs[room_id] = refs
+            return
+        self._refs.pop(room_id, None)
+        if room_id in self._rooms and room_id not in self._idle_timers:
+            self._idle_timers[room_id] = asyncio.get_running_loop().call_later(
+                self.idle_seconds, lambda: asyncio.create_task(self._close_if_idle(room_id))
+            )
+
+    async def _open(self, room_id: str):
+        pending = self._starting.get(room_id)
+        if pending is not None:
+            # Someone else is already starting this room
+            return await asyncio.shield(pending)
+        if len(self._rooms) + len(self._starting) >= self.max_rooms:
+            logger.warning("Room limit (%d) reached — refusing room %s", self.max_rooms, room_id)
+            return None
+        future = asyncio.get_running_loop().create_future()
+        self._starting[room_id] = future
+        try:
+            backplane = RoomBackplane(self._mux, room_id) if self._mux else InProcessBackplane()
+            manager = self._factory(room_id, backplane)
+            await manager.start()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # waiters re-raise it; don't log it as unretrieved
+            raise
+        finally:
+            del self._starting[room_id]
+        self._rooms[room_id] = manager
+        self.created += 1
+        future.set_result(manager)
+        logger.info("Room %s opened (%d open)", room_id, len(self._rooms))
+        return manager
+
+    async def _close_if_idle(self, room_id: str) -> None:
+        self._idle_timers.pop(room_id, None)
+        if self._refs.get(room_id):
+            return
+        manager = self._rooms.pop(room_id, None)
+        if manager is None:
+            return
+        self.closed += 1
+        await manager.stop()
+        logger.info("Room %s closed after %.0fs idle (%d open)", room_id, self.idle_seconds, len(self._rooms))
+
+    async def close(self) -> None:
+        for timer in self._idle_timers.values():
+            timer.cancel()
+        self._idle_timers.clear()
+        rooms, self._rooms = list(self._rooms.values()), {}
+        for manager in rooms:
+            await manager.stop()
+        if self._mux:
+            await self._mux.stop()
@@ -0,0 +1,89 @@
+"""
+session_reaper.py — Background deletion of expired login sessions.
+
+Every Google sign-in adds a row to `sessions`, and nothing else ever
+removes one except an explicit logout. SessionReaper wakes every
+`interval` seconds (and once right after startup) and deletes expired rows
+oldest first, at most `batch_size` per transaction, yielding between
+batches. Each transaction holds the database's write lock only for one
+small batch, so sign-ins, bid commits and the chat archive get their turn
+while a large backlog is worked off.
+
+Lookups already ignore expired rows (auth_cache.resolve_session), so the
+reaper only keeps the table and its indexes from growing without bound.
+With several workers each one runs its own reaper; deletes are idempotent.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import delete, select
+
+from metrics import REGISTRY
+from models import Session
+
+logger = logging.getLogger(__name__)
+
+REAPED = REGISTRY.counter("sessions_reaped_total", "Expired login sessions deleted")
+
+
+class SessionReaper:
+    def __init__(self, session_factory, interval: float = 600.0, batch_size: int = 250, pause: float = 0.05):
+        self._session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        # Sleep between batches, so queued writers get the lock in between
+        self.pause = pause
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                reaped = await self.reap()
+                if reaped:
+                    logger.info("Deleted %d expired sessions", reaped)
+            except Exception as e:
+                logger.error("Session reaper failed (retrying in %.0fs): %s", self.interval, e)
+            await asyncio.sleep(self.interval)
+
+    async def reap(self) -> int:
+        """Delete every session expired by now, batch by batch. Returns the number deleted."""
+        now = datetime.now(timezone.utc)
+        total = 0
+        while True:
+            deleted = await self.reap_batch(now)
+            total += deleted
+            if deleted < self.batch_size:
+                break
+            await asyncio.sleep(self.pause)
+        return total
+
+    async def reap_batch(self, now: datetime) -> int:
+        """Delete up to batch_size sessions that expired before `now`, in one transaction."""
+        expired = (
+            select(Session.token)
+            .where(Session.expires_at <= now)
+            .order_by(Session.expires_at)
+            .limit(self.batch_size)
+        )
+        async with self._session_factory() as db:
+            result = await db.execute(
+                delete(Session).where(Session.token.in_(expired)).execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        REAPED.inc(result.rowcount)
+        return result.rowcount
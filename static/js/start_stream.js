@@ -11,19 +11,26 @@
     const streamerChatMessages = document.getElementById("streamerChatMessages");
     const streamerBidsList = document.getElementById("streamerBidsList");
     const streamerPrice = document.getElementById("streamerPrice");
+    const lotPrices = {};
     const streamBadge = document.getElementById("streamBadge");
     const streamerViewerCount = document.getElementById("streamerViewerCount");
 
     let stream = null;
     let ws = null;
     let captureInterval = null;
+    // Banned identity -> name it was banned under; kept in step by ban_delta
+    let bans = new Map();
+    let banSeq = 0;
     let bannedUsers = new Set();
     const FPS = 60;
     const INTERVAL_MS = 1000 / FPS;
 
     function getWsUrl() {
         const protocol = window.location.protocol === "https:" ? "wss:" : "ws:";
-        return `${protocol}//${window.location.host}/ws`;
+        // /stream?room=<id> watches (or /start_stream?room=<id> hosts) that room
+        const room = new URLSearchParams(window.location.search).get("room");
+        const query = room ? `?room=${encodeURIComponent(room)}` : "";
+        return `${protocol}//${window.location.host}/ws${query}`;
     }
 
     function setStatus(tokenKey, fallback) {
@@ -47,7 +54,7 @@
         return d.innerHTML;
     }
 
-    function appendChat(name, text) {
+    function chatElement(name, text) {
         const el = document.createElement("div");
         el.className = "chat-message chat-message-mod";
         el.dataset.username = name;
@@ -105,7 +112,19 @@
             });
         }
 
-        streamerChatMessages.appendChild(el);
+        return el;
+    }
+
+    function appendChat(name, text) {
+        streamerChatMessages.appendChild(chatElement(name, text));
+        streamerChatMessages.scrollTop = streamerChatMessages.scrollHeight;
+    }
+
+    function appendChatBatch(lines) {
+        // One DOM insertion and one scroll for the whole window
+        const fragment = document.createDocumentFragment();
+        lines.forEach((m) => fragment.appendChild(chatElement(m.username, m.text)));
+        streamerChatMessages.appendChild(fragment);
         streamerChatMessages.scrollTop = streamerChatMessages.scrollHeight;
     }
 
@@ -163,24 +182,55 @@
         });
     }
 
+    function applySnapshot(msg) {
+        streamerChatMessages.innerHTML = "";
+        streamerBidsList.innerHTML = "";
+        bans = new Map(Object.entries(msg.bans || {}));
+        banSeq = msg.ban_seq || 0;
+        bannedUsers = new Set(bans.values());
+        Object.entries(msg.prices || {}).forEach(([lot, current]) => {
+            handleWsMessage({ type: "price", lot: lot, current: current });
+        });
+        handleWsMessage({ type: "viewers", count: msg.viewers });
+        appendChatBatch(msg.chat || []);
+        (msg.bids || []).forEach((b) => appendBid(b.username, b.amount));
+    }
+
     function handleWsMessage(msg) {
         switch (msg.type) {
+            case "snapshot":
+                applySnapshot(msg);
+                break;
             case "chat":
                 appendChat(msg.username, msg.text);
                 break;
+            case "chat_batch":
+                appendChatBatch(msg.messages);
+                break;
             case "bid":
                 appendBid(msg.username, msg.amount);
                 break;
             case "price":
-                if (streamerPrice) streamerPrice.textContent = "$" + msg.current;
+                lotPrices[msg.lot] = msg.current;
+                if (streamerPrice) {
+                    streamerPrice.textContent = Object.keys(lotPrices).sort()
+                        .map((lot) => "#" + lot + " $" + lotPrices[lot]).join(" · ");
+                }
                 break;
             case "viewers":
                 if (streamerViewerCount) {
                     streamerViewerCount.innerHTML = msg.count + ' <span data-i18n="viewers">' + window.t('viewers') + '</span>';
                 }
                 break;
-            case "ban_list":
-                bannedUsers = new Set(msg.banned || []);
+            case "ban_delta":
+                // Changes up to ban_seq are already in the snapshot
+                if (msg.seq <= banSeq) break;
+                banSeq = msg.seq;
+                Object.entries(msg.ids || {}).forEach(([id, name]) => {
+                    if (msg.op === "ban") bans.set(id, name);
+                    else bans.delete(id);
+                });
+                bannedUsers = new Set(bans.values());
                 refreshBanBadges();
                 break;
         }
@@ -247,9 +297,13 @@
         const MAX_WIDTH = 900;
         const JPEG_QUALITY = 0.4;
 
+        let encoding = false;
+
         captureInterval = setInterval(() => {
             if (!ws || ws.readyState !== WebSocket.OPEN) return;
             if (video.readyState !== video.HAVE_ENOUGH_DATA) return;
+            // Skip this tick while the previous frame is still being encoded
+            if (encoding) return;
 
             let w = video.videoWidth;
             let h = video.videoHeight;
@@ -264,12 +318,16 @@
 
             ctx.drawImage(video, 0, 0, w, h);
             try {
-                const dataUrl = canvas.toDataURL("image/jpeg", JPEG_QUALITY);
-                const base64 = dataUrl.split(",")[1];
-                if (base64) {
-                    ws.send(JSON.stringify({ type: "frame", data: base64 }));
-                }
+                // Frames go out as raw JPEG bytes in a binary message
+                encoding = true;
+                canvas.toBlob((blob) => {
+                    encoding = false;
+                    if (blob && ws && ws.readyState === WebSocket.OPEN) {
+                        ws.send(blob);
+                    }
+                }, "image/jpeg", JPEG_QUALITY);
             } catch (e) {
+                encoding = false;
                 console.warn("Capture error:", e);
             }
         }, INTERVAL_MS);
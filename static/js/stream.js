@@ -10,18 +10,26 @@
     const sendChatBtn = document.getElementById("sendChatBtn");
     const bidsList = document.getElementById("bidsList");
     const bidAmount = document.getElementById("bidAmount");
+    // Each thumbnail is a separate lot with its own price
+    const lotPrices = {};
+    let currentLot = (document.querySelector(".thumb-active") || {}).dataset?.lot || "1";
     const placeBidBtn = document.getElementById("placeBidBtn");
 
     let ws = null;
     let username = "Anonymous";
+    let frameUrl = null;
 
     function getWsUrl() {
         const protocol = window.location.protocol === "https:" ? "wss:" : "ws:";
-        return `${protocol}//${window.location.host}/ws`;
+        // /stream?room=<id> watches (or /start_stream?room=<id> hosts) that room
+        const room = new URLSearchParams(window.location.search).get("room");
+        const query = room ? `?room=${encodeURIComponent(room)}` : "";
+        return `${protocol}//${window.location.host}/ws${query}`;
     }
 
     function connect() {
         ws = new WebSocket(getWsUrl());
+        ws.binaryType = "blob";
         const u = usernameInput.value.trim() || "Anonymous";
         username = u;
 
@@ -36,6 +44,11 @@
         };
 
         ws.onmessage = (event) => {
+            // Binary messages are video frames (raw image bytes)
+            if (event.data instanceof Blob) {
+                showFrame(event.data);
+                return;
+            }
             try {
                 const msg = JSON.parse(event.data);
                 handleMessage(msg);
@@ -51,14 +64,39 @@
         ws.onerror = () => { };
     }
 
+    function showFrame(blob) {
+        const previous = frameUrl;
+        frameUrl = URL.createObjectURL(blob);
+        streamImage.src = frameUrl;
+        streamImage.style.display = "block";
+        placeholder.style.display = "none";
+        if (previous) URL.revokeObjectURL(previous);
+    }
+
+    function clearFrame() {
+        streamImage.src = "";
+        if (frameUrl) {
+            URL.revokeObjectURL(frameUrl);
+            frameUrl = null;
+        }
+    }
+
+    function applySnapshot(msg) {
+        // Full state on (re)join: replace history rather than appending to it
+        chatMessages.innerHTML = "";
+        bidsList.innerHTML = "";
+        Object.entries(msg.prices || {}).forEach(([lot, current]) => {
+            handleMessage({ type: "price", lot: lot, current: current });
+        });
+        handleMessage({ type: "live_status", is_live: msg.is_live });
+        appendChatBatch(msg.chat || []);
+        (msg.bids || []).forEach((b) => appendBid(b.username, b.amount));
+    }
+
     function handleMessage(msg) {
         switch (msg.type) {
-            case "frame":
-                if (msg.data) {
-                    streamImage.src = "data:image/jpeg;base64," + msg.data;
-                    streamImage.style.display = "block";
-                    placeholder.style.display = "none";
-                }
+            case "snapshot":
+                applySnapshot(msg);
                 break;
             case "viewers":
                 window.lastViewerCount = msg.count;
@@ -67,19 +105,20 @@
             case "chat":
                 appendChat(msg.username, msg.text);
                 break;
+            case "chat_batch":
+                appendChatBatch(msg.messages);
+                break;
             case "bid":
                 appendBid(msg.username, msg.amount);
                 break;
             case "price":
-                window.lastCurrentPrice = msg.current;
-                productPrice.textContent = "$" + msg.current;
-                bidAmount.min = msg.current + 1;
-                bidAmount.placeholder = "$" + (msg.current + 1);
+                lotPrices[msg.lot] = msg.current;
+                if (msg.lot === currentLot) showLotPrice();
                 break;
             case "live_status":
                 if (!msg.is_live) {
                     streamImage.style.display = "none";
-                    streamImage.src = "";
+                    clearFrame();
                     placeholder.style.display = "flex";
                     placeholder.querySelector("p").textContent = window.t('waiting_stream');
                 }
@@ -87,6 +126,9 @@
             case "you_are_banned":
                 applyBanState(msg.banned);
                 break;
+            case "throttled":
+                appendNotice(window.t('throttled_notice'));
+                break;
         }
     }
 
@@ -129,10 +171,30 @@
         return n + " " + window.t('viewers');
     }
 
-    function appendChat(name, text) {
+    function chatElement(name, text) {
         const el = document.createElement("div");
         el.className = "chat-message";
         el.innerHTML = `<span class="chat-username">${escapeHtml(name)}:</span> ${escapeHtml(text)}`;
+        return el;
+    }
+
+    function appendChat(name, text) {
+        chatMessages.appendChild(chatElement(name, text));
+        chatMessages.scrollTop = chatMessages.scrollHeight;
+    }
+
+    function appendChatBatch(lines) {
+        // One DOM insertion and one scroll for the whole window
+        const fragment = document.createDocumentFragment();
+        lines.forEach((m) => fragment.appendChild(chatElement(m.username, m.text)));
+        chatMessages.appendChild(fragment);
+        chatMessages.scrollTop = chatMessages.scrollHeight;
+    }
+
+    function appendNotice(text) {
+        const el = document.createElement("div");
+        el.className = "chat-message";
+        el.innerHTML = `<em>${escapeHtml(text)}</em>`;
         chatMessages.appendChild(el);
         chatMessages.scrollTop = chatMessages.scrollHeight;
     }
@@ -165,6 +227,15 @@
         chatInput.value = "";
     }
 
+    function showLotPrice() {
+        const current = lotPrices[currentLot];
+        if (current === undefined) return;
+        window.lastCurrentPrice = current;
+        productPrice.textContent = "$" + current;
+        bidAmount.min = current + 1;
+        bidAmount.placeholder = "$" + (current + 1);
+    }
+
     function sendBid() {
         if (!ws || ws.readyState !== WebSocket.OPEN) return;
 
@@ -177,6 +248,7 @@
         ws.send(JSON.stringify({
             type: "bid",
             username: u,
+            lot: currentLot,
             amount: val
         }));
         bidAmount.value = "";
@@ -190,7 +262,8 @@
 
         ws.send(JSON.stringify({
             type: "buy_now",
-            username: u
+            username: u,
+            lot: currentLot
         }));
     }
 
@@ -214,6 +287,8 @@
                 t.classList.remove("thumb-active");
             });
             this.classList.add("thumb-active");
+            currentLot = this.getAttribute("data-lot");
+            showLotPrice();
         });
     });
 
@@ -0,0 +1,225 @@
+"""
+static_cache.py — In-memory static files and HTML pages.
+
+Every file under the static directory is read once (in a worker thread),
+compressed ahead of time and kept in memory with a strong ETag derived from
+its content. Requests are answered straight from memory: the right encoding
+for the client's Accept-Encoding, or a 304 when If-None-Match still matches.
+Files are re-read when their mtime changes (checked at most once per
+`check_interval` per file), so editing a file on disk still works without
+a restart.
+
+HTML pages get their /static/... references rewritten to content-hashed
+URLs (`/static/css/styles.css?v=<hash>`). Those URLs never change content,
+so they are served as immutable for a year; plain URLs (e.g. built in JS)
+are revalidated with the ETag on every use.
+
+Gzip is always available; brotli is used as well when installed
+(`pip install brotli`).
+"""
+import asyncio
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import time
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+_COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+_MIN_COMPRESS_SIZE = 256
+_STATIC_REF = re.compile(r"/static/[\w./-]+")
+
+mimetypes.add_type("application/javascript", ".js")
+mimetypes.add_type("image/webp", ".webp")
+
+
+def _accepted_encodings(header: Optional[str]) -> Tuple[str, ...]:
+    accepted = []
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if coding and params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.append(coding.lower())
+    return tuple(accepted)
+
+
+class StaticAsset:
+    __slots__ = ("path", "mtime", "content_type", "digest", "etag", "bodies", "deps")
+
+    def __init__(self, path: str, mtime: float, content_type: str, body: bytes, deps: Dict[str, str] = None):
+        self.path = path
+        self.mtime = mtime
+        self.content_type = content_type
+        self.digest = hashlib.sha256(body).hexdigest()[:16]
+        self.etag = '"{}"'.format(self.digest)
+        self.deps = deps or {}  # pages only: referenced asset -> digest it was rendered with
+        self.bodies: Dict[str, bytes] = {"identity": body}
+        if content_type.startswith(_COMPRESSIBLE) and len(body) >= _MIN_COMPRESS_SIZE:
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.bodies["gzip"] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.bodies["br"] = compressed
+
+    def representation(self, accept_encoding: Optional[str]) -> Tuple[str, bytes, str]:
+        """(content-encoding, body, etag) for the client, smallest accepted first."""
+        if len(self.bodies) > 1:
+            accepted = _accepted_encodings(accept_encoding)
+            for coding in ("br", "gzip"):
+                if coding in self.bodies and coding in accepted:
+                    # A strong ETag names exactly one byte sequence
+                    return coding, self.bodies[coding], '"{}-{}"'.format(self.digest, coding)
+        return "identity", self.bodies["identity"], self.etag
+
+    def not_modified(self, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            # Weak comparison: any encoding of the current content matches
+            if tag.strip('"').split("-", 1)[0] == self.digest:
+                return True
+        return False
+
+
+class StaticCache:
+    def __init__(self, root: str, url_prefix: str = "/static", check_interval: float = 1.0):
+        self.root = os.path.realpath(root)
+        self.url_prefix = url_prefix.rstrip("/")
+        self.check_interval = check_interval
+        self._assets: Dict[str, StaticAsset] = {}
+        self._checked: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.served = 0
+        self.not_modified = 0
+        self.reloads = 0
+
+    async def preload(self) -> None:
+        """Read and compress everything under root, off the event loop."""
+        paths = await asyncio.to_thread(self._walk)
+        for rel in paths:
+            if not rel.endswith(".html"):
+                await self.get(rel)
+        for rel in paths:
+            if rel.endswith(".html"):
+                await self.get(rel)
+        logger.info("Static cache: %d files in memory (brotli %s)", len(self._assets),
+                    "on" if brotli is not None else "off")
+
+    def _walk(self):
+        found = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                found.append(os.path.relpath(os.path.join(dirpath, filename), self.root).replace(os.sep, "/"))
+        return found
+
+    def _resolve(self, rel: str) -> Optional[str]:
+        full = os.path.realpath(os.path.join(self.root, rel))
+        if not full.startswith(self.root + os.sep):
+            return None
+        return full
+
+    async def get(self, rel: str) -> Optional[StaticAsset]:
+        """The current version of a file (relative to root), or None if there is none."""
+        asset = self._assets.get(rel)
+        now = time.monotonic()
+        if asset is not None and now - self._checked.get(rel, 0.0) < self.check_interval:
+            return asset
+        full = self._resolve(rel)
+        if full is None:
+            return None
+        try:
+            mtime = os.stat(full).st_mtime
+        except (FileNotFoundError, NotADirectoryError):
+            if self._assets.pop(rel, None) is not None:
+                self._checked.pop(rel, None)
+                self._locks.pop(rel, None)
+            return None
+        self._checked[rel] = now
+        if asset is not None and asset.mtime == mtime and not await self._deps_changed(asset):
+            return asset
+
+        lock = self._locks.setdefault(rel, asyncio.Lock())
+        async with lock:
+            current = self._assets.get(rel)
+            if current is not None and current is not asset:
+                return current  # another request reloaded it meanwhile
+            try:
+                body = await asyncio.to_thread(self._read, full)
+            except IsADirectoryError:
+                return None
+            except FileNotFoundError:
+                self._assets.pop(rel, None)
+                return None
+            deps = None
+            if rel.endswith(".html"):
+                body, deps = await self._render_page(body)
+            content_type = mimetypes.guess_type(full)[0] or "application/octet-stream"
+            if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+                content_type += "; charset=utf-8"
+            asset = await asyncio.to_thread(StaticAsset, rel, mtime, content_type, body, deps)
+            if rel in self._assets:
+                self.reloads += 1
+                logger.info("Static cache: reloaded %s", rel)
+            self._assets[rel] = asset
+            return asset
+
+    @staticmethod
+    def _read(full: str) -> bytes:
+        with open(full, "rb") as f:
+            return f.read()
+
+    async def _deps_changed(self, asset: StaticAsset) -> bool:
+        for rel, digest in asset.deps.items():
+            dep = await self.get(rel)
+            if dep is None or dep.digest != digest:
+                return True
+        return False
+
+    async def _render_page(self, body: bytes) -> Tuple[bytes, Dict[str, str]]:
+        """Point the page's /static/... references at content-hashed URLs."""
+        text = body.decode("utf-8")
+        deps: Dict[str, str] = {}
+        for url in set(_STATIC_REF.findall(text)):
+            rel = url[len(self.url_prefix) + 1:]
+            if rel.endswith(".html"):
+                continue
+            dep = await self.get(rel)
+            if dep is not None:
+                deps[rel] = dep.digest
+        if deps:
+            text = _STATIC_REF.sub(
+                lambda m: self.url_for(m.group(0)[len(self.url_prefix) + 1:], deps), text,
+            )
+        return text.encode("utf-8"), deps
+
+    def url_for(self, rel: str, digests: Dict[str, str] = None) -> str:
+        digest = (digests or {}).get(rel)
+        if digest is None:
+            asset = self._assets.get(rel)
+            digest = asset.digest if asset is not None else None
+        url = "{}/{}".format(self.url_prefix, rel)
+        return "{}?v={}".format(url, digest) if digest else url
+
+    @property
+    def size(self) -> int:
+        """Bytes held in memory, all encodings included."""
+        return sum(len(body) for asset in list(self._assets.values()) for body in asset.bodies.values())
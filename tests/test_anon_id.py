@@ -0,0 +1,34 @@
+"""
+test_anon_id.py — Signed anonymous ids: unique per issue, tamper-proof, shared secret.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anon_id import AnonIdSigner, load_secret  # noqa: E402
+
+
+def test_issued_ids_verify_and_forgeries_do_not():
+    signer = AnonIdSigner("secret")
+    first, second = signer.issue(), signer.issue()
+    assert signer.verify(first) and signer.verify(second)
+    assert signer.verify(first) != signer.verify(second)
+    anon_id, _, signature = first.partition(".")
+    assert signer.verify(f"{anon_id[::-1]}.{signature}") is None
+    assert signer.verify(anon_id) is None
+    assert AnonIdSigner("other").verify(first) is None
+
+
+def test_generated_secret_is_shared_through_the_file(tmp_path):
+    path = str(tmp_path / "secret")
+    assert load_secret("", path) == load_secret("", path)
+    assert load_secret("configured", path) == b"configured"
+
+
+def test_secret_file_is_only_written_on_first_use(tmp_path):
+    path = tmp_path / "secret"
+    signer = AnonIdSigner(path=str(path))
+    assert not path.exists()
+    assert signer.verify(signer.issue())
+    assert path.exists()
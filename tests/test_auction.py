@@ -0,0 +1,23 @@
+"""
+test_auction.py — AuctionEngine accept/reject rules.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auction import MAX_BID, AuctionEngine  # noqa: E402
+
+
+def test_amount_above_max_bid_is_rejected():
+    engine = AuctionEngine(["1"])
+    assert engine.submit("1", "bob", 9300000000000000000) is None
+    assert engine.submit("1", "bob", MAX_BID)["amount"] == MAX_BID
+    assert engine.rejected == 1
+
+
+def test_buy_now_cannot_pass_max_bid():
+    engine = AuctionEngine(["1"], max_bid=10)
+    assert engine.submit("1", "bob", 10) is not None
+    assert engine.submit("1", "bob") is None
+    assert engine.price("1") == 10
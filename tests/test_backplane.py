@@ -0,0 +1,43 @@
+"""
+test_backplane.py — A failing event handler does not stop the backplane reader.
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backplane import Backplane, UnixSocketBackplane  # noqa: E402
+
+
+def test_backplane_is_abstract():
+    with pytest.raises(TypeError):
+        Backplane()
+
+
+def test_handler_error_skips_only_that_event(tmp_path):
+    async def scenario():
+        seen = []
+
+        def handler(event):
+            if isinstance(event, dict) and event.get("type") == "poison":
+                raise KeyError("boom")
+            seen.append(event)
+
+        backplane = UnixSocketBackplane(str(tmp_path / "bp.sock"))
+        await backplane.start(handler)
+        try:
+            await backplane.publish({"type": "poison"})
+            await backplane.publish({"type": "chat", "text": "after"})
+            await backplane.publish(b"frame")
+            for _ in range(100):
+                if len(seen) == 3:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await backplane.stop()
+        return seen
+
+    assert asyncio.run(scenario()) == [{"type": "backplane_connected"}, {"type": "chat", "text": "after"}, b"frame"]
@@ -0,0 +1,50 @@
+"""
+test_email_pipeline.py — A rate of 0 means no limit, not a stalled run.
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email_service import NotificationPipeline  # noqa: E402
+
+
+class FakeClient:
+    is_connected = True
+
+    def __init__(self, sent: list):
+        self.sent = sent
+
+    async def send_message(self, message) -> None:
+        self.sent.append(message["To"])
+
+
+class FakePool:
+    def __init__(self):
+        self.sent = []
+
+    async def acquire(self) -> FakeClient:
+        return FakeClient(self.sent)
+
+    def release(self, client) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+def test_zero_rate_sends_everything_unthrottled():
+    async def scenario():
+        pipeline = NotificationPipeline(
+            hostname="127.0.0.1", port=1, username=None, password=None, start_tls=False,
+            concurrency=2, rate_per_second=0, chunk_size=2,
+        )
+        pipeline._pool = FakePool()
+        users = [{"email": f"u{i}@example.com", "name": "U"} for i in range(5)]
+        stats = await asyncio.wait_for(pipeline.run(users, "http://example.com/stream"), 5)
+        return stats, sorted(pipeline._pool.sent)
+
+    stats, sent = asyncio.run(scenario())
+    assert stats.sent == 5 and stats.failed == 0
+    assert sent == sorted(f"u{i}@example.com" for i in range(5))
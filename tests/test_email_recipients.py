@@ -0,0 +1,36 @@
+"""
+test_email_recipients.py — stream_recipients pages through every user exactly once.
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from database import Base  # noqa: E402
+from email_service import stream_recipients  # noqa: E402
+from models import User  # noqa: E402
+
+
+def test_keyset_pages_cover_every_user(tmp_path):
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'users.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(User), [
+                {"google_id": f"g{i}", "email": f"user{i}@example.com", "name": f"User {i}"} for i in range(25)
+            ])
+        factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        try:
+            return [chunk async for chunk in stream_recipients(factory, batch_size=10)]
+        finally:
+            await engine.dispose()
+
+    chunks = asyncio.run(scenario())
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    emails = [r["email"] for chunk in chunks for r in chunk]
+    assert sorted(emails) == sorted(f"user{i}@example.com" for i in range(25))
@@ -0,0 +1,77 @@
+"""
+test_fanout.py — Which queued messages a slow client loses, and when it is cut off.
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fanout  # noqa: E402
+from fanout import MAX_OVERFLOW, ViewerChannel, encode_message  # noqa: E402
+from protocol import loads  # noqa: E402
+
+
+class StalledSocket:
+    """Never read from: the channel is not started, so nothing is sent."""
+
+    def __init__(self):
+        self.close_code = None
+
+    async def close(self, code: int = 1000) -> None:
+        self.close_code = code
+
+
+def message(msg_type: str, n: int):
+    return encode_message({"type": msg_type, "n": n})
+
+
+def queued(channel: ViewerChannel):
+    return [(msg_type, loads(payload)["n"]) for msg_type, payload in channel._queue]
+
+
+def test_oldest_droppable_goes_first_and_never_drop_is_kept():
+    async def scenario():
+        channel = ViewerChannel(StalledSocket(), lambda ws: None, maxsize=3)
+        for item in (message("chat", 1), message("bid", 2), message("viewers", 3)):
+            channel.enqueue(item)
+        channel.enqueue(message("chat", 4))  # pushes out chat 1
+        channel.enqueue(message("price", 5))  # pushes out viewers 3
+        channel.enqueue(message("bid", 6))  # pushes out chat 4
+        channel.enqueue(message("chat", 7))  # nothing droppable left: dropped itself
+        channel.enqueue(message("bid", 8))  # overflows maxsize
+        return queued(channel), channel.dropped
+
+    assert asyncio.run(scenario()) == ([("bid", 2), ("price", 5), ("bid", 6), ("bid", 8)], 4)
+
+
+def test_backlog_timeout_kicks(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(fanout.time, "monotonic", lambda: now[0])
+
+    async def scenario():
+        socket, lost = StalledSocket(), []
+        channel = ViewerChannel(socket, lost.append, maxsize=2, max_backlog=60)
+        for n in range(3):
+            channel.enqueue(message("bid", n))  # backlogged from here
+        now[0] += 59
+        channel.enqueue(message("bid", 3))
+        kept = not channel.closed
+        now[0] += 2
+        channel.enqueue(message("bid", 4))
+        await asyncio.sleep(0)
+        return kept, channel.closed, lost == [socket], socket.close_code
+
+    assert asyncio.run(scenario()) == (True, True, True, 1013)
+
+
+def test_never_drop_overflow_is_capped_without_a_timeout():
+    async def scenario():
+        socket, lost = StalledSocket(), []
+        channel = ViewerChannel(socket, lost.append, maxsize=4, max_backlog=None)
+        for n in range(4 * MAX_OVERFLOW + 1):
+            channel.enqueue(message("price", n))
+        await asyncio.sleep(0)
+        return channel.closed, channel.depth(), lost == [socket]
+
+    assert asyncio.run(scenario()) == (True, 0, True)
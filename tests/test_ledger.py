@@ -0,0 +1,83 @@
+"""
+test_ledger.py — BidLedger keeps committing past rows the database refuses.
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from database import Base  # noqa: E402
+from ledger import BidLedger  # noqa: E402
+from models import Bid  # noqa: E402
+
+
+def bid(seq: int, amount: int) -> dict:
+    return {"type": "bid", "seq": seq, "lot": "1", "username": "bob", "amount": amount}
+
+
+async def with_ledger(tmp_path, scenario, **options):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'ledger.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        return await scenario(BidLedger(factory, **options), factory)
+    finally:
+        await engine.dispose()
+
+
+async def committed_seqs(factory) -> list:
+    async with factory() as db:
+        return list((await db.execute(select(Bid.seq).order_by(Bid.seq))).scalars())
+
+
+def test_bad_row_is_quarantined_and_the_rest_commit(tmp_path):
+    async def scenario(ledger, factory):
+        for seq in range(1, 8):
+            ledger.append(bid(seq, 9300000000000000000 if seq == 5 else seq))
+        await ledger.flush()
+        return ledger, await committed_seqs(factory)
+
+    ledger, seqs = asyncio.run(with_ledger(tmp_path, scenario))
+    assert seqs == [1, 2, 3, 4, 6, 7]
+    assert ledger.pending == 0
+    assert ledger.quarantined == 1
+    assert ledger.quarantine[0]["seq"] == 5
+
+
+def test_transient_error_keeps_the_batch_queued(tmp_path):
+    async def scenario(ledger, factory):
+        ledger.append(bid(1, 10))
+        healthy = ledger._session_factory
+
+        def locked():
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+        ledger._session_factory = locked
+        with pytest.raises(OperationalError):
+            await ledger.flush()
+        assert ledger.pending == 1 and ledger.quarantined == 0
+        ledger._session_factory = healthy
+        await ledger.flush()
+        return await committed_seqs(factory)
+
+    assert asyncio.run(with_ledger(tmp_path, scenario)) == [1]
+
+
+def test_full_once_max_pending_bids_wait(tmp_path):
+    async def scenario(ledger, factory):
+        ledger.append(bid(1, 10))
+        ledger.append(bid(2, 11))
+        full = ledger.full
+        await ledger.flush()
+        return full, ledger.full
+
+    assert asyncio.run(with_ledger(tmp_path, scenario, max_pending=2)) == (True, False)
@@ -0,0 +1,89 @@
+"""
+test_logout_invalidation.py — A logout on one worker ends the session on all of them.
+
+Runs two uvicorn workers sharing a Unix socket backplane, with a long
+session cache TTL, warms both workers' caches and logs out through one
+of them; afterwards no worker may still answer from its cache.
+"""
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = "b" * 32
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def request(port: int, path: str, method: str = "GET") -> urllib.request.Request:
+    return urllib.request.Request(
+        f"http://127.0.0.1:{port}{path}", method=method, headers={"Cookie": f"session_id={TOKEN}"},
+    )
+
+
+def me(port: int):
+    with urllib.request.urlopen(request(port, "/auth/me"), timeout=5) as response:
+        return json.load(response)["user"]
+
+
+def test_logout_reaches_every_worker(tmp_path):
+    db = tmp_path / "app.db"
+    port = free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite+aiosqlite:///{db}",
+        BACKPLANE_URL=f"unix:{tmp_path / 'bp.sock'}",
+        AUTH_CACHE_TTL_SECONDS="600",
+        HISTORY_ARCHIVE_ENABLED="false",
+        LOOP_WATCHDOG_ENABLED="false",
+        ANON_ID_SECRET_FILE=str(tmp_path / "anon_id_secret"),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", "2",
+         "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                # No cookie yet: a negative cache entry would outlive the insert below
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/auth/me", timeout=1).close()
+                break
+            except (OSError, urllib.error.URLError):
+                if time.monotonic() > deadline or server.poll() is not None:
+                    raise
+                time.sleep(0.2)
+        # Both workers must be up before the session exists
+        time.sleep(3)
+        conn = sqlite3.connect(db, timeout=10)
+        conn.execute(
+            "INSERT INTO users (id, google_id, email, name, created_at, updated_at) "
+            "VALUES (1, 'g1', 'u1@example.com', 'User 1', '2026-01-01', '2026-01-01')"
+        )
+        conn.execute(
+            "INSERT INTO sessions (token, user_id, created_at, expires_at) "
+            "VALUES (?, 1, '2026-01-01 00:00:00.000000', '2099-01-01 00:00:00.000000')",
+            (TOKEN,),
+        )
+        conn.commit()
+        conn.close()
+
+        # Enough fresh connections that both workers cache the session
+        assert all(me(port) is not None for _ in range(40))
+        urllib.request.urlopen(request(port, "/auth/logout", "POST"), timeout=5).close()
+        time.sleep(0.5)
+        assert all(me(port) is None for _ in range(40))
+    finally:
+        server.terminate()
+        server.wait(15)
@@ -0,0 +1,53 @@
+"""
+test_moderation.py — Bans survive the room being closed and opened again.
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from database import Base  # noqa: E402
+from main import ConnectionManager  # noqa: E402
+from moderation import BanList  # noqa: E402
+
+
+async def with_ban_list(tmp_path, scenario):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'bans.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        return await scenario(BanList(factory))
+    finally:
+        await engine.dispose()
+
+
+async def open_room(ban_list: BanList, room: str = "shop1") -> ConnectionManager:
+    manager = ConnectionManager(room=room, ban_list=ban_list)
+    await manager.start()
+    return manager
+
+
+def test_bans_outlive_idle_room_teardown(tmp_path):
+    async def scenario(ban_list):
+        manager = await open_room(ban_list)
+        await manager.broadcast_chat("troll", "spam", "anon:1")
+        await manager.broadcast_chat("pest", "spam", "anon:2")
+        await manager.ban_user("troll")
+        await manager.ban_user("pest")
+        await manager.unban_user("pest")
+        await manager.stop()
+        # Reopened before the changes were committed, then after
+        queued = (await open_room(ban_list)).bans
+        await ban_list.flush()
+        reopened = await open_room(ban_list)
+        other = await open_room(ban_list, "shop2")
+        return queued, reopened.bans, other.bans
+
+    queued, committed, other = asyncio.run(with_ban_list(tmp_path, scenario))
+    assert queued == committed == {"anon:1": "troll"}
+    assert other == {}
@@ -0,0 +1,26 @@
+"""
+test_protocol.py — Inbound messages that could not be sent back out are rejected.
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import protocol  # noqa: E402
+from protocol import Field, MessageRegistry, MessageSpec  # noqa: E402
+
+
+def test_lone_surrogate_from_stdlib_parser_is_rejected(monkeypatch):
+    # orjson refuses the escape itself; the stdlib fallback decodes it
+    monkeypatch.setattr(protocol, "loads", json.loads)
+    registry = MessageRegistry(max_size=1024)
+
+    @registry.register("chat", MessageSpec(256, text=Field(str, required=True, max_length=64)))
+    async def chat(client, msg):
+        pass
+
+    assert registry.decode('{"type": "chat", "text": "\\ud800"}') is None
+    assert registry.rejected == 1
+    msg, handler = registry.decode('{"type": "chat", "text": "\\ud83d\\ude00 ok"}')
+    assert handler is chat and protocol.dumps(msg).encode("utf-8")
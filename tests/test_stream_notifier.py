@@ -0,0 +1,57 @@
+"""
+test_stream_notifier.py — Stream-started emails: cooldowns, link to the room.
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import email_service  # noqa: E402
+from email_service import StreamStartNotifier, stream_link  # noqa: E402
+
+
+def test_cooldown_is_per_room_and_link_names_the_room(monkeypatch):
+    links = []
+
+    async def fake_notify(users, link, pipeline=None):
+        links.append(link)
+        return 0
+
+    monkeypatch.setattr(email_service, "notify_stream_started", fake_notify)
+    monkeypatch.setattr(email_service, "stream_recipients", lambda factory: [])
+
+    async def scenario():
+        notifier = StreamStartNotifier(session_factory=None, cooldown=60, global_cooldown=0)
+        started = [notifier.trigger("shop1"), notifier.trigger("shop1")]
+        await asyncio.sleep(0)
+        started += [notifier.trigger("shop1"), notifier.trigger("shop 2")]
+        await asyncio.sleep(0)
+        return started
+
+    assert asyncio.run(scenario()) == [True, False, False, True]
+    assert links == [stream_link("shop1"), stream_link("shop 2")]
+    assert stream_link("shop 2").endswith("?room=shop%202")
+
+
+def test_global_cooldown_spans_rooms_and_runs_share_one_pipeline(monkeypatch):
+    pipelines = []
+
+    async def fake_notify(users, link, pipeline=None):
+        pipelines.append(pipeline)
+        return 0
+
+    monkeypatch.setattr(email_service, "notify_stream_started", fake_notify)
+    monkeypatch.setattr(email_service, "stream_recipients", lambda factory: [])
+
+    async def scenario():
+        notifier = StreamStartNotifier(session_factory=None, cooldown=0, global_cooldown=60)
+        started = [notifier.trigger("a"), notifier.trigger("b")]
+        await asyncio.sleep(0)
+        notifier.global_cooldown = 0
+        started.append(notifier.trigger("c"))
+        await asyncio.sleep(0)
+        return started
+
+    assert asyncio.run(scenario()) == [True, False, True]
+    assert len(pipelines) == 2 and pipelines[0] is pipelines[1] is not None
@@ -0,0 +1,42 @@
+"""
+test_streamer_disconnect.py — A streamer whose socket fails on send ends the stream.
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import ConnectionManager  # noqa: E402
+
+
+class FailingSocket:
+    async def send_text(self, text: str) -> None:
+        raise ConnectionError("socket gone")
+
+    async def send_bytes(self, data: bytes) -> None:
+        raise ConnectionError("socket gone")
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+def test_failed_send_to_streamer_ends_the_stream():
+    async def scenario():
+        manager = ConnectionManager()
+        await manager.start()
+        streamer = FailingSocket()
+        await manager.connect_streamer(streamer)
+        await manager.broadcast_live_status(True)
+        manager.send_personal(streamer, {"type": "viewers", "count": 1})
+        for _ in range(10):
+            await asyncio.sleep(0)
+        # What the /ws cleanup does once the receive loop sees the disconnect
+        assert not manager.disconnect_streamer(streamer)
+        await manager.stop()
+        return manager
+
+    manager = asyncio.run(scenario())
+    assert manager.streamer is None
+    assert not manager.is_live
+    assert manager.get_viewer_count() == 0
@@ -0,0 +1,42 @@
+"""
+test_token_verifier.py — Unknown key ids cannot force a certificate fetch per request.
+"""
+import base64
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from token_verifier import GoogleCertSource, GoogleTokenVerifier  # noqa: E402
+
+
+class FakeResponse:
+    status = 200
+    headers = {"Cache-Control": "public, max-age=3600"}
+    data = json.dumps({"known": "PEM"}).encode()
+
+
+def token_with_kid(kid: str) -> str:
+    header = base64.urlsafe_b64encode(json.dumps({"alg": "RS256", "kid": kid}).encode()).rstrip(b"=").decode()
+    return f"{header}.e30.c2ln"
+
+
+def test_unknown_kid_refetches_at_most_once_per_interval():
+    source = GoogleCertSource(min_refresh_interval=60)
+    fetches = []
+    source._request = lambda url, method: fetches.append(url) or FakeResponse()
+    verifier = GoogleTokenVerifier("cid", key_source=source, max_workers=1)
+    try:
+        for window in range(2):
+            for i in range(20):
+                with pytest.raises(ValueError, match="Unknown key id"):
+                    verifier.verify_sync(token_with_kid(f"bogus{i}"))
+            # A minute later one more refetch is allowed
+            source._fetched_at -= 61
+    finally:
+        verifier.shutdown()
+    # The initial fetch, then one forced refresh in the second window
+    assert len(fetches) == 2
@@ -0,0 +1,45 @@
+"""
+test_transcode.py — A broken process pool is dropped once and restarted after a backoff.
+"""
+import asyncio
+import os
+import sys
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import transcode  # noqa: E402
+from transcode import FrameTranscoder  # noqa: E402
+
+
+class BrokenPool:
+    """Fails every job the way a pool with a dead worker process does."""
+
+    def __init__(self):
+        self.shut_down = 0
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_exception(BrokenProcessPool("a child process terminated abruptly"))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down += 1
+
+
+def test_broken_pool_is_dropped_once_and_frames_pass_through():
+    async def scenario():
+        transcoder = FrameTranscoder([(480, 35)], workers=1)
+        broken = transcoder._pool = BrokenPool()
+        restarts = transcode.RESTARTS.labels().value
+        # Several rooms' frames were in flight when the pool broke
+        results = await asyncio.gather(*(transcoder.run(b"frame") for _ in range(3)))
+        # Within the backoff no new pool is started
+        results.append(await transcoder.run(b"frame"))
+        return results, broken.shut_down, transcode.RESTARTS.labels().value - restarts, transcoder
+
+    results, shut_down, restarts, transcoder = asyncio.run(scenario())
+    assert results == [None] * 4
+    assert shut_down == 1 and restarts == 1
+    assert transcoder._pool is None and transcoder._backoff == transcode._RESTART_BACKOFF_MIN
@@ -0,0 +1,112 @@
+"""
+test_ws_db_pool.py — Open /ws sockets must not hold pooled DB connections.
+
+Runs the app with a tiny pool (1 + 1 overflow), opens more signed-in
+sockets than the pool has connections, and checks that HTTP requests that
+need the database still get one.
+"""
+import asyncio
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+
+websockets = pytest.importorskip("websockets")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+POOL_SIZE, MAX_OVERFLOW = 1, 1
+SOCKETS = POOL_SIZE + MAX_OVERFLOW + 3
+# One session per socket, so every lookup misses the auth cache
+TOKENS = [f"{i:032x}" for i in range(SOCKETS)]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(port: int, server: subprocess.Popen) -> None:
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/auth/me", timeout=1)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+@pytest.fixture
+def server(tmp_path):
+    db = tmp_path / "app.db"
+    port = free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite+aiosqlite:///{db}",
+        DB_POOL_SIZE=str(POOL_SIZE),
+        DB_MAX_OVERFLOW=str(MAX_OVERFLOW),
+        HISTORY_ARCHIVE_ENABLED="false",
+        LOOP_WATCHDOG_ENABLED="false",
+        SMTP_PASSWORD="",
+        ANON_ID_SECRET_FILE=str(tmp_path / "anon_id_secret"),
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        wait_until_up(port, proc)
+        conn = sqlite3.connect(db)
+        conn.execute(
+            "INSERT INTO users (id, google_id, email, name, created_at, updated_at) "
+            "VALUES (1, 'g1', 'u1@example.com', 'User 1', '2026-01-01', '2026-01-01')"
+        )
+        conn.executemany(
+            "INSERT INTO sessions (token, user_id, created_at, expires_at) "
+            "VALUES (?, 1, '2026-01-01 00:00:00.000000', '2099-01-01 00:00:00.000000')",
+            [(token,) for token in TOKENS],
+        )
+        conn.commit()
+        conn.close()
+        yield port
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+def auth_me(port: int) -> int:
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/auth/me", headers={"Cookie": "session_id=" + "f" * 32},
+    )
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return response.status
+
+
+def test_sockets_beyond_pool_size_leave_db_usable(server):
+    async def scenario():
+        sockets = []
+        for i, token in enumerate(TOKENS):
+            ws = await asyncio.wait_for(websockets.connect(
+                f"ws://127.0.0.1:{server}/ws?room=pool{i}",
+                additional_headers={"Cookie": f"session_id={token}"},
+            ), 5)
+            await ws.send('{"type": "join", "role": "viewer"}')
+            # The snapshot arrives only after the session has been resolved
+            await asyncio.wait_for(ws.recv(), 5)
+            sockets.append(ws)
+        try:
+            status = await asyncio.to_thread(auth_me, server)
+        finally:
+            for ws in sockets:
+                await ws.close()
+        return status
+
+    assert asyncio.run(scenario()) == 200
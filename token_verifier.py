@@ -0,0 +1,141 @@
+"""
+token_verifier.py — Google ID token verification off the event loop.
+
+google.oauth2.id_token.verify_oauth2_token fetches Google's certificates and
+checks the RSA signature synchronously, on every call. Here certificates are
+cached for as long as Google's Cache-Control allows, and verification runs in
+a small thread pool so a burst of logins never blocks the WebSocket fan-out.
+
+A token signed with a key id we do not know triggers one early refetch (in
+case Google rotated its keys), but at most once per min_refresh_interval:
+otherwise anyone could make every login request fetch the certificates
+again by sending tokens with made-up key ids.
+"""
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Mapping, Optional
+
+from google.auth import exceptions, jwt
+from google.auth.transport import requests as google_requests
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class GoogleCertSource:
+    """Google's public signing certificates, cached per the response's Cache-Control max-age."""
+
+    def __init__(
+        self,
+        certs_url: str = GOOGLE_CERTS_URL,
+        default_ttl: float = 3600.0,
+        min_refresh_interval: float = 60.0,
+    ):
+        self.certs_url = certs_url
+        self.default_ttl = default_ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._request = google_requests.Request()
+        self._lock = threading.Lock()
+        self._certs: Optional[Mapping[str, str]] = None
+        self._expires_at = 0.0
+        self._fetched_at = float("-inf")
+
+    def get_certs(self) -> Mapping[str, str]:
+        """Blocking; call from a worker thread."""
+        with self._lock:
+            if self._certs is None or time.monotonic() >= self._expires_at:
+                self._fetch()
+            return self._certs
+
+    def refresh(self) -> Mapping[str, str]:
+        """
+        Refetch before expiry, because a token named a key we do not have.
+        Blocking. Returns the cached certificates instead if the last fetch
+        was less than min_refresh_interval ago.
+        """
+        with self._lock:
+            if self._certs is None or time.monotonic() - self._fetched_at >= self.min_refresh_interval:
+                self._fetch()
+            return self._certs
+
+    def _fetch(self) -> None:
+        response = self._request(self.certs_url, method="GET")
+        if response.status != 200:
+            raise exceptions.TransportError("Could not fetch certificates at {}".format(self.certs_url))
+        self._certs = json.loads(response.data.decode("utf-8"))
+        self._fetched_at = time.monotonic()
+        match = _MAX_AGE_RE.search(response.headers.get("Cache-Control", ""))
+        ttl = float(match.group(1)) if match else self.default_ttl
+        self._expires_at = time.monotonic() + ttl
+        logger.info("Fetched %d Google certs, cached for %.0fs", len(self._certs), ttl)
+
+
+class StaticKeySource:
+    """Fixed key id -> PEM certificate mapping, e.g. for offline testing."""
+
+    def __init__(self, certs: Mapping[str, str]):
+        self._certs = dict(certs)
+
+    @classmethod
+    def from_file(cls, path: str) -> "StaticKeySource":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def get_certs(self) -> Mapping[str, str]:
+        return self._certs
+
+    def refresh(self) -> Mapping[str, str]:
+        return self._certs
+
+
+class GoogleTokenVerifier:
+    def __init__(
+        self,
+        audience: str,
+        key_source=None,
+        max_workers: int = 4,
+        clock_skew_in_seconds: int = 0,
+    ):
+        self.audience = audience
+        self.key_source = key_source or GoogleCertSource()
+        self.clock_skew_in_seconds = clock_skew_in_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="google-verify")
+
+    async def verify(self, token: str) -> dict:
+        """
+        Verify a Google ID token without blocking the event loop.
+        Raises ValueError if the token is invalid.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.verify_sync, token)
+
+    def verify_sync(self, token: str) -> dict:
+        certs = self.key_source.get_certs()
+        key_id = jwt.decode_header(token).get("kid")
+        if key_id and key_id not in certs:
+            # Google may have rotated its keys before our cached copy
+            # expired; the source refetches at most once per interval.
+            certs = self.key_source.refresh()
+            if key_id not in certs:
+                raise ValueError("Unknown key id: {}".format(key_id))
+        id_info = jwt.decode(
+            token,
+            certs=certs,
+            audience=self.audience,
+            clock_skew_in_seconds=self.clock_skew_in_seconds,
+        )
+        if id_info.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError("Wrong issuer: {}".format(id_info.get("iss")))
+        return id_info
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
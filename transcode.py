@@ -0,0 +1,207 @@
+"""
+transcode.py — Optional quality ladder for the live video frames.
+
+The streamer sends one JPEG per frame (its own size and quality). With
+transcoding on, each incoming frame is also decoded once in a process pool
+and re-encoded as a small ladder of lower resolutions/qualities, e.g.
+900/480/240 px wide. Every viewer is then sent the rung its connection can
+keep up with (see ViewerChannel in fanout.py), instead of the same frame
+for a phone on a weak link as for a desktop on fibre.
+
+The original frame is published at once, as before; the ladder follows as
+soon as the pool has made it. Each room keeps at most one frame in the
+pool plus the newest one waiting, so a pool that cannot keep up skips
+frames rather than queueing them. Decoding and encoding run in separate
+processes, so they never block the event loop and use every core.
+
+If a pool process dies (killed for memory, a crash in the decoder), the
+whole pool is broken. It is then dropped and a new one started after a
+backoff that doubles while crashes keep coming; meanwhile every viewer
+gets the original frames.
+
+Needs Pillow (`pip install pillow`); without it transcoding stays off and
+every viewer gets the original frame.
+"""
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image
+except ImportError:  # optional
+    Image = None
+
+TRANSCODE_SECONDS = REGISTRY.histogram("transcode_seconds", "Time to build one frame's ladder, pool wait included")
+TRANSCODED = REGISTRY.counter("transcode_frames_total", "Frames transcoded into a ladder")
+SKIPPED = REGISTRY.counter("transcode_skipped_total", "Frames not transcoded because a newer one arrived first")
+FAILED = REGISTRY.counter("transcode_errors_total", "Frames the pool failed to transcode")
+RESTARTS = REGISTRY.counter("transcode_pool_restarts_total", "Transcoding pools dropped after a worker process died")
+
+# Wait before starting a new pool after one broke, doubling up to the max
+_RESTART_BACKOFF_MIN = 1.0
+_RESTART_BACKOFF_MAX = 60.0
+
+# (max width in px, JPEG quality 1-95)
+Rung = Tuple[int, int]
+
+
+def parse_ladder(spec: str) -> List[Rung]:
+    """'900:40,480:35,240:30' -> [(900, 40), (480, 35), (240, 30)], widest first."""
+    rungs = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        width, _, quality = part.partition(":")
+        rungs.append((int(width), int(quality or 40)))
+    return sorted(rungs, reverse=True)
+
+
+def transcode_ladder(data: bytes, ladder: Sequence[Rung]) -> List[Optional[bytes]]:
+    """
+    Decode once, then scale down rung by rung, each from the previous one.
+    A rung at least as wide as the source is None: the original serves it.
+    Runs in a pool process.
+    """
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    out: List[Optional[bytes]] = []
+    for width, quality in ladder:
+        if width >= image.width:
+            out.append(None)
+            continue
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.BILINEAR, reducing_gap=2.0)
+        buf = io.BytesIO()
+        image.save(buf, "JPEG", quality=quality)
+        out.append(buf.getvalue())
+    return out
+
+
+class FrameTranscoder:
+    """The process pool and ladder, shared by every room."""
+
+    def __init__(self, ladder: Sequence[Rung], workers: int = 0):
+        self.ladder = list(ladder)
+        self.workers = workers or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._backoff = 0.0
+        self._broken_at = 0.0
+        self._retry_at = 0.0
+
+    @property
+    def available(self) -> bool:
+        return Image is not None and bool(self.ladder)
+
+    @property
+    def tiers(self) -> int:
+        return len(self.ladder)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn, not fork: the server process has threads and a running loop
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def run(self, data: bytes) -> Optional[List[Optional[bytes]]]:
+        """The frame's ladder, or None while the pool is down after a crash."""
+        if time.monotonic() < self._retry_at:
+            return None
+        pool = self._executor()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(pool, transcode_ladder, data, self.ladder)
+        except BrokenProcessPool:
+            self._drop_broken(pool)
+            return None
+
+    def _drop_broken(self, pool: ProcessPoolExecutor) -> None:
+        if pool is not self._pool:
+            return  # Every frame in flight fails with it; handled once
+        self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        now = time.monotonic()
+        # Only a pool that broke again soon after its restart backs off further
+        if now - self._broken_at > 2 * _RESTART_BACKOFF_MAX:
+            self._backoff = _RESTART_BACKOFF_MIN
+        else:
+            self._backoff = min(_RESTART_BACKOFF_MAX, self._backoff * 2)
+        self._broken_at = now
+        self._retry_at = now + self._backoff
+        RESTARTS.inc()
+        logger.warning("Transcoding pool broke (a worker process died); sending original frames "
+                       "and starting a new pool in %.0fs", self._backoff)
+
+    def stage(self, slot, on_ready: Callable[[], None]) -> "TranscodeStage":
+        return TranscodeStage(self, slot, on_ready)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+class TranscodeStage:
+    """
+    One room's frames into the pool: one in flight, only the newest waiting.
+    Finished ladders go to the room's FrameSlot, then on_ready() is called.
+    """
+
+    def __init__(self, transcoder: FrameTranscoder, slot, on_ready: Callable[[], None]):
+        self.transcoder = transcoder
+        self.slot = slot
+        self.on_ready = on_ready
+        self._task: Optional[asyncio.Task] = None
+        self._next: Optional[Tuple[int, bytes]] = None
+
+    def feed(self, seq: int, data: bytes) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(seq, data))
+        else:
+            if self._next is not None:
+                SKIPPED.inc()
+            self._next = (seq, data)
+
+    async def _run(self, seq: int, data: bytes) -> None:
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    renditions = await self.transcoder.run(data)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    FAILED.inc()
+                    logger.warning("Frame transcoding failed: %s", e)
+                else:
+                    # None: the pool is down and viewers get the original frame
+                    if renditions is not None:
+                        self._publish(seq, data, renditions, started)
+                if self._next is None:
+                    break
+                (seq, data), self._next = self._next, None
+        finally:
+            self._task = None
+
+    def _publish(self, seq: int, data: bytes, renditions: List[Optional[bytes]], started: float) -> None:
+        TRANSCODED.inc()
+        TRANSCODE_SECONDS.observe(time.perf_counter() - started)
+        if self.slot.publish_renditions(seq, [r or data for r in renditions]):
+            self.on_ready()
+
+    def close(self) -> None:
+        self._next = None
+        if self._task:
+            self._task.cancel()
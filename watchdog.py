@@ -0,0 +1,229 @@
+"""
+watchdog.py — Event-loop stall detection and an on-demand sampling profiler.
+
+LoopWatchdog keeps a heartbeat callback ticking on the event loop, which
+records loop lag, and a daemon thread that checks the heartbeat. When the
+loop has not ticked for longer than the stall threshold, the thread grabs
+the loop thread's current Python stack (the code that is blocking it) and
+keeps it in a rolling report, so a stutter in the live stream can be traced
+back to the call that caused it.
+
+SamplingProfiler is off by default. Once started (e.g. from the admin
+endpoint during a live stream) a thread samples the loop thread's stack
+every few milliseconds for a bounded time. Results come out as top stacks
+or in the folded format flame graph tools read.
+"""
+import asyncio
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Counter, Deque, List, Optional
+
+from metrics import LOOP_LAG, LOOP_LAG_LAST, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+STALLS = REGISTRY.counter("event_loop_stalls_total", "Times the event loop was blocked past the stall threshold")
+
+_MAX_STACK_DEPTH = 40
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _frame_stack(frame, with_lines: bool = True, limit: int = _MAX_STACK_DEPTH) -> List[str]:
+    """Outermost-first 'file:line function' (or 'file:function') entries."""
+    entries = []
+    while frame is not None and len(entries) < limit:
+        code = frame.f_code
+        name = os.path.basename(code.co_filename)
+        if with_lines:
+            entries.append("{}:{} {}".format(name, frame.f_lineno, code.co_name))
+        else:
+            entries.append("{}:{}".format(name, code.co_name))
+        frame = frame.f_back
+    entries.reverse()
+    return entries
+
+
+def _blocked_in(frame) -> str:
+    """Innermost frame in this project's own code, else the innermost frame."""
+    innermost = frame
+    while frame is not None:
+        if frame.f_code.co_filename.startswith(_APP_DIR + os.sep):
+            break
+        frame = frame.f_back
+    frame = frame or innermost
+    if frame is None:
+        return "?"
+    return "{}:{} {}".format(os.path.basename(frame.f_code.co_filename), frame.f_lineno, frame.f_code.co_name)
+
+
+class Stall:
+    __slots__ = ("started_at", "duration", "blocked_in", "stack")
+
+    def __init__(self, started_at: float, duration: float, blocked_in: str, stack: List[str]):
+        self.started_at = started_at  # wall clock, for the report
+        self.duration = duration
+        self.blocked_in = blocked_in
+        self.stack = stack
+
+    def to_dict(self) -> dict:
+        return {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "duration_ms": round(self.duration * 1000, 1),
+            "blocked_in": self.blocked_in,
+            "stack": self.stack,
+        }
+
+
+class LoopWatchdog:
+    def __init__(self, threshold: float = 0.1, interval: float = 0.02, history: int = 50):
+        self.threshold = threshold
+        self.interval = interval
+        self._stalls: Deque[Stall] = collections.deque(maxlen=history)
+        self._offenders: Counter[str] = collections.Counter()
+        self._current: Optional[Stall] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._last_beat = 0.0
+        self._expected = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._expected = self._last_beat + self.interval
+        self._handle = self._loop.call_later(self.interval, self._beat)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    # -- on the event loop -------------------------------------------------
+
+    def _beat(self) -> None:
+        # Not loop.time(): uvloop's clock only has millisecond resolution
+        now = time.perf_counter()
+        lag = max(0.0, now - self._expected)
+        LOOP_LAG.observe(lag)
+        LOOP_LAG_LAST.set(lag)
+        stall = self._current
+        if stall is not None:
+            # The loop is back; the watchdog thread only saw a lower bound
+            stall.duration = now - self._last_beat
+            self._current = None
+        self._last_beat = now
+        self._expected = now + self.interval
+        self._handle = self._loop.call_later(self.interval, self._beat)
+
+    # -- watchdog thread ---------------------------------------------------
+
+    def _watch(self) -> None:
+        check_every = min(self.interval, self.threshold / 4)
+        while not self._stop.wait(check_every):
+            last_beat = self._last_beat
+            blocked_for = time.perf_counter() - last_beat
+            if blocked_for < self.threshold + self.interval:
+                continue
+            if self._current is None:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                stack = _frame_stack(frame)
+                blocked_in = _blocked_in(frame)
+                del frame
+                if self._last_beat != last_beat:
+                    continue  # the loop got going again while we looked
+                stall = Stall(time.time() - blocked_for, blocked_for, blocked_in, stack)
+                self._current = stall
+                self._stalls.append(stall)
+                self._offenders[blocked_in] += 1
+                STALLS.inc()
+                logger.warning("Event loop blocked for %.0f ms+ in %s", blocked_for * 1000, blocked_in)
+            elif self._current.duration < blocked_for:
+                self._current.duration = blocked_for
+
+    def report(self) -> dict:
+        stalls = list(self._stalls)
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "stalls_total": int(STALLS.labels().value),
+            "last_lag_ms": round(LOOP_LAG_LAST.labels().value * 1000, 3),
+            "top_offenders": [{"where": where, "stalls": n} for where, n in self._offenders.most_common(10)],
+            "recent": [s.to_dict() for s in reversed(stalls)],
+        }
+
+
+class SamplingProfiler:
+    """Statistical profiler of one thread (the event loop's), off until started."""
+
+    def __init__(self, max_seconds: float = 300.0):
+        self.max_seconds = max_seconds
+        self._target_thread_id: Optional[int] = None
+        self._samples: Counter[str] = collections.Counter()
+        self._total = 0
+        self._interval = 0.005
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float = 0.005, seconds: float = 30.0) -> None:
+        """Start sampling the calling thread; stops by itself after `seconds`."""
+        if self.running:
+            return
+        self._target_thread_id = threading.get_ident()
+        self._samples.clear()
+        self._total = 0
+        self._interval = max(0.001, interval)
+        self._stop.clear()
+        duration = min(seconds, self.max_seconds)
+        self._thread = threading.Thread(target=self._sample, args=(duration,), name="loop-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+
+    def _sample(self, duration: float) -> None:
+        deadline = time.perf_counter() + duration
+        while not self._stop.wait(self._interval) and time.perf_counter() < deadline:
+            frame = sys._current_frames().get(self._target_thread_id)
+            if frame is None:
+                break
+            key = ";".join(_frame_stack(frame, with_lines=False))
+            del frame
+            self._samples[key] += 1
+            self._total += 1
+
+    def report(self, top: int = 20) -> dict:
+        samples = self._samples.most_common(top)
+        return {
+            "running": self.running,
+            "interval_ms": self._interval * 1000,
+            "samples": self._total,
+            "top": [
+                {"share": round(n / self._total, 4), "samples": n, "stack": stack.split(";")}
+                for stack, n in samples
+            ] if self._total else [],
+        }
+
+    def folded(self) -> str:
+        """One 'frame;frame;frame count' line per distinct stack (flamegraph.pl / speedscope input)."""
+        return "".join("{} {}\n".format(stack, n) for stack, n in self._samples.items())